@@ -0,0 +1,162 @@
+# tomos/embeddings/ann.py
+# Inverted-file (IVF) approximate nearest neighbour index in plain NumPy.
+#
+# Vectors are clustered with spherical k-means; each vector lives in the list of
+# its nearest centroid. A query scores the centroids, then only the `nprobe`
+# closest lists. nprobe=n_lists is an exact (if slower) search.
+import json
+import os
+
+import numpy as np
+
+from .index import INDEX_DTYPE, normalize_queries, normalize_rows, top_k
+
+PARAMS_FILE = "ivf.json"
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 65_536) -> np.ndarray:
+    """Return the nearest-centroid id of every row, in blocks to bound memory."""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        labels[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, n_clusters: int, iterations: int = 20, seed: int = 0
+) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity; returns (n_clusters, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = ~sums.any(axis=1)
+        if empty.any():  # re-seed empty clusters with random points
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        new_centroids = normalize_rows(sums)
+        if np.allclose(new_centroids, centroids, atol=1e-6):
+            break
+        centroids = new_centroids
+    return centroids
+
+
+class IVFIndex:
+    """
+    Approximate cosine-similarity search over inverted lists.
+
+    Rows are stored grouped by list (`matrix`), with `ids` mapping each stored
+    row back to its position in the original vectors and `offsets` marking where
+    each list starts. `nprobe` trades recall for latency and can be overridden
+    per search.
+    """
+
+    def __init__(self, centroids, matrix, ids, offsets, dims: int, nprobe: int = 8):
+        self.centroids = centroids
+        self.matrix = matrix
+        self.ids = ids
+        self.offsets = offsets
+        self.dims = dims
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(
+        cls,
+        vectors,
+        n_lists: int | None = None,
+        dims: int | None = None,
+        nprobe: int = 8,
+        iterations: int = 20,
+        sample_size: int | None = None,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Train centroids on a sample of `vectors` and file every row under its nearest one.
+
+        n_lists defaults to 4 * sqrt(n); the k-means sample defaults to 256 rows per list.
+        """
+        vectors = np.asarray(vectors)
+        dims = dims or vectors.shape[1]
+        matrix = normalize_rows(vectors[:, :dims])
+        n = len(matrix)
+        n_lists = min(n_lists or max(1, int(4 * np.sqrt(n))), n)
+        sample_size = min(sample_size or 256 * n_lists, n)
+        rng = np.random.default_rng(seed)
+        sample = matrix[np.sort(rng.choice(n, sample_size, replace=False))]
+        centroids = spherical_kmeans(sample, n_lists, iterations=iterations, seed=seed)
+
+        labels = _assign(matrix, centroids)
+        ids = np.argsort(labels, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, matrix[ids], ids, offsets, dims, nprobe=min(nprobe, n_lists))
+
+    @classmethod
+    def from_store(cls, store, dims: int | None = None, **kwargs) -> "IVFIndex":
+        """Build an index from an EmbeddingStore's memory-mapped vectors."""
+        return cls.build(store.vectors, dims=dims, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def save(self, path: str) -> None:
+        """Write the index to a directory of .npy files (loadable memory-mapped)."""
+        os.makedirs(path, exist_ok=True)
+        for name in ("centroids", "matrix", "ids", "offsets"):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, PARAMS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"dims": self.dims, "nprobe": self.nprobe, "n_lists": self.n_lists}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str | None = "r") -> "IVFIndex":
+        """Open a saved index; the vector matrix is memory-mapped by default."""
+        with open(os.path.join(path, PARAMS_FILE), "r", encoding="utf-8") as f:
+            params = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode if name == "matrix" else None)
+            for name in ("centroids", "matrix", "ids", "offsets")
+        }
+        return cls(**arrays, dims=params["dims"], nprobe=params["nprobe"])
+
+    def search(self, query, k: int = 3, nprobe: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, similarities) of the approximate k nearest rows to one query."""
+        ids, sims = self.search_batch(np.asarray(query)[None, :], k, nprobe)
+        found = sims[0] > -np.inf
+        return ids[0][found], sims[0][found]
+
+    def search_batch(self, queries, k: int = 3, nprobe: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Search a (q, dim) batch; returns (q, k) arrays. All queries are scored
+        against the centroids in one matrix multiply, then each probed list is
+        scored once against every query that probes it. Queries whose probed
+        lists hold fewer than k rows are padded with id -1 and similarity -inf.
+        """
+        queries = normalize_queries(np.atleast_2d(np.asarray(queries)), self.dims)
+        k = min(k, len(self))
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        probed, _ = top_k(queries @ self.centroids.T, nprobe)
+        cand_ids = [[] for _ in range(len(queries))]
+        cand_sims = [[] for _ in range(len(queries))]
+        for lst in np.unique(probed):
+            start, end = self.offsets[lst], self.offsets[lst + 1]
+            if start == end:
+                continue
+            members = np.flatnonzero((probed == lst).any(axis=1))
+            scores = queries[members] @ self.matrix[start:end].T
+            for i, row_scores in zip(members, scores):
+                cand_ids[i].append(self.ids[start:end])
+                cand_sims[i].append(row_scores)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        sims = np.full((len(queries), k), -np.inf, dtype=INDEX_DTYPE)
+        for i in range(len(queries)):
+            if not cand_ids[i]:
+                continue
+            rows, top = top_k(np.concatenate(cand_sims[i]), k)
+            ids[i, :len(rows)] = np.concatenate(cand_ids[i])[rows]
+            sims[i, :len(rows)] = top
+        return ids, sims
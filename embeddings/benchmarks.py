@@ -0,0 +1,326 @@
+# tomos/embeddings/benchmarks.py
+# Micro-benchmarks for the embedding pipeline.
+# Run from the directory above tomos/:  python -m tomos.embeddings.benchmarks chunker
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+WORDS = (
+    "orbit launch vehicle payload apogee perigee inclination booster stage "
+    "mission crew capsule docking station lunar lander telemetry trajectory "
+    "propellant engine thrust satellite constellation deorbit reentry"
+).split()
+
+
+def synthetic_section(n_paragraphs: int, seed: int = 0) -> tuple[list[str], str]:
+    """Build a fake wiki section with `n_paragraphs` paragraphs of 4-8 sentences each."""
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(n_paragraphs):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 24))).capitalize() + "."
+            for _ in range(rng.randint(4, 8))
+        ]
+        paragraphs.append(" ".join(sentences))
+    return (["Synthetic article", "== Launches =="], "\n\n".join(paragraphs))
+
+
+def _time(fn, repeat: int) -> float:
+    """Return the best wall time of `repeat` calls to fn, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_chunker(sizes=(10, 50, 200, 800), chunk_size: int = 768, repeat: int = 3):
+    """Compare the recursive splitter in embed.py against chunker.chunk_section."""
+    from .chunker import chunk_section, get_encoding
+    from .embed import split_strings_from_subsection
+
+    print(f"{'paragraphs':>10} {'tokens':>8} {'recursive (s)':>14} {'chunker (s)':>12} {'speedup':>8}")
+    for n in sizes:
+        section = synthetic_section(n)
+        tokens = len(get_encoding().encode(section[1]))
+        with contextlib.redirect_stdout(io.StringIO()):  # silence truncation warnings
+            old = _time(lambda: split_strings_from_subsection(section, max_tokens=chunk_size), repeat)
+        new = _time(lambda: chunk_section(section, chunk_size=chunk_size), repeat)
+        print(f"{n:>10} {tokens:>8} {old:>14.4f} {new:>12.4f} {old / new:>7.1f}x")
+
+
+def bench_store(n: int = 1000, dim: int = 3072):
+    """Compare cold load of the legacy CSV (read_csv + eval) against the memory-mapped store."""
+    import numpy as np
+    import pandas as pd
+
+    from .store import load_store, write_store
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    records = [{"text": f"chunk {i}"} for i in range(n)]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "embeddings.csv")
+        store_path = os.path.join(tmp, "embeddings.store")
+        pd.DataFrame({"text": [r["text"] for r in records], "embedding": [str(v.tolist()) for v in vectors]}).to_csv(
+            csv_path, index=False
+        )
+        write_store(store_path, records, vectors)
+
+        def load_csv():
+            df = pd.read_csv(csv_path)
+            df["embedding"] = df.embedding.apply(eval).apply(np.array)
+            return df
+
+        def load():
+            store = load_store(store_path)
+            return store.vectors[n // 2].sum()  # touch one row
+
+        print(f"{n} x {dim} embeddings")
+        print(f"{'loader':>8} {'time (s)':>10} {'peak alloc (MB)':>16}")
+        for name, fn in (("csv", load_csv), ("store", load)):
+            elapsed = _time(fn, 1)
+            tracemalloc.start()  # separate run: tracing slows the eval path down a lot
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:>8} {elapsed:>10.4f} {peak / 2**20:>16.1f}")
+
+
+def clustered_vectors(n: int, dim: int, n_clusters: int = 200, spread: float = 0.6, seed: int = 0):
+    """Return n float32 vectors scattered around random cluster centres, like real embeddings."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    return centres[labels] + spread * rng.standard_normal((n, dim), dtype=np.float32)
+
+
+def recall_at_k(approx_ids, exact_ids) -> float:
+    """Mean fraction of the exact top-k found by the approximate search."""
+    hits = [len(set(a) & set(e)) / len(e) for a, e in zip(approx_ids, exact_ids)]
+    return sum(hits) / len(hits)
+
+
+def bench_ann(n: int = 100_000, dim: int = 256, n_queries: int = 200, k: int = 10, nprobes=(1, 2, 4, 8, 16, 32)):
+    """Recall@k and per-query latency of IVFIndex at several nprobe values, against exact search."""
+    from .ann import IVFIndex
+    from .index import VectorIndex
+
+    vectors = clustered_vectors(n + n_queries, dim)
+    vectors, queries = vectors[:n], vectors[n:]
+    exact = VectorIndex(vectors)
+    exact_time = _time(lambda: [exact.search(q, k) for q in queries], 1) / n_queries
+    exact_ids = exact.search_batch(queries, k)[0]
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(vectors)
+    print(f"{n} x {dim} vectors, {ivf.n_lists} lists, built in {time.perf_counter() - start:.2f} s")
+    print(f"{'nprobe':>8} {'recall@' + str(k):>10} {'ms/query':>10}")
+    print(f"{'exact':>8} {1.0:>10.3f} {exact_time * 1e3:>10.3f}")
+    for nprobe in nprobes:
+        elapsed = _time(lambda: [ivf.search(q, k, nprobe=nprobe) for q in queries], 1) / n_queries
+        approx_ids = ivf.search_batch(queries, k, nprobe=nprobe)[0]
+        print(f"{nprobe:>8} {recall_at_k(approx_ids, exact_ids):>10.3f} {elapsed * 1e3:>10.3f}")
+
+
+def bench_submitter(n_batches: int = 100, batch_size: int = 16, latency: float = 0.05, error_rate: float = 0.1,
+                    concurrencies=(1, 4, 16)):
+    """Throughput of BatchSubmitter against a fake client with injected latency and 429s."""
+    import numpy as np
+
+    from .cache import EmbeddingCache
+    from .fakes import FakeClient, fake_embedding
+    from .submitter import BatchSubmitter
+
+    batches = [[f"chunk {b}-{i}" for i in range(batch_size)] for b in range(n_batches)]
+    print(f"{n_batches} batches x {batch_size} strings, {latency * 1e3:.0f} ms latency, {error_rate:.0%} 429s")
+    print(f"{'concurrency':>12} {'time (s)':>10} {'requests':>9} {'429s':>6} {'in order':>9}")
+    for concurrency in concurrencies:
+        client = FakeClient(dim=32, latency=latency, error_rate=error_rate)
+        submitter = BatchSubmitter(client, "text-embedding-3-small", concurrency=concurrency,
+                                   requests_per_minute=1e6, base_delay=0.01, cache=EmbeddingCache(":memory:"))
+        start = time.perf_counter()
+        results = list(submitter.map(batches))
+        elapsed = time.perf_counter() - start
+        in_order = all(
+            np.allclose(vectors[i], fake_embedding(text, 32))
+            for batch, vectors in results for i, text in enumerate(batch)
+        )
+        fake = client.embeddings
+        print(f"{concurrency:>12} {elapsed:>10.3f} {fake.requests:>9} {fake.errors:>6} {str(in_order):>9}")
+
+
+def bench_quantized(n: int = 50_000, dim: int = 1024, n_queries: int = 100, k: int = 10,
+                    configs=(("float16", None), ("int8", None), ("float16", 256), ("int8", 256), ("int8", 128)),
+                    reranks=(0, 50, 200)):
+    """
+    Memory per vector and recall@k of QuantizedIndex configurations against exact float32 search.
+    Synthetic vectors aren't Matryoshka-trained, so truncated recall here is a pessimistic bound.
+    """
+    from .index import QuantizedIndex, VectorIndex
+
+    vectors = clustered_vectors(n + n_queries, dim)
+    vectors, queries = vectors[:n], vectors[n:]
+    exact = VectorIndex(vectors)
+    exact_ids = exact.search_batch(queries, k)[0]
+    print(f"{n} x {dim} vectors")
+    print(f"{'codes':>8} {'dims':>5} {'bytes/vec':>10} {'rerank':>7} {'recall@' + str(k):>10} {'ms/query':>10}")
+    print(f"{'float32':>8} {dim:>5} {exact.matrix.itemsize * dim:>10} {'-':>7} {1.0:>10.3f} "
+          f"{_time(lambda: [exact.search(q, k) for q in queries], 1) / n_queries * 1e3:>10.3f}")
+    for dtype, coarse_dims in configs:
+        index = QuantizedIndex(vectors, coarse_dims=coarse_dims, dtype=dtype)
+        for rerank in reranks:
+            elapsed = _time(lambda: [index.search(q, k, rerank=rerank) for q in queries], 1) / n_queries
+            recall = recall_at_k(index.search_batch(queries, k, rerank=rerank)[0], exact_ids)
+            print(f"{dtype:>8} {index.coarse_dims:>5} {index.bytes_per_vector:>10} {rerank:>7} "
+                  f"{recall:>10.3f} {elapsed * 1e3:>10.3f}")
+
+
+def bench_sharded(n: int = 200_000, dim: int = 512, n_queries: int = 64, k: int = 10, processes=(1, 2, 4)):
+    """Batch search latency of one in-process VectorIndex against ShardedIndex over a memory-mapped file."""
+    import numpy as np
+
+    from .index import VectorIndex
+    from .shared import ShardedIndex
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+    index = VectorIndex(vectors)
+    del vectors
+    exact_ids = index.search_batch(queries, k)[0]
+    print(f"{n} x {dim} vectors ({index.matrix.nbytes / 2**20:.0f} MB, mapped once and shared by all workers)")
+    print(f"{'mode':>12} {'ms/batch':>10} {'exact':>6}")
+    print(f"{'in-process':>12} {_time(lambda: index.search_batch(queries, k), 3) * 1e3:>10.2f} {'True':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.npy")
+        index.save(path)
+        for p in processes:
+            sharded = ShardedIndex(path, processes=p)
+            sharded.search_batch(queries[:1], k)  # warm up the pool
+            elapsed = _time(lambda: sharded.search_batch(queries, k), 3)
+            same = bool(np.array_equal(np.sort(sharded.search_batch(queries, k)[0]), np.sort(exact_ids)))
+            sharded.close()
+            print(f"{f'{p} shards':>12} {elapsed * 1e3:>10.2f} {str(same):>6}")
+
+
+def bench_lexical(n_docs: int = 50_000, n_queries: int = 200):
+    """BM25 build time, postings footprint (CSR arrays vs a dict of lists) and keyword-query latency."""
+    import sys
+    from collections import Counter
+
+    import numpy as np
+
+    from .lexical import BM25Index, tokenize
+
+    texts = [synthetic_section(3, seed)[1] + f" NORAD {25000 + seed} Starlink-{seed % 3000}" for seed in range(n_docs)]
+    elapsed = _time(lambda: BM25Index.build(texts), 1)
+    index = BM25Index.build(texts)
+    csr_bytes = index.offsets.nbytes + index.doc_ids.nbytes + index.tfs.nbytes
+    sample = n_docs // 10  # a dict of lists is measured on a tenth of the corpus and scaled up
+    postings = {}
+    for doc_id, text in enumerate(texts[:sample]):
+        for term, tf in Counter(tokenize(text)).items():
+            postings.setdefault(term, ([], []))
+            postings[term][0].append(doc_id)
+            postings[term][1].append(tf)
+    dict_bytes = sum(sys.getsizeof(docs) + sys.getsizeof(tfs) + sum(sys.getsizeof(d) for d in docs)
+                     for docs, tfs in postings.values()) * n_docs / sample
+    print(f"{n_docs} docs, {len(index.vocab)} terms, {len(index.doc_ids)} postings, built in {elapsed:.2f}s")
+    print(f"postings: {csr_bytes / 2**20:.1f} MB as CSR arrays vs ~{dict_bytes / 2**20:.1f} MB as a dict of lists")
+    rng = np.random.default_rng(0)
+    queries = [f"NORAD {25000 + i}" for i in rng.integers(0, n_docs, n_queries)]
+    per_query = _time(lambda: [index.search(q, 10) for q in queries], 3) / n_queries
+    hits = sum(int(index.search(q, 1)[0][0]) == int(q.split()[1]) - 25000 for q in queries)
+    print(f"keyword query: {per_query * 1e3:.3f} ms, top-1 exact match {hits}/{n_queries}, no network calls")
+
+
+def bench_segments(n_docs: int = 20_000, chunks_per_doc: int = 5, dim: int = 1536, n_new: int = 200):
+    """Time to add a day's worth of documents incrementally versus rewriting the whole store."""
+    import numpy as np
+
+    from .segments import SegmentedIndex
+    from .store import write_store
+
+    rng = np.random.default_rng(0)
+
+    def documents(ids):
+        records = [{"text": f"doc {d} chunk {j}", "doc_id": f"doc-{d}"} for d in ids for j in range(chunks_per_doc)]
+        return records, rng.standard_normal((len(records), dim), dtype=np.float32)
+
+    base_records, base_vectors = documents(range(n_docs))
+    new_records, new_vectors = documents(range(n_docs - n_new // 2, n_docs + n_new // 2))  # half updates, half new
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SegmentedIndex(os.path.join(tmp, "segments"))
+        index.add(base_records, base_vectors)
+        snapshot = index.snapshot()
+        upsert = _time(lambda: index.upsert(new_records, new_vectors), 1)
+        delete = _time(lambda: index.delete([f"doc-{d}" for d in range(n_new)]), 1)
+        search = _time(lambda: index.snapshot().search(new_vectors[0], 10), 3)
+        start = time.perf_counter()
+        index.compact()
+        compact = time.perf_counter() - start
+        rewrite = _time(lambda: write_store(os.path.join(tmp, "full.store"), base_records + new_records,
+                                            np.concatenate([base_vectors, new_vectors])), 1)
+        print(f"{n_docs} docs x {chunks_per_doc} chunks of {dim}-dim vectors; update of {n_new} docs")
+        print(f"upsert {upsert:.3f}s, delete {delete:.3f}s vs full rewrite {rewrite:.2f}s")
+        print(f"search over fresh snapshot {search * 1e3:.1f} ms, compaction {compact:.2f}s in the background")
+        print(f"old snapshot still sees {len(snapshot)} rows, current index has {len(index)}")
+
+
+def synthetic_wikitext(n_sections: int, seed: int = 0) -> str:
+    """Build a fake article: a lead paragraph plus `n_sections` == sections with refs and sub-sections."""
+    title, text = synthetic_section(2, seed)
+    parts = [text]
+    for i in range(n_sections):
+        _, body = synthetic_section(3, seed + i + 1)
+        parts.append(f"== Section {i} ==\n{body}<ref>Citation {i}</ref>\n=== Details {i} ===\n{body[:400]}")
+    parts.append("== References ==\n{{reflist}}")
+    return "\n\n".join(parts)
+
+
+def bench_parse(n_pages: int = 200, n_sections: int = 12, processes=(1, 2, 4, None)):
+    """Offline section extraction from a directory of .wiki files, across process-pool sizes."""
+    from .embed import parse_pages
+    from .sources import iter_wiki_dir
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(n_pages):
+            with open(os.path.join(tmp, f"Page_{i:05d}.wiki"), "w", encoding="utf-8") as f:
+                f.write(synthetic_wikitext(n_sections, seed=i))
+        print(f"{n_pages} pages x {n_sections} sections")
+        print(f"{'processes':>10} {'time (s)':>10} {'sections':>9} {'pages/s':>8}")
+        for n in processes:
+            start = time.perf_counter()
+            count = sum(1 for _ in parse_pages(iter_wiki_dir(tmp), processes=n))
+            elapsed = time.perf_counter() - start
+            print(f"{str(n or os.cpu_count()):>10} {elapsed:>10.3f} {count:>9} {n_pages / elapsed:>8.1f}")
+
+
+BENCHMARKS = {
+    "chunker": bench_chunker,
+    "store": bench_store,
+    "ann": bench_ann,
+    "submitter": bench_submitter,
+    "parse": bench_parse,
+    "quantized": bench_quantized,
+    "sharded": bench_sharded,
+    "lexical": bench_lexical,
+    "segments": bench_segments,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run embedding pipeline benchmarks.")
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    args = parser.parse_args()
+    for name in args.names:
+        print(f"\n=== {name} ===")
+        BENCHMARKS[name]()
@@ -0,0 +1,148 @@
+# tomos/embeddings/cache.py
+# Content-addressed, size-bounded embedding cache on SQLite, shared by the ingest
+# (embed.py) and query (embeddings.py) paths.
+#
+# Keys are sha256 over (model, dimensions, text); vectors are stored as raw
+# float32 blobs in an SQLiteLRU table (utils/sqlite_lru.py), which runs in WAL
+# mode so any number of processes can read while one writes.
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from .chunker import get_encoding
+from ..utils.sqlite_lru import SQLiteLRU
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "TOMOS_EMBEDDING_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "tomos", "embeddings.sqlite")
+)
+DEFAULT_MAX_BYTES = 2 * 2**30  # 2 GiB of vectors
+MAX_INPUTS_PER_REQUEST = 2048  # embeddings endpoint limit on inputs per request
+
+# USD per 1M input tokens, used to report what cache hits saved:
+PRICE_PER_MILLION_TOKENS = {
+    "text-embedding-3-small": 0.02,
+    "text-embedding-3-large": 0.13,
+    "text-embedding-ada-002": 0.10,
+}
+
+_COLUMNS = {"model": "TEXT NOT NULL", "dims": "INTEGER NOT NULL", "vector": "BLOB NOT NULL", "tokens": "INTEGER NOT NULL"}
+
+
+def cache_key(model: str, dimensions: int | None, text: str) -> str:
+    """Return the content address of one (model, dimensions, text) embedding."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{dimensions or 0}:{digest}"
+
+
+def count_tokens(model: str, text: str) -> int:
+    """Tokens `text` costs with `model`'s tiktoken encoding (0 for models tiktoken doesn't know)."""
+    try:
+        return len(get_encoding(model).encode(text))
+    except KeyError:  # tiktoken doesn't know the model
+        return 0
+
+
+class EmbeddingCache:
+    """
+    Persistent (model, dimensions, text) -> float32 vector cache.
+
+    Least-recently-used entries are evicted once the stored vectors exceed
+    `max_bytes`. Hit/miss counts and the tokens (and dollars) hits saved are
+    tracked per instance; see stats(). Tokens are counted with
+    `token_counter(model, text)`, count_tokens by default.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, token_counter=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.token_counter = token_counter or count_tokens
+        self._lru = SQLiteLRU(path, "embeddings", _COLUMNS, payload="vector", max_bytes=max_bytes)
+        self._lock = threading.Lock()  # guards the counters below
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = {}
+
+    def get_many(self, model: str, dimensions: int | None, texts: list[str]) -> list[np.ndarray | None]:
+        """Return the cached vector for each text, or None where it is missing."""
+        keys = [cache_key(model, dimensions, t) for t in texts]
+        found = self._lru.get_many(keys, ("vector", "tokens"))
+        results = []
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    vector, tokens = found[key]
+                    results.append(np.frombuffer(vector, dtype=np.float32))
+                    self.hits += 1
+                    self.saved_tokens[model] = self.saved_tokens.get(model, 0) + tokens
+                else:
+                    results.append(None)
+                    self.misses += 1
+        return results
+
+    def put_many(self, model: str, dimensions: int | None, texts: list[str], vectors) -> None:
+        """Store vectors for texts, then evict least-recently-used entries if over the size bound."""
+        self._lru.put_many([
+            {"key": cache_key(model, dimensions, t), "model": model, "dims": dimensions or 0,
+             "vector": np.asarray(v, dtype=np.float32).tobytes(), "tokens": self.token_counter(model, t)}
+            for t, v in zip(texts, vectors)
+        ])
+
+    def stats(self) -> dict:
+        """Hit/miss counts for this instance plus what the hits saved in API tokens and dollars."""
+        entries, size = len(self._lru), self._lru.total_bytes()
+        lookups = self.hits + self.misses
+        saved_cost = sum(tokens / 1e6 * PRICE_PER_MILLION_TOKENS.get(model, 0.0)
+                         for model, tokens in self.saved_tokens.items())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_tokens": sum(self.saved_tokens.values()),
+            "saved_cost": f"${saved_cost:,.4f}",
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self) -> None:
+        self._lru.close()
+
+
+_default_cache = None
+
+
+def get_default_cache() -> EmbeddingCache:
+    """Return the process-wide cache at DEFAULT_CACHE_PATH, opening it on first use."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EmbeddingCache()
+    return _default_cache
+
+
+def embed_texts(
+    texts: list[str],
+    client,
+    model: str,
+    dimensions: int | None = None,
+    cache: EmbeddingCache | None = None,
+) -> list[np.ndarray]:
+    """
+    Embed texts through the cache: hits are served from disk, and only the
+    (de-duplicated) misses are sent to the API, at most MAX_INPUTS_PER_REQUEST
+    per request. Returns float32 vectors in input order.
+    """
+    cache = cache or get_default_cache()
+    vectors = cache.get_many(model, dimensions, texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    fetched = {}
+    extra = {"dimensions": dimensions} if dimensions else {}
+    for start in range(0, len(missing), MAX_INPUTS_PER_REQUEST):
+        batch = missing[start:start + MAX_INPUTS_PER_REQUEST]
+        response = client.embeddings.create(input=batch, model=model, encoding_format="float", **extra)
+        batch_vectors = [None] * len(batch)
+        for be in response.data:
+            batch_vectors[be.index] = np.asarray(be.embedding, dtype=np.float32)
+        cache.put_many(model, dimensions, batch, batch_vectors)
+        fetched.update(zip(batch, batch_vectors))
+    return [v if v is not None else fetched[t] for t, v in zip(texts, vectors)]
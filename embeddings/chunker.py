@@ -0,0 +1,184 @@
+# tomos/embeddings/chunker.py
+import bisect
+import functools
+import os
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import tiktoken
+
+GPT_MODEL = "gpt-4o-mini"  # only matters insofar as it selects which tokenizer to use
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils", "config.txt")
+
+# Fallbacks used when utils/config.txt is missing a setting:
+DEFAULT_CHUNK_CONFIG = {
+    "chunk_size": 768,
+    "overlap": 96,
+    "min_chunk_tokens": 80,
+    "split_order": ["heading", "paragraph", "sentence", "tokens"],
+    "dedupe": True,
+}
+
+# Character-level patterns for each kind of split point. A match's end() is the
+# first character of the text that follows the boundary.
+BOUNDARY_PATTERNS = {
+    "heading": re.compile(r"\n(?==+[^\n]*=+[ \t]*$)", re.MULTILINE),
+    "paragraph": re.compile(r"\n[ \t]*\n\s*"),
+    "sentence": re.compile(r"(?<=[.!?])\s+"),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str = GPT_MODEL) -> "tiktoken.Encoding":
+    """Return the (cached) tiktoken encoding for a model; tiktoken is imported on first use."""
+    import tiktoken  # for counting tokens
+
+    return tiktoken.encoding_for_model(model)
+
+
+def load_chunk_config(path: str = CONFIG_PATH) -> dict:
+    """Return a copy of the chunking settings from utils/config.txt."""
+    config = _read_chunk_config(path)
+    return {**config, "split_order": list(config["split_order"])}
+
+
+@functools.lru_cache(maxsize=None)
+def _read_chunk_config(path: str) -> dict:
+    """
+    Read the chunking settings from utils/config.txt.
+
+    The file is loosely JSON-shaped rather than valid JSON, so only the keys the
+    chunker and ingest need are pulled out with regexes; anything missing falls back to
+    DEFAULT_CHUNK_CONFIG.
+    """
+    config = dict(DEFAULT_CHUNK_CONFIG)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return config
+
+    for key in ("chunk_size", "overlap", "min_chunk_tokens"):
+        m = re.search(rf'"{key}"\s*:\s*(\d+)', text)
+        if m:
+            config[key] = int(m.group(1))
+
+    m = re.search(r'"dedupe"\s*[:=]\s*(true|false)', text, re.IGNORECASE)
+    if m:
+        config["dedupe"] = m.group(1).lower() == "true"
+
+    m = re.search(r'"split_order"\s*:.*?"contents"\s*:\s*\{(.*?)\}', text, re.DOTALL)
+    if m:
+        order = [s for s in re.findall(r'"(\w+)"', m.group(1)) if s in BOUNDARY_PATTERNS or s == "tokens"]
+        if order:
+            config["split_order"] = order
+    return config
+
+
+def _boundary_tokens(text: str, offsets: list[int], pattern: re.Pattern) -> list[int]:
+    """Map every boundary matched by `pattern` in `text` to a token index."""
+    positions = []
+    for m in pattern.finditer(text):
+        idx = bisect.bisect_left(offsets, m.end())
+        if not positions or positions[-1] != idx:
+            positions.append(idx)
+    return positions
+
+
+def _best_split(boundaries: list[int], low: int, high: int) -> int | None:
+    """Return the largest boundary in (low, high], or None."""
+    i = bisect.bisect_right(boundaries, high) - 1
+    if i >= 0 and boundaries[i] > low:
+        return boundaries[i]
+    return None
+
+
+def _first_boundary(boundaries: list[int], low: int, high: int) -> int | None:
+    """Return the smallest boundary in [low, high), or None."""
+    i = bisect.bisect_left(boundaries, low)
+    if i < len(boundaries) and boundaries[i] < high:
+        return boundaries[i]
+    return None
+
+
+def chunk_section(
+    section: tuple[list[str], str],
+    chunk_size: int | None = None,
+    overlap: int | None = None,
+    min_chunk_tokens: int | None = None,
+    split_order: list[str] | None = None,
+    model: str = GPT_MODEL,
+    doc_id: str | None = None,
+) -> list[dict]:
+    """
+    Split a section into chunks of at most `chunk_size` tokens, titles included.
+
+    The section text is encoded exactly once. Split points are looked up by token
+    offset, preferring the coarsest boundary in `split_order` that keeps the chunk
+    at least `min_chunk_tokens` long, and falling back to a hard token cut.
+    Consecutive chunks share up to `overlap` tokens.
+
+    Each chunk is a dict with the chunk string ("text", titles prepended as in
+    split_strings_from_subsection) plus doc_id/title/section metadata and the
+    [start_token, end_token) span of the chunk body within the section text.
+    """
+    config = load_chunk_config()
+    chunk_size = config["chunk_size"] if chunk_size is None else chunk_size
+    overlap = config["overlap"] if overlap is None else overlap
+    min_chunk_tokens = config["min_chunk_tokens"] if min_chunk_tokens is None else min_chunk_tokens
+    split_order = config["split_order"] if split_order is None else split_order
+
+    titles, text = section
+    encoding = get_encoding(model)
+    header = "\n\n".join(titles + [""])
+    budget = max(chunk_size - len(encoding.encode(header)), 1)
+    min_tokens = min(min_chunk_tokens, budget // 2)
+
+    tokens = encoding.encode(text)
+    n = len(tokens)
+    _, offsets = encoding.decode_with_offsets(tokens)
+    char_offsets = offsets + [len(text)]
+    boundaries = {
+        level: _boundary_tokens(text, offsets, BOUNDARY_PATTERNS[level])
+        for level in split_order if level in BOUNDARY_PATTERNS
+    }
+
+    meta = {
+        "doc_id": doc_id if doc_id is not None else (titles[0] if titles else None),
+        "title": titles[0] if titles else "",
+        "section": " > ".join(t.strip("= ") for t in titles[1:]),
+    }
+    chunks = []
+    start = prev_end = 0
+    while start < n:
+        end = n
+        if n - start > budget:
+            end = start + budget
+            for level in split_order:
+                if level not in boundaries:
+                    break  # "tokens": hard cut at the budget
+                split = _best_split(boundaries[level], max(start + min_tokens, prev_end), start + budget)
+                if split is not None:
+                    end = split
+                    break
+        body = text[char_offsets[start]:char_offsets[end]].strip()
+        if body:
+            chunks.append({"text": header + body, **meta, "start_token": start, "end_token": end})
+        if end >= n:
+            break
+        prev_end = end
+        # start the next chunk `overlap` tokens back, snapped forward to a boundary when possible
+        next_start = max(end - overlap, start + 1)
+        snaps = [_first_boundary(b, next_start, end) for b in boundaries.values()]
+        snaps = [s for s in snaps if s is not None]
+        start = min(snaps) if snaps else next_start
+    return chunks
+
+
+def chunk_sections(sections, model: str = GPT_MODEL, **kwargs) -> list[dict]:
+    """Chunk every section in an iterable of (titles, text) tuples."""
+    chunks = []
+    for section in sections:
+        chunks.extend(chunk_section(section, model=model, **kwargs))
+    return chunks
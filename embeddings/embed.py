@@ -1,11 +1,32 @@
 # imports
-import mwclient  # for downloading example Wikipedia articles
-import mwparserfromhell  # for splitting Wikipedia articles into sections
-from openai import OpenAI  # for generating embeddings
+from __future__ import annotations  # annotations name mwclient types without importing it
+import collections  # for the bounded window of in-flight parse jobs
+import hashlib  # for content-hashing chunks
+import itertools  # for grouping chunks by document
+import multiprocessing  # for choosing how parse workers are started
+import queue  # for bounded hand-off between pipeline stages
+import threading  # for running the parsing stages alongside embedding
+from concurrent.futures import ProcessPoolExecutor  # for parsing pages on every core
 import os  # for environment variables
-import pandas as pd  # for DataFrames to store article sections and embeddings
 import re  # for cutting <ref> links out of Wikipedia articles
-import tiktoken  # for counting tokens
+import shutil  # for removing superseded incremental updates
+from typing import TYPE_CHECKING
+# mwclient (downloading Wikipedia articles), mwparserfromhell (splitting them into
+# sections) and openai (generating embeddings) are imported where first used
+
+from .cache import get_default_cache  # on-disk embedding cache
+from .chunker import chunk_section, get_encoding, load_chunk_config  # token-offset chunker
+from .lexical import BM25Index  # keyword index stored alongside the vectors
+from .segments import SegmentedIndex  # incrementally updatable index
+from .sentences import SENTENCES_DIR, SENTENCE_MODEL, iter_sentences  # sentence-level vectors for recursive search
+from .sources import iter_pages  # live site, .wiki directory or XML dump
+from .store import EmbeddingStoreWriter, load_store, replace_store, store_exists  # memory-mapped embedding store
+from .submitter import BatchSubmitter  # concurrent, rate-limited embedding requests
+from ..utils.clients import get_client  # shared OpenAI client, created on first use
+
+if TYPE_CHECKING:
+    import mwclient
+    import mwparserfromhell
 
 # get Wikipedia pages about the 2025 spaceflight events
 # (for demonstration purposes)
@@ -18,13 +39,24 @@ MAX_TOKENS = 1600
 EMBEDDING_MODEL = "text-embedding-3-large"
 BATCH_SIZE = 1000  # you can submit up to 2048 embedding inputs per request
 MAX_TOKENS_PER_REQUEST = 300_000  # max tokens per request for text-embedding-3-large
-
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+CONCURRENCY = 4  # embedding requests in flight at once
+REQUESTS_PER_MINUTE = 3_000  # match these to your account's rate limits
+TOKENS_PER_MINUTE = 1_000_000
+SAVE_PATH = "Spaceflight2025.store"
+STAGING_SUFFIX = ".partial"  # in-progress ingest, resumed if a previous run died
+SEGMENTS_PATH = "Spaceflight2025.segments"  # target of incremental updates (main(update_only=True))
+INDEX_PATH = "Spaceflight2025.index"  # saved search indexes of SAVE_PATH (embeddings.build_index)
+SENTENCE_INDEX = False  # also embed every sentence (with SENTENCE_MODEL) for query-time-free recursive search
+QUEUE_SIZE = 4096  # chunks buffered between the parsing and embedding stages
+WIKI_SOURCE = os.environ.get("TOMOS_WIKI_SOURCE")  # .wiki directory or XML dump; unset = fetch CATEGORY_TITLE
+PARSE_PROCESSES = None  # worker processes for section extraction; None = one per core
 
 def titles_from_category(
     category: mwclient.listing.Category, max_depth: int
 ) -> set[str]:
     """Return a set of page titles in a given Wiki category and its subcategories."""
+    import mwclient
+
     titles = set()
     for cm in category.members():
         if type(cm) == mwclient.page.Page:
@@ -89,19 +121,18 @@ def all_subsections_from_section(
         return results
 
 
-def all_subsections_from_title(
+def all_subsections_from_text(
     title: str,
+    text: str,
     sections_to_ignore: set[str] = SECTIONS_TO_IGNORE,
-    site_name: str = WIKI_SITE
 ) -> list[tuple[list[str], str]]:
-    """From a Wikipedia page title, return a flattened list of all nested subsections.
+    """From a page's title and wikitext, return a flattened list of all nested subsections.
     Each subsection is a tuple, where:
         - the first element is a list of parent subtitles, starting with the page title
         - the second element is the text of the subsection (but not any children)
     """
-    site = mwclient.Site(site_name)
-    page = site.pages[title]
-    text = page.text()
+    import mwparserfromhell
+
     parsed_text = mwparserfromhell.parse(text)
     headings = [str(h) for h in parsed_text.filter_headings()]
     if headings:
@@ -113,6 +144,26 @@ def all_subsections_from_title(
         results.extend(all_subsections_from_section(subsection, [title], sections_to_ignore))
     return results
 
+
+def all_subsections_from_title(
+    title: str,
+    sections_to_ignore: set[str] = SECTIONS_TO_IGNORE,
+    site_name: str = WIKI_SITE,
+    site: mwclient.Site | None = None,
+) -> list[tuple[list[str], str]]:
+    """From a Wikipedia page title, return a flattened list of all nested subsections.
+    Each subsection is a tuple, where:
+        - the first element is a list of parent subtitles, starting with the page title
+        - the second element is the text of the subsection (but not any children)
+    Pass `site` to reuse one connection across many titles.
+    """
+    if site is None:
+        import mwclient
+
+        site = mwclient.Site(site_name)
+    page = site.pages[title]
+    return all_subsections_from_text(title, page.text(), sections_to_ignore)
+
 # clean text
 def clean_section(section: tuple[list[str], str]) -> tuple[list[str], str]:
     """
@@ -136,7 +187,7 @@ def keep_section(section: tuple[list[str], str]) -> bool:
 
 def num_tokens(text: str, model: str = GPT_MODEL) -> int:
     """Return the number of tokens in a string."""
-    encoding = tiktoken.encoding_for_model(model)
+    encoding = get_encoding(model)
     return len(encoding.encode(text))
 
 
@@ -171,7 +222,7 @@ def truncated_string(
     print_warning: bool = True,
 ) -> str:
     """Truncate a string to a maximum number of tokens."""
-    encoding = tiktoken.encoding_for_model(model)
+    encoding = get_encoding(model)
     encoded_string = encoding.encode(string)
     truncated_string = encoding.decode(encoded_string[:max_tokens])
     if print_warning and len(encoded_string) > max_tokens:
@@ -222,84 +273,361 @@ def split_strings_from_subsection(
     # otherwise no split was found, so just truncate (should be very rare)
     return [truncated_string(string, model=model, max_tokens=max_tokens)]
 
-def batch_by_token_limit(strings, max_tokens=MAX_TOKENS_PER_REQUEST, model=GPT_MODEL):
-    batches = []
+def iter_token_batches(items, max_tokens=MAX_TOKENS_PER_REQUEST, model=GPT_MODEL, max_inputs=BATCH_SIZE, key=None):
+    """
+    Lazily pack items, in order, into batches of at most max_tokens tokens and max_inputs items.
+    If `key` is given, items are records and key(item) is the string that is counted.
+    """
     current_batch = []
     current_tokens = 0
-    for s in strings:
-        tokens = num_tokens(s, model=model)
-        if current_tokens + tokens > max_tokens and current_batch:
-            batches.append(current_batch)
+    for item in items:
+        tokens = num_tokens(item if key is None else key(item), model=model)
+        if (current_tokens + tokens > max_tokens or len(current_batch) >= max_inputs) and current_batch:
+            yield current_batch
             current_batch = []
             current_tokens = 0
-        current_batch.append(s)
+        current_batch.append(item)
         current_tokens += tokens
     if current_batch:
-        batches.append(current_batch)
-    return batches
-
-site = mwclient.Site(WIKI_SITE)
-category_page = site.pages[CATEGORY_TITLE]
-titles = titles_from_category(category_page, max_depth=1)
-# ^note: max_depth=1 means we go one level deep in the category tree
-print(f"Found {len(titles)} article titles in {CATEGORY_TITLE}.")
-print(f'{titles}\n')
-
-# split pages into sections
-# may take ~1 minute per 100 articles
-wikipedia_sections = []
-wikipedia_sections = [clean_section(ws) for ws in wikipedia_sections]
-for title in titles:
-    wikipedia_sections.extend(all_subsections_from_title(title))
-print(f"Found {len(wikipedia_sections)} sections in {len(titles)} pages.")
-
-original_num_sections = len(wikipedia_sections)
-wikipedia_sections = [ws for ws in wikipedia_sections if keep_section(ws)]
-print(f"Filtered out {original_num_sections-len(wikipedia_sections)} sections, leaving {len(wikipedia_sections)} sections.")
-
-# print example data
-for ws in wikipedia_sections[:5]:
-    print(ws[0])
-    print(f'{ws[1][:77]} + "..."')
-    print()
-
-# split sections into chunks
-wikipedia_strings = []
-for section in wikipedia_sections:
-    wikipedia_strings.extend(split_strings_from_subsection(section, max_tokens=MAX_TOKENS))
-
-print(f"{len(wikipedia_sections)} Wikipedia sections split into {len(wikipedia_strings)} strings.")
-
-# print example data
-print(wikipedia_strings[1])
-
-# Use the batching function
-batches = batch_by_token_limit(wikipedia_strings, max_tokens=MAX_TOKENS_PER_REQUEST, model=GPT_MODEL)
-
-
-embeddings = []
-"""
-for batch_start in range(0, len(wikipedia_strings), BATCH_SIZE):
-    batch_end = batch_start + BATCH_SIZE
-    batch = wikipedia_strings[batch_start:batch_end]
-    print(f"Batch {batch_start} to {batch_end-1}")
-    response = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
-    for i, be in enumerate(response.data):
-        assert i == be.index  # double check embeddings are in same order as input
-    batch_embeddings = [e.embedding for e in response.data]
-    embeddings.extend(batch_embeddings)
-"""
-for batch_num, batch in enumerate(batches):
-    print(f"Batch {batch_num+1}/{len(batches)}: {len(batch)} strings")
-    response = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
-    for i, be in enumerate(response.data):
-        assert i == be.index
-    batch_embeddings = [e.embedding for e in response.data]
-    embeddings.extend(batch_embeddings)
-    
-
-df = pd.DataFrame({"text": wikipedia_strings, "embedding": embeddings})
-
-# save document chunks and embeddings
-SAVE_PATH = "Spaceflight2025.csv"
-df.to_csv(SAVE_PATH, index=False)
\ No newline at end of file
+        yield current_batch
+
+def batch_by_token_limit(strings, max_tokens=MAX_TOKENS_PER_REQUEST, model=GPT_MODEL, max_inputs=BATCH_SIZE):
+    """Pack strings, in order, into batches of at most max_tokens tokens and max_inputs strings."""
+    return list(iter_token_batches(strings, max_tokens=max_tokens, model=model, max_inputs=max_inputs))
+
+# pipeline stages: each takes and returns an iterator, so nothing is materialized
+
+def iter_sections(titles, sections_to_ignore: set[str] = SECTIONS_TO_IGNORE, site_name: str = WIKI_SITE):
+    """Source stage: yield every subsection of every titled page, over one site connection."""
+    import mwclient
+
+    site = mwclient.Site(site_name)
+    for title in titles:
+        yield from all_subsections_from_title(title, sections_to_ignore=sections_to_ignore, site=site)
+
+def clean_and_filter(sections):
+    """Yield cleaned sections, skipping the ones keep_section rejects."""
+    for section in sections:
+        section = clean_section(section)
+        if keep_section(section):
+            yield section
+
+def sections_from_page(page: tuple[str, str]) -> list[tuple[list[str], str]]:
+    """Extract, clean and filter the sections of one (title, wikitext) page (runs in a worker)."""
+    title, text = page
+    return list(clean_and_filter(all_subsections_from_text(title, text)))
+
+def parse_pages(pages, processes: int | None = PARSE_PROCESSES):
+    """
+    Yield the cleaned sections of every (title, wikitext) page, in page order.
+    Pages are parsed on a process pool with a bounded number in flight;
+    processes=1 parses in this process. The pool is created lazily, on the
+    thread that runs this generator (a threaded() producer in main), so its
+    workers come from a forkserver (or spawn) rather than a fork of a
+    multithreaded process.
+    """
+    if processes == 1:
+        for page in pages:
+            yield from sections_from_page(page)
+        return
+    in_flight = 4 * (processes or os.cpu_count() or 1)
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(method)) as executor:
+        pending = collections.deque()
+        for page in pages:
+            pending.append(executor.submit(sections_from_page, page))
+            if len(pending) >= in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def iter_chunks(sections, model: str = GPT_MODEL):
+    """Yield the chunks of each section (settings from utils/config.txt)."""
+    for section in sections:
+        yield from chunk_section(section, model=model)
+
+def threaded(iterable, maxsize: int = QUEUE_SIZE):
+    """
+    Run an iterator on a background thread, handing items over through a bounded queue.
+    The producer blocks when the consumer falls `maxsize` items behind; errors raised
+    by the producer are re-raised in the consumer.
+    """
+    done = object()
+    items = queue.Queue(maxsize=maxsize)
+    error = []
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except BaseException as exc:
+            error.append(exc)
+        finally:
+            items.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while (item := items.get()) is not done:
+        yield item
+    if error:
+        raise error[0]
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def write_sentences(texts, submitter, path: str) -> None:
+    """
+    Embed every sentence of `texts` (the store's chunk texts, in row order) into a
+    sentence store at `path`, keeping only the parent row and character offsets.
+    """
+    batches = iter_token_batches(iter_sentences(texts), max_tokens=MAX_TOKENS_PER_REQUEST, model=GPT_MODEL,
+                                 key=lambda sentence: sentence["text"])
+    with EmbeddingStoreWriter(path, model=submitter.model) as writer:
+        for batch, batch_embeddings in submitter.map(batches, key=lambda sentence: sentence["text"]):
+            writer.write([{k: s[k] for k in ("chunk", "start", "end")} for s in batch], batch_embeddings)
+            writer.flush()
+        writer.compact()
+    print(f"Embedded {writer.count} sentences.")
+
+
+def ingest(chunks, submitter, save_path: str = SAVE_PATH, dedupe: bool = True, sentence_submitter=None,
+           segments_path: str | None = None, index_path: str | None = None) -> None:
+    """
+    Sink stage: embed a stream of chunks into the store at save_path, checkpointing
+    after every batch. Chunks are consumed lazily and batched as they arrive.
+
+    Work goes to a staging store (save_path + STAGING_SUFFIX) that is flushed per
+    batch; if a run dies, the next run resumes from the last completed batch.
+    The staging store replaces save_path only once everything is embedded.
+
+    With dedupe, chunks are keyed by a sha256 of their text: duplicate chunks are
+    dropped, chunks already in the previous store reuse their vectors, and only new
+    or changed chunks are embedded. Chunks that no longer exist are not carried over.
+    Only the hashes are kept for the whole corpus; text and vectors are held per batch.
+    Once everything is embedded, a BM25 index over the chunk texts is written into
+    the store for hybrid and keyword search, and, given a sentence_submitter, the
+    sentence store used by recursive search (see sentences.py).
+    The new store holds every document, so the segmented index at segments_path
+    (incremental updates made since the previous ingest) is removed with it, as
+    are the indexes built from the old store at index_path.
+    """
+    staging_path = save_path + STAGING_SUFFIX
+    previous, previous_rows = None, {}
+    if dedupe and store_exists(save_path):
+        previous = load_store(save_path)
+        if "content_hash" in previous.meta:
+            previous_rows = {h: i for i, h in enumerate(previous.meta["content_hash"])}
+
+    counts = {"reused": 0, "embedded": 0}
+    with EmbeddingStoreWriter(staging_path, model=submitter.model, resume=True) as writer:
+        if writer.count:
+            print(f"Resuming from checkpoint with {writer.count} chunks already embedded.")
+        done = set(load_store(staging_path).meta["content_hash"]) if dedupe and writer.count else set()
+        skip = 0 if dedupe else writer.count
+        seen = set()
+        reused = []
+
+        def write_reused():
+            rows = [previous_rows[chunk["content_hash"]] for chunk in reused]
+            writer.write(reused, previous.vectors[rows])
+            writer.flush()
+            counts["reused"] += len(reused)
+            reused.clear()
+
+        def to_embed():
+            """Yield the chunks that need embedding; unchanged ones are copied over as they pass."""
+            nonlocal skip
+            for chunk in chunks:
+                chunk["content_hash"] = h = content_hash(chunk["text"])
+                if not dedupe:
+                    if skip:
+                        skip -= 1  # already in the checkpoint
+                        continue
+                elif h in seen:
+                    continue
+                else:
+                    seen.add(h)
+                    if h in done:
+                        continue
+                    if h in previous_rows:
+                        reused.append(chunk)
+                        if len(reused) >= BATCH_SIZE:
+                            write_reused()
+                        continue
+                yield chunk
+
+        batches = iter_token_batches(to_embed(), max_tokens=MAX_TOKENS_PER_REQUEST, model=GPT_MODEL,
+                                     key=lambda chunk: chunk["text"])
+        for batch_num, (batch, batch_embeddings) in enumerate(submitter.map(batches, key=lambda chunk: chunk["text"])):
+            print(f"Batch {batch_num+1}: {len(batch)} strings")
+            writer.write(batch, batch_embeddings)
+            writer.flush()  # checkpoint
+            counts["embedded"] += len(batch)
+        if reused:
+            write_reused()
+        writer.compact()
+    texts = load_store(staging_path).texts
+    BM25Index.build(texts).save(staging_path)
+    if sentence_submitter is not None:
+        write_sentences(texts, sentence_submitter, os.path.join(staging_path, SENTENCES_DIR))
+
+    dropped = len(set(previous_rows) - seen)
+    print(f"Reused {counts['reused']} unchanged chunks, embedded {counts['embedded']} new or changed chunks, dropped {dropped} stale chunks.")
+    previous = None  # release the memmap before the old store is moved aside
+    replace_store(staging_path, save_path)
+    if index_path and os.path.exists(index_path):
+        shutil.rmtree(index_path)  # rebuilt from the new store on next load
+    if segments_path and os.path.exists(segments_path):
+        shutil.rmtree(segments_path)
+        print(f"Removed incremental updates in {segments_path} (superseded by the new store).")
+
+
+def iter_documents(chunks, group_size: int = BATCH_SIZE):
+    """
+    Group a stream of chunks into lists of about `group_size` chunks without
+    splitting a document: chunks of one doc_id arrive together (pages keep their
+    order through parse_pages), and a group only ends between documents.
+    """
+    group = []
+    for chunk in chunks:
+        if len(group) >= group_size and chunk["doc_id"] != group[-1]["doc_id"]:
+            yield group
+            group = []
+        group.append(chunk)
+    if group:
+        yield group
+
+
+def _base_hashes(save_path: str) -> dict:
+    """doc_id -> content_hash of each chunk, in order, for the documents in the store at save_path."""
+    if not store_exists(save_path):
+        return {}
+    meta = load_store(save_path).meta
+    if "doc_id" not in meta or "content_hash" not in meta:
+        return {}
+    hashes = {}
+    for doc_id, h in zip(meta["doc_id"], meta["content_hash"]):
+        hashes.setdefault(doc_id, []).append(h)
+    return hashes
+
+
+def update(chunks, submitter, index_path: str = SEGMENTS_PATH, save_path: str = SAVE_PATH) -> None:
+    """
+    Sink stage for incremental updates: upsert each document's chunks into the
+    segmented index at index_path, replacing any earlier version of the document.
+    Chunks are keyed by content_hash like in ingest: duplicate chunks within a
+    document are dropped, and documents whose chunks are unchanged from the
+    version already searched (in the segments, or else in the store at
+    save_path) are skipped. Only new or changed documents are embedded and
+    written; existing segments are left alone until compaction, which runs at
+    the end if enough has changed.
+
+    The store's BM25 and sentence indexes are not touched: load_lexical rebuilds
+    BM25 over the merged rows when the corpus is loaded, and recursive search
+    refines segment rows at query time (see embeddings.refine_substrings).
+    """
+    index = SegmentedIndex(index_path, model=submitter.model)
+    base = _base_hashes(save_path)
+    deleted = set(index.manifest.get("deleted_docs", ()))
+    n_docs = n_chunks = n_unchanged = 0
+
+    def changed(chunks):
+        nonlocal n_unchanged
+        for doc_id, doc in itertools.groupby(chunks, key=lambda chunk: chunk["doc_id"]):
+            unique = {}
+            for chunk in doc:
+                chunk["content_hash"] = h = content_hash(chunk["text"])
+                unique.setdefault(h, chunk)
+            doc = list(unique.values())
+            current = index.doc_hashes(doc_id)
+            if current is None and doc_id not in deleted:
+                current = base.get(doc_id)
+            if current == [chunk["content_hash"] for chunk in doc]:
+                n_unchanged += 1
+                continue
+            yield from doc
+
+    for group in iter_documents(changed(chunks)):
+        batches = iter_token_batches(group, max_tokens=MAX_TOKENS_PER_REQUEST, model=GPT_MODEL,
+                                     key=lambda chunk: chunk["text"])
+        vectors = [v for _, batch_vectors in submitter.map(batches, key=lambda chunk: chunk["text"])
+                   for v in batch_vectors]
+        index.upsert(group, vectors)
+        n_docs += len({chunk["doc_id"] for chunk in group})
+        n_chunks += len(group)
+        print(f"Upserted {n_docs} documents ({n_chunks} chunks).")
+    print(f"Skipped {n_unchanged} unchanged documents.")
+    if index.needs_compaction():
+        print("Compacting segments.")
+        index.compact()
+
+
+def main(update_only: bool = False, sentences: bool = SENTENCE_INDEX):
+    """
+    Stream pages through source -> sections -> clean/filter -> chunk (on a
+    background thread, with sections parsed on a process pool) -> batch -> embed
+    -> store, so embedding starts while pages are still being read and parsed.
+
+    Pages come from WIKI_SOURCE (a directory of .wiki files or a MediaWiki XML
+    dump) when set, otherwise CATEGORY_TITLE is fetched from WIKI_SITE.
+    With update_only, the pages are upserted into the segmented index at
+    SEGMENTS_PATH instead of rewriting the store at SAVE_PATH. With sentences,
+    the store also gets a sentence-level index for recursive search.
+    """
+    client = get_client()
+
+    titles = None
+    if WIKI_SOURCE is None:
+        import mwclient
+
+        site = mwclient.Site(WIKI_SITE)
+        category_page = site.pages[CATEGORY_TITLE]
+        titles = sorted(titles_from_category(category_page, max_depth=1))  # stable order for resumable ingest
+        # ^note: max_depth=1 means we go one level deep in the category tree
+        print(f"Found {len(titles)} article titles in {CATEGORY_TITLE}.")
+        print(f'{titles}\n')
+    else:
+        print(f"Reading pages from {WIKI_SOURCE}.")
+
+    # split pages into sections, then into chunks (sizes, overlap and split order come from utils/config.txt)
+    # fetching may take ~1 minute per 100 articles, overlapped with embedding
+    pages = iter_pages(WIKI_SOURCE, titles=titles, site_name=WIKI_SITE)
+    sections = parse_pages(pages, processes=PARSE_PROCESSES)
+    chunks = threaded(iter_chunks(sections, model=GPT_MODEL), maxsize=QUEUE_SIZE)
+
+    # embed batches concurrently (only cache misses hit the API) and checkpoint
+    # them, with their chunk metadata, into the store
+    submitter = BatchSubmitter(
+        client,
+        EMBEDDING_MODEL,
+        concurrency=CONCURRENCY,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+    )
+    if update_only:
+        update(chunks, submitter, index_path=SEGMENTS_PATH, save_path=SAVE_PATH)
+    else:
+        sentence_submitter = None
+        if sentences:
+            sentence_submitter = BatchSubmitter(
+                client,
+                SENTENCE_MODEL,
+                concurrency=CONCURRENCY,
+                requests_per_minute=REQUESTS_PER_MINUTE,
+                tokens_per_minute=TOKENS_PER_MINUTE,
+            )
+        ingest(chunks, submitter, save_path=SAVE_PATH, dedupe=load_chunk_config()["dedupe"],
+               sentence_submitter=sentence_submitter, segments_path=SEGMENTS_PATH, index_path=INDEX_PATH)
+    print(f"Embedding cache: {get_default_cache().stats()}")
+
+
+# run as a module from the directory above tomos/: python -m tomos.embeddings.embed
+# (add --update to upsert the pages into the segmented index instead)
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embed wiki pages into the TomOS store.")
+    parser.add_argument("--update", action="store_true", help=f"upsert pages into {SEGMENTS_PATH}")
+    parser.add_argument("--sentences", action="store_true", help="also store sentence-level embeddings")
+    args = parser.parse_args()
+    main(update_only=args.update, sentences=args.sentences or SENTENCE_INDEX)
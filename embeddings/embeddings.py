@@ -1,10 +1,21 @@
+import json
 import numpy as np
-from openai import OpenAI
-import pandas as pd
 import os
 import re
+import threading
+from collections import OrderedDict
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+from .cache import embed_texts, get_default_cache
+from .index import QuantizedIndex, VectorIndex, normalize_rows
+from .lexical import BM25Index, is_keyword_query, reciprocal_rank_fusion
+from ..utils.clients import get_client  # shared OpenAI client, created on first use
+# store.py (pandas/pyarrow), ann.py, shared.py and sentences.py are imported by the
+# functions that load or build indexes, so importing this module stays cheap
+
+QUERY_MODEL = "text-embedding-3-small"  # model used to embed search queries
+MEMO_SIZE = 10_000  # (model, text) -> embedding entries kept in memory
+_embedding_memo = OrderedDict()
+_memo_lock = threading.Lock()  # get_embeddings runs on server and batch worker threads
 
 
 # Cosine similarity function
@@ -16,14 +27,10 @@ def cosine_similarity(a, b):
 
 # Embeddings example function:
 def embeddings_call(thisOS) -> list[float]:
-    embedding = thisOS.client.embeddings.create(
-        input="Your text string goes here",
-        model="text-embedding-3-small",
-        encoding_format="float"
-    )
+    embedding = embed_texts(["Your text string goes here"], thisOS.client, model="text-embedding-3-small")[0]
 
-    print(embedding.data[0].embedding)
-    return embedding.data[0].embedding
+    print(embedding)
+    return embedding
 
 def normalize_l2(x):
     x = np.array(x)
@@ -41,20 +48,130 @@ def cut_and_normalize(thisOS: object) -> list[float]:
     norm_dim = normalize_l2(cut_dim)
     return norm_dim
 
+def get_embeddings(texts, client, model="text-embedding-3-small"):
+    """
+    Embed a list of texts, batching every text not already memoized by (model, text)
+    into as few embeddings requests as possible. Returns embeddings in input order.
+    Memo misses go through the persistent on-disk cache before reaching the API.
+    The memo lock is not held during that request.
+    """
+    with _memo_lock:
+        found = {t: _embedding_memo[(model, t)] for t in texts if (model, t) in _embedding_memo}
+    missing = list(dict.fromkeys(t for t in texts if t not in found))
+    if missing:
+        found.update(zip(missing, embed_texts(missing, client, model=model)))
+    with _memo_lock:
+        for t in dict.fromkeys(texts):
+            _embedding_memo[(model, t)] = found[t]
+            _embedding_memo.move_to_end((model, t))
+        while len(_embedding_memo) > MEMO_SIZE:
+            _embedding_memo.popitem(last=False)
+    return [found[t] for t in texts]
+
 def get_embedding(text, client, model="text-embedding-3-small"):
-    response = client.embeddings.create(
-        input=text,
-        model=model,
-        encoding_format="float"
-    )
-    return response.data[0].embedding
-
-def search_embeddings(df, product_description, n=3, pprint=True):
-    embedding = get_embedding(product_description, client, model='text-embedding-3-small')
-    df['similarities'] = df.ada_embedding.apply(lambda x: cosine_similarity(x, embedding))
-    res = df.sort_values('similarities', ascending=False).head(n)
+    return get_embeddings([text], client, model=model)[0]
+
+def _source_path(index_path):
+    """Sidecar file recording which version of the store a saved index was built from."""
+    return os.path.splitext(index_path)[0] + ".source.json"
+
+def _is_current(index_path, store):
+    """Whether the index saved at index_path was built from this version of the store."""
+    try:
+        with open(_source_path(index_path), "r", encoding="utf-8") as f:
+            return json.load(f) == store.signature
+    except (OSError, ValueError):
+        return False
+
+def _mark_current(index_path, store):
+    tmp_path = f"{_source_path(index_path)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(store.signature, f)
+    os.replace(tmp_path, _source_path(index_path))
+
+def build_index(store, kind="exact", dims=1536, path=None):
+    """
+    Return a search index over a store's vectors.
+    - kind: "exact" for a VectorIndex, "ivf" for an approximate IVFIndex,
+      "int8"/"float16" for a QuantizedIndex (256-dim compressed first pass,
+      exact re-rank of the shortlist from the store), "mmap" for a VectorIndex
+      memory-mapped from disk (one shared copy across worker processes), or
+      "sharded" for exact search split across a process pool over that file
+    - path: directory where built indexes are saved/loaded, so they are only built once;
+      a saved index is rebuilt when the store has been rewritten since (see EmbeddingStore.signature)
+    """
+    if kind == "exact":
+        return VectorIndex.from_store(store, dims=dims)
+    elif kind in ("int8", "float16"):
+        return QuantizedIndex.from_store(store, dims=dims, coarse_dims=256, dtype=kind)
+    elif kind == "ivf":
+        from .ann import IVFIndex
+
+        ivf_path = os.path.join(path, "ivf") if path else None
+        if ivf_path and os.path.exists(ivf_path) and _is_current(ivf_path, store):
+            return IVFIndex.load(ivf_path)
+        index = IVFIndex.from_store(store, dims=dims)
+        if ivf_path:
+            index.save(ivf_path)
+            _mark_current(ivf_path, store)
+        return index
+    elif kind in ("mmap", "sharded"):
+        if not path:
+            raise ValueError(f"Index kind {kind!r} needs a path to memory-map the index from")
+        matrix_path = os.path.join(path, f"exact-{dims}.npy")
+        if not (os.path.exists(matrix_path) and _is_current(matrix_path, store)):
+            os.makedirs(path, exist_ok=True)
+            tmp_path = f"{matrix_path}.{os.getpid()}.tmp.npy"  # workers may race to build it
+            VectorIndex.from_store(store, dims=dims).save(tmp_path)
+            os.replace(tmp_path, matrix_path)
+            _mark_current(matrix_path, store)
+        if kind == "mmap":
+            return VectorIndex.load(matrix_path)
+        from .shared import ShardedIndex
+
+        return ShardedIndex(matrix_path)
+    raise ValueError(f"Unknown index kind: {kind}")
+
+def _index_for(df, index=None) -> VectorIndex:
+    """Return `index`, or build one from the DataFrame's ada_embedding column."""
+    if index is None:
+        index = VectorIndex(np.stack(df.ada_embedding.values))
+    return index
+
+def search_embeddings(df, product_description, n=3, pprint=True, index=None):
+    """
+    Return the n rows of `df` most similar to the query, with a 'similarities' column.
+    Pass a prebuilt index over df's rows (see build_index) to avoid rebuilding it
+    per query and to choose between exact and approximate (IVF) search.
+    """
+    embedding = get_embedding(product_description, get_client(), model=QUERY_MODEL)
+    rows, sims = _index_for(df, index).search(embedding, n)
+    res = df.iloc[rows].assign(similarities=sims)
     return res
 
+HYBRID_CANDIDATES = 50  # rows taken from each ranking before fusion
+
+def hybrid_search(df, query, n=3, index=None, lexical=None, fast_path=True, candidates=HYBRID_CANDIDATES):
+    """
+    Return the n best rows of `df` for the query by fusing BM25 and vector rankings
+    with reciprocal rank fusion, with an 'rrf' score column.
+    With fast_path, keyword-shaped queries (mission names, NORAD IDs, orbit
+    parameters; see is_keyword_query) are answered from the BM25 index alone, with
+    a 'bm25' score column and no embeddings request, whenever any row matches.
+    """
+    if lexical is None:
+        lexical = BM25Index.build(df['text'])
+    if fast_path and is_keyword_query(query):
+        rows, scores = lexical.search(query, n)
+        if len(rows):
+            return df.iloc[rows].assign(bm25=scores)
+    embedding = get_embedding(query, get_client(), model=QUERY_MODEL)
+    candidates = max(n, candidates)  # each ranking must reach at least n rows
+    vector_rows, _ = _index_for(df, index).search(embedding, candidates)
+    lexical_rows, _ = lexical.search(query, candidates)
+    rows, fused = reciprocal_rank_fusion([vector_rows, lexical_rows], n=n)
+    return df.iloc[rows].assign(rrf=fused)
+
 '''
 df = pd.read_csv('Spaceflight2025.csv')
 df['ada_embedding'] = df.embedding.apply(eval).apply(lambda x: np.array(x[:1536]))
@@ -68,61 +185,159 @@ def split_into_sentences(text):
     # Simple sentence splitter (can be improved)
     return re.split(r'(?<=[.!?]) +', text)
 
+def _similarities(texts, query_embedding, client) -> np.ndarray:
+    """Cosine similarity of each text to the query, embedding all texts in one batch."""
+    if not texts:
+        return np.empty(0, dtype=np.float32)
+    query = normalize_rows(np.asarray(query_embedding)[None, :])[0]
+    return normalize_rows(get_embeddings(texts, client)) @ query
+
+def substring_search(texts, query_embedding, client, depth=2, top_k=2):
+    """
+    Breadth-first version of recursive_substring_search over several texts at once.
+    Each level's sentences (across all texts) are embedded in one batched request,
+    so a search costs about `depth` round trips however many sentences there are.
+    Returns one list of (substring, similarity) per input text.
+    """
+    # frontier entries: (index of the source text, substring, similarity or None)
+    frontier = [(i, text, None) for i, text in enumerate(texts)]
+    for _ in range(depth):
+        next_frontier = []
+        candidates = []
+        for i, text, sim in frontier:
+            if len(text) < 10:
+                next_frontier.append((i, text, sim))  # too short to split any further
+            else:
+                candidates.append((i, [s for s in split_into_sentences(text) if len(s.strip()) > 0]))
+        sims = _similarities([s for _, subs in candidates for s in subs], query_embedding, client)
+        offset = 0
+        for i, subs in candidates:
+            scored = list(zip(subs, sims[offset:offset + len(subs)]))
+            offset += len(subs)
+            # Sort by similarity
+            scored.sort(key=lambda x: x[1], reverse=True)
+            next_frontier.extend((i, sub, sim) for sub, sim in scored[:top_k])
+        frontier = next_frontier
+
+    # score anything that was never embedded (depth == 0 or short input texts)
+    unscored = [text for _, text, sim in frontier if sim is None]
+    leftover = iter(_similarities(unscored, query_embedding, client))
+    results = [[] for _ in texts]
+    for i, text, sim in frontier:
+        results[i].append((text, sim if sim is not None else next(leftover)))
+    return results
+
 def recursive_substring_search(text, query_embedding, client, depth=2, top_k=2):
     """
-    Recursively search for substrings with maximum similarity.
+    Search for substrings with maximum similarity, refining the top_k sentences per level.
     - text: the text to search within
     - query_embedding: embedding of the search query
-    - depth: recursion depth
-    - top_k: number of top substrings to recurse into at each level
-    """
-    if depth == 0 or len(text) < 10:
-        return [(text, cosine_similarity(get_embedding(text, client), query_embedding))]
-    
-    substrings = split_into_sentences(text)
-    results = []
-    for substring in substrings:
-        if len(substring.strip()) == 0:
-            continue
-        emb = get_embedding(substring, client)
-        sim = cosine_similarity(emb, query_embedding)
-        results.append((substring, sim))
-    
-    # Sort by similarity
-    results.sort(key=lambda x: x[1], reverse=True)
-    top_results = results[:top_k]
-    
-    # Recurse into top substrings
-    final_results = []
-    for substring, sim in top_results:
-        deeper = recursive_substring_search(substring, query_embedding, client, depth-1, top_k)
-        final_results.extend(deeper)
-    
-    return final_results
-
-def search_embeddings_recursive(df, product_description, n=3, depth=2, top_k=2):
-    query_embedding = get_embedding(product_description, client, model='text-embedding-3-small')
-    df['similarities'] = df.ada_embedding.apply(lambda x: cosine_similarity(x, query_embedding))
-    top_rows = df.sort_values('similarities', ascending=False).head(n)
-    
+    - depth: number of refinement levels
+    - top_k: number of top substrings to refine at each level
+    """
+    return substring_search([text], query_embedding, client, depth=depth, top_k=top_k)[0]
+
+def refine_substrings(rows, texts, query_embedding, sentences=None, depth=2, top_k=2):
+    """
+    Best substrings of each chunk: from the SentenceIndex for the rows it covers,
+    and with substring_search (query-time embeddings) for the rest, e.g. rows
+    added through the segmented index since the last full ingest.
+    """
+    per_text = [None] * len(texts)
+    rest = []
+    for i, (row, text) in enumerate(zip(rows, texts)):
+        if sentences is not None and sentences.covers(row):
+            per_text[i] = sentences.search(row, text, query_embedding, top_k)
+        else:
+            rest.append(i)
+    if rest:
+        found = substring_search([texts[i] for i in rest], query_embedding, get_client(), depth=depth, top_k=top_k)
+        for i, substrings in zip(rest, found):
+            per_text[i] = substrings
+    return per_text
+
+def search_embeddings_recursive(df, product_description, n=3, depth=2, top_k=2, index=None, sentences=None):
+    """
+    Return the n best substrings (sentences) of the n chunks most similar to the query.
+    With a precomputed SentenceIndex (see load_sentences), refinement is a local
+    dot product over each chunk's stored sentence vectors, so the query embedding
+    is the only API call; `depth` is then moot, since a sentence splits no further.
+    """
+    query_embedding = get_embedding(product_description, get_client(), model=QUERY_MODEL)
+    rows, _ = _index_for(df, index).search(query_embedding, n)
+    texts = list(df.iloc[rows]['text'])
+
+    per_text = refine_substrings(rows, texts, query_embedding, sentences=sentences, depth=depth, top_k=top_k)
     substring_results = []
-    for _, row in top_rows.iterrows():
-        text = row['text']  # Change 'review' to your text column name
-        substrings = recursive_substring_search(text, query_embedding, client, depth=depth, top_k=top_k)
+    for substrings in per_text:
         substring_results.extend(substrings)
-    
+
     # Sort all substrings found by similarity
     substring_results.sort(key=lambda x: x[1], reverse=True)
     return substring_results[:n]
 
+STORE_PATH = 'Spaceflight2025.store'
+INDEX_KIND = 'exact'  # 'ivf' / 'int8' / 'float16' approximate; 'mmap' / 'sharded' for multi-process serving
+INDEX_PATH = 'Spaceflight2025.index'
+SEGMENTS_PATH = 'Spaceflight2025.segments'  # incremental updates (embed.py --update), searched on top of the store
+
+def load_corpus(store_path=STORE_PATH, kind=INDEX_KIND, index_path=INDEX_PATH, dims=1536, segments_path=SEGMENTS_PATH):
+    """
+    Open the embedding store (migrating the old CSV once if needed) and build its search index.
+    If there is a segmented index at segments_path, its current snapshot is searched
+    together with the store: the result is then the merged metadata and a
+    segments.MergedIndex, which never returns deleted or superseded rows.
+    """
+    from .segments import MergedIndex, read_snapshot
+    from .store import convert_csv, load_store
+
+    if not os.path.exists(store_path):
+        convert_csv('Spaceflight2025.csv', store_path)  # one-time migration of the old CSV output
+    store = load_store(store_path)
+    index = build_index(store, kind=kind, dims=dims, path=index_path)  # built once, reused for every query
+    snapshot = read_snapshot(segments_path, dims=dims) if segments_path else None
+    if snapshot is None:
+        return store.meta, index
+    merged = MergedIndex(store.meta, index, snapshot)
+    return merged.meta, merged
+
+def load_lexical(store_path=STORE_PATH, index=None):
+    """
+    Open the store's BM25 index, building and saving it first for stores written before it existed.
+    Pass the index from load_corpus: for a MergedIndex, BM25 is built in memory over
+    the merged rows instead, since the stored one only covers the base store.
+    """
+    from .segments import MergedIndex
+    from .store import load_store
+
+    if isinstance(index, MergedIndex):
+        return index.lexical()
+    if not BM25Index.exists(store_path):
+        BM25Index.build(load_store(store_path).texts).save(store_path)
+    return BM25Index.load(store_path)
+
+def load_sentences(store_path=STORE_PATH):
+    """
+    Open the store's sentence index, or return None if it was ingested without one.
+    It covers the store's rows only; see refine_substrings for rows from segments.
+    """
+    from .sentences import SentenceIndex
+    from .store import load_store
+
+    if not SentenceIndex.exists(store_path):
+        return None
+    return SentenceIndex.load(store_path, n_chunks=load_store(store_path).count)
+
 # --- Usage ---
-df = pd.read_csv('Spaceflight2025.csv')
-df['ada_embedding'] = df.embedding.apply(eval).apply(lambda x: np.array(x[:1536]))
-search_query = input("Enter search term: ")
-number_of_results = input("Enter number of results to return: ")
-n = int(number_of_results) if number_of_results.isdigit() else 3
+if __name__ == "__main__":
+    df, index = load_corpus()
+    sentences = load_sentences()
+    search_query = input("Enter search term: ")
+    number_of_results = input("Enter number of results to return: ")
+    n = int(number_of_results) if number_of_results.isdigit() else 3
 
-# Make sure your DataFrame has a 'review' column or change to the correct column name
-results = search_embeddings_recursive(df, search_query, n=n, depth=2, top_k=2)
-for substring, sim in results:
-    print(f"Similarity: {sim:.4f} | Substring: {substring}")
\ No newline at end of file
+    # Make sure your DataFrame has a 'review' column or change to the correct column name
+    results = search_embeddings_recursive(df, search_query, n=n, depth=2, top_k=2, index=index, sentences=sentences)
+    for substring, sim in results:
+        print(f"Similarity: {sim:.4f} | Substring: {substring}")
+    print(f"Embedding cache: {get_default_cache().stats()}")
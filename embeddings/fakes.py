@@ -0,0 +1,88 @@
+# tomos/embeddings/fakes.py
+# Local stand-ins for the OpenAI embeddings client, for benchmarks and offline runs.
+import hashlib
+import random
+import threading
+import time
+import types
+
+import numpy as np
+
+
+class FakeAPIError(Exception):
+    """Mimics an openai.APIStatusError closely enough for submitter.is_retryable."""
+
+    def __init__(self, status_code: int = 429, message: str = "Rate limit reached", retry_after: str | None = None):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        self.response = types.SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    """Deterministic unit vector derived from the text's hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def fake_token_count(model: str, text: str) -> int:
+    """Rough token count (about 4 characters per token) that needs no tiktoken download."""
+    return max(1, len(text) // 4)
+
+
+class FakeEmbeddings:
+    """
+    Answers embeddings.create() like the real endpoint, with injected latency and errors.
+
+    - latency: seconds slept per request (plus up to `jitter` more)
+    - error_rate: probability a request fails with FakeAPIError(status_code=429)
+    Response items are shuffled, so callers must reorder by `index` as with the API.
+    """
+
+    def __init__(self, dim: int = 256, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.dim = dim
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.inputs = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def create(self, input, model, **kwargs):
+        inputs = [input] if isinstance(input, str) else list(input)
+        dim = kwargs.get("dimensions") or self.dim
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self._rng.random() < self.error_rate
+            delay = self.latency + self._rng.random() * self.jitter
+        try:
+            time.sleep(delay)
+            if fail:
+                with self._lock:
+                    self.errors += 1
+                raise FakeAPIError(429)
+            with self._lock:
+                self.inputs += len(inputs)
+            data = [
+                types.SimpleNamespace(object="embedding", index=i, embedding=fake_embedding(text, dim))
+                for i, text in enumerate(inputs)
+            ]
+            self._rng.shuffle(data)
+            usage = types.SimpleNamespace(prompt_tokens=0, total_tokens=0)
+            return types.SimpleNamespace(data=data, model=model, usage=usage)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeClient:
+    """Minimal OpenAI-client lookalike exposing only `embeddings`."""
+
+    def __init__(self, **kwargs):
+        self.embeddings = FakeEmbeddings(**kwargs)
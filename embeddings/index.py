@@ -0,0 +1,187 @@
+# tomos/embeddings/index.py
+import numpy as np
+
+INDEX_DTYPE = np.float32
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of `matrix` with unit-length rows (zero rows are left as-is)."""
+    matrix = np.array(matrix, dtype=INDEX_DTYPE)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms != 0)
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return (indices, scores) of the k largest entries along the last axis, best first.
+
+    Uses argpartition, so only the k winners are sorted.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+        return empty, empty.astype(scores.dtype)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        idx = np.broadcast_to(np.arange(n), scores.shape).copy()
+    top = np.take_along_axis(scores, idx, axis=-1)
+    order = np.argsort(-top, axis=-1, kind="stable")
+    return np.take_along_axis(idx, order, axis=-1), np.take_along_axis(top, order, axis=-1)
+
+
+def normalize_queries(queries, dims: int) -> np.ndarray:
+    """Truncate one query or a (q, dim) batch to `dims` and L2-normalize it as float32."""
+    queries = np.asarray(queries, dtype=INDEX_DTYPE)[..., :dims]
+    norms = np.linalg.norm(queries, axis=-1, keepdims=True)
+    return np.divide(queries, norms, out=np.zeros_like(queries), where=norms != 0)
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity search over a pre-normalized float32 matrix.
+
+    Rows are truncated to `dims` (if given) and L2-normalized once at build time,
+    so a query costs one matrix-vector product plus an argpartition.
+    """
+
+    def __init__(self, vectors, dims: int | None = None):
+        vectors = np.asarray(vectors)
+        self.dims = dims or vectors.shape[1]
+        self.matrix = normalize_rows(vectors[:, :self.dims])
+
+    @classmethod
+    def from_store(cls, store, dims: int | None = None) -> "VectorIndex":
+        """Build an index from an EmbeddingStore's memory-mapped vectors."""
+        return cls(store.vectors, dims=dims)
+
+    @classmethod
+    def from_normalized(cls, matrix) -> "VectorIndex":
+        """Wrap an already-normalized matrix (e.g. a memmap or shared-memory view) without copying it."""
+        index = cls.__new__(cls)
+        index.dims = matrix.shape[1]
+        index.matrix = matrix
+        return index
+
+    def save(self, path: str) -> None:
+        """Write the normalized matrix as .npy, so load() can memory-map it."""
+        np.save(path, self.matrix)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str | None = "r") -> "VectorIndex":
+        """
+        Open a saved index. Memory-mapped (the default), every process that loads
+        the same file shares one copy of the matrix through the page cache.
+        """
+        return cls.from_normalized(np.load(path, mmap_mode=mmap_mode))
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def _prepare(self, queries) -> np.ndarray:
+        return normalize_queries(queries, self.dims)
+
+    def scores(self, query) -> np.ndarray:
+        """Cosine similarity of one query against every row."""
+        return self.matrix @ self._prepare(query)
+
+    def search(self, query, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, similarities) of the k rows most similar to one query."""
+        return top_k(self.scores(query), k)
+
+    def search_batch(self, queries, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """Search a (q, dim) batch of queries with a single matrix multiply; returns (q, k) arrays."""
+        return top_k(self._prepare(queries) @ self.matrix.T, k)
+
+
+def quantize(matrix: np.ndarray, dtype: str = "int8") -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Compress a float matrix row by row.
+    - "float16": plain half precision, no scales
+    - "int8": symmetric per-row quantization, codes = round(row / scale) with scale = max|row| / 127
+    Returns (codes, scales); scales is None for float16.
+    """
+    matrix = np.asarray(matrix, dtype=INDEX_DTYPE)
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    elif dtype == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(INDEX_DTYPE)
+    raise ValueError(f"Unknown quantization dtype: {dtype}")
+
+
+class QuantizedIndex:
+    """
+    Two-stage cosine-similarity search over compressed vectors.
+
+    The first pass scores compact codes: rows truncated to their first
+    `coarse_dims` components (Matryoshka-style, re-normalized) and stored as
+    float16 or int8 with a per-row scale. The best `rerank` candidates are then
+    re-scored exactly against `full`, the original vectors truncated to `dims`,
+    which can stay on disk as a memmap since only the shortlist is read.
+    """
+
+    def __init__(self, vectors, dims: int | None = None, coarse_dims: int | None = 256,
+                 dtype: str = "int8", rerank: int = 100, block: int = 65_536):
+        self.full = vectors
+        self.dims = dims or vectors.shape[1]
+        self.coarse_dims = min(coarse_dims or self.dims, self.dims)
+        self.dtype = dtype
+        self.rerank = rerank
+        self.block = block
+        self.codes = np.empty((len(vectors), self.coarse_dims), dtype=np.float16 if dtype == "float16" else np.int8)
+        self.scales = None if dtype == "float16" else np.empty(len(vectors), dtype=INDEX_DTYPE)
+        for start in range(0, len(vectors), block):  # quantize in blocks so the float32 copy stays small
+            codes, scales = quantize(normalize_rows(vectors[start:start + block, :self.coarse_dims]), dtype)
+            self.codes[start:start + block] = codes
+            if scales is not None:
+                self.scales[start:start + block] = scales
+
+    @classmethod
+    def from_store(cls, store, dims: int | None = None, **kwargs) -> "QuantizedIndex":
+        """Build an index over an EmbeddingStore, re-ranking from its memory-mapped vectors."""
+        return cls(store.vectors, dims=dims, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def bytes_per_vector(self) -> int:
+        """In-memory footprint of one vector's first-pass code (plus scale)."""
+        return self.codes.itemsize * self.coarse_dims + (self.scales.itemsize if self.scales is not None else 0)
+
+    def coarse_scores(self, query) -> np.ndarray:
+        """Approximate cosine similarity of one query against every row, from the codes alone."""
+        query = np.asarray(query, dtype=INDEX_DTYPE)[:self.coarse_dims]
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = np.empty(len(self.codes), dtype=INDEX_DTYPE)
+        for start in range(0, len(self.codes), self.block):
+            scores[start:start + self.block] = self.codes[start:start + self.block].astype(INDEX_DTYPE) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search(self, query, k: int = 3, rerank: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, similarities) of the k best rows; rerank=0 skips the exact second pass."""
+        rerank = self.rerank if rerank is None else rerank
+        if not rerank:
+            return top_k(self.coarse_scores(query), k)
+        candidates, _ = top_k(self.coarse_scores(query), max(rerank, k))
+        candidates = np.sort(candidates)  # sequential reads from the memmap
+        query = np.asarray(query, dtype=INDEX_DTYPE)[:self.dims]
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        rows, sims = top_k(normalize_rows(self.full[candidates, :self.dims]) @ query, k)
+        return candidates[rows], sims
+
+    def search_batch(self, queries, k: int = 3, rerank: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Search each row of a (q, dim) batch; returns (q, k) arrays."""
+        results = [self.search(query, k, rerank) for query in np.asarray(queries)]
+        return np.stack([r[0] for r in results]), np.stack([r[1] for r in results])
@@ -0,0 +1,139 @@
+# tomos/embeddings/lexical.py
+# BM25 inverted index with compact (CSR) postings, and reciprocal rank fusion
+# for combining it with vector search.
+#
+# Postings are three flat arrays instead of a dict of lists: term t's postings
+# are doc_ids[offsets[t]:offsets[t + 1]] with matching term frequencies in tfs.
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+LEXICAL_FILE = "lexical.npz"
+VOCAB_FILE = "lexical_vocab.json"
+
+# Keeps identifiers like "falcon-9", "starlink-1007", "51.6" and "2025-001a" whole.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+ID_LIKE = re.compile(r"\d|^[A-Z0-9]{2,}$")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def is_keyword_query(query: str, max_terms: int = 4) -> bool:
+    """
+    Heuristic for queries a lexical index answers on its own: quoted phrases, or
+    short queries containing an ID-like term (digits, or an all-caps acronym such
+    as a mission name, NORAD ID or orbit parameter).
+    """
+    stripped = query.strip()
+    if len(stripped) > 2 and stripped[0] == stripped[-1] and stripped[0] in "\"'":
+        return True
+    words = stripped.split()
+    return 0 < len(words) <= max_terms and any(ID_LIKE.search(w) for w in words)
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed corpus, with postings stored as CSR arrays."""
+
+    def __init__(self, vocab: dict[str, int], offsets, doc_ids, tfs, doc_lengths, k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_lengths)
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(doc_lengths.mean()) if n_docs else 1.0
+        # per-document part of the BM25 denominator, precomputed once
+        self.norm = (k1 * (1 - b + b * doc_lengths / max(avgdl, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts, **kwargs) -> "BM25Index":
+        """Index an iterable of texts; document i is the i-th text."""
+        vocab = {}
+        terms, docs, counts, lengths = [], [], [], []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                terms.append(vocab.setdefault(term, len(vocab)))
+                docs.append(doc_id)
+                counts.append(tf)
+        terms = np.asarray(terms, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")  # stable keeps doc ids ascending within a term
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+        return cls(
+            vocab,
+            offsets,
+            np.asarray(docs, dtype=np.int32)[order],
+            np.asarray(counts, dtype=np.int32)[order],
+            np.asarray(lengths, dtype=np.float32),
+            **kwargs,
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def save(self, path: str) -> None:
+        """Write the index into directory `path` (e.g. next to a store's vectors)."""
+        np.savez(os.path.join(path, LEXICAL_FILE), offsets=self.offsets, doc_ids=self.doc_ids,
+                 tfs=self.tfs, doc_lengths=self.doc_lengths, params=np.array([self.k1, self.b]))
+        with open(os.path.join(path, VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump(sorted(self.vocab, key=self.vocab.get), f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        arrays = np.load(os.path.join(path, LEXICAL_FILE))
+        with open(os.path.join(path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            vocab = {term: i for i, term in enumerate(json.load(f))}
+        k1, b = arrays["params"]
+        return cls(vocab, arrays["offsets"], arrays["doc_ids"], arrays["tfs"], arrays["doc_lengths"],
+                   k1=float(k1), b=float(b))
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, LEXICAL_FILE))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query (zero where no term matches)."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            start, stop = self.offsets[t], self.offsets[t + 1]
+            docs = self.doc_ids[start:stop]
+            tf = self.tfs[start:stop]
+            # doc ids are unique within a posting list, so fancy-index += is safe
+            scores[docs] += qtf * self.idf[t] * tf * (self.k1 + 1) / (tf + self.norm[docs])
+        return scores
+
+    def search(self, query: str, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """Return (doc ids, BM25 scores) of the top k matching documents, best first."""
+        from .index import top_k
+
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        ids, top = top_k(scores[matched], k)
+        return matched[ids], top
+
+
+def reciprocal_rank_fusion(rankings, n: int = 3, k: int = 60) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse several best-first id rankings: score(d) = sum over rankings of 1 / (k + rank(d)).
+    Returns (ids, fused scores) of the top n.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            fused[int(doc)] = fused.get(int(doc), 0.0) + 1.0 / (k + rank)
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:n]
+    return np.array([d for d, _ in best], dtype=np.int64), np.array([s for _, s in best], dtype=np.float32)
@@ -0,0 +1,450 @@
+# tomos/embeddings/segments.py
+# Incrementally updatable index: append-only segments plus tombstones.
+#
+#   <name>.segments/
+#       segments.json     generation, live segments and their deleted rows
+#       seg-00000/        an immutable store (see store.py)
+#       seg-00001/
+#
+# Every change writes new files first and then atomically replaces
+# segments.json, so a segment is never modified once published. A Snapshot
+# pins one version of the manifest, which keeps reads consistent while
+# add/upsert/delete and compaction publish newer versions.
+#
+# The segments sit on top of the base store written by a full ingest:
+# MergedIndex searches both as one corpus, hiding base rows of documents that
+# were upserted into the segments or deleted (the manifest's "deleted_docs").
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .index import VectorIndex, normalize_queries, top_k
+from .lexical import BM25Index
+from .store import EmbeddingStoreWriter, load_store
+
+SEGMENTS_FILE = "segments.json"
+SEGMENT_PREFIX = "seg-"
+COPY_ROWS = 50_000  # rows copied per block when merging segments
+
+
+def _read_segments(path: str) -> dict:
+    with open(os.path.join(path, SEGMENTS_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_segments(path: str, manifest: dict) -> None:
+    """Write the manifest atomically; this is the commit point of every change."""
+    tmp_path = os.path.join(path, SEGMENTS_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(path, SEGMENTS_FILE))
+
+
+class Snapshot:
+    """
+    Read-only view of a SegmentedIndex at one generation.
+
+    Rows are numbered across segments in manifest order; `meta` is indexed the
+    same way, so search() results can be passed straight to meta.iloc.
+    Tombstoned rows are never returned.
+    """
+
+    def __init__(self, owner: "SegmentedIndex", manifest: dict):
+        self.generation = manifest["generation"]
+        self.segments = manifest["segments"]
+        self.stores = [owner._store(seg["name"]) for seg in self.segments]
+        self.indexes = [owner._index(seg["name"]) for seg in self.segments]
+        self.deleted = [np.asarray(seg["deleted"], dtype=np.int64) for seg in self.segments]
+        self.deleted_docs = set(manifest.get("deleted_docs", ()))  # documents deleted from the base store too
+        self.offsets = np.cumsum([0] + [len(store) for store in self.stores])
+        self.dims = owner.dims
+        self._meta = None
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1]) - sum(len(d) for d in self.deleted)
+
+    @property
+    def meta(self) -> pd.DataFrame:
+        """Metadata of every row in the snapshot, tombstoned rows included (see `live`)."""
+        if self._meta is None:
+            frames = [store.meta for store in self.stores]
+            self._meta = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({"text": []})
+        return self._meta
+
+    @property
+    def live(self) -> np.ndarray:
+        """Boolean mask over `meta` rows that have not been deleted."""
+        mask = np.ones(int(self.offsets[-1]), dtype=bool)
+        for offset, deleted in zip(self.offsets, self.deleted):
+            mask[offset + deleted] = False
+        return mask
+
+    def search_batch(self, queries, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """Exact search of a (q, dim) batch over every segment; returns (q, k) arrays of global rows."""
+        queries = np.atleast_2d(np.asarray(queries))
+        ids, sims = [], []
+        for offset, index, deleted in zip(self.offsets, self.indexes, self.deleted):
+            scores = normalize_queries(queries, index.dims) @ index.matrix.T
+            scores[:, deleted] = -np.inf
+            seg_ids, seg_sims = top_k(scores, k)
+            ids.append(seg_ids + offset)
+            sims.append(seg_sims)
+        if not ids:
+            empty = np.empty((len(queries), 0), dtype=np.int64)
+            return empty, empty.astype(np.float32)
+        ids, sims = np.concatenate(ids, axis=-1), np.concatenate(sims, axis=-1)
+        best, top = top_k(sims, min(k, len(self)))
+        return np.take_along_axis(ids, best, axis=-1), top
+
+    def search(self, query, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, similarities) of the k live rows most similar to one query."""
+        ids, sims = self.search_batch(np.asarray(query)[None, :], k)
+        return ids[0], sims[0]
+
+    @property
+    def doc_ids(self) -> set:
+        """doc_ids with live rows in the snapshot."""
+        if "doc_id" not in self.meta:
+            return set()
+        return set(self.meta["doc_id"][self.live])
+
+
+class _Reader:
+    """Store and index loading for a snapshot opened without a SegmentedIndex (read-only, no cleanup)."""
+
+    def __init__(self, path: str, dims: int | None):
+        self.path = path
+        self.dims = dims
+
+    def _store(self, name: str):
+        return load_store(os.path.join(self.path, name))
+
+    def _index(self, name: str) -> VectorIndex:
+        return VectorIndex.from_store(self._store(name), dims=self.dims)
+
+
+def read_snapshot(path: str, dims: int | None = None) -> Snapshot | None:
+    """
+    Snapshot of the segmented index at `path` for a reader (a search process),
+    or None if there is none. Unlike SegmentedIndex(path) it never writes or
+    removes anything, so it is safe while another process is updating the index.
+    """
+    if not os.path.exists(os.path.join(path, SEGMENTS_FILE)):
+        return None
+    return Snapshot(_Reader(path, dims), _read_segments(path))
+
+
+def _pad(ids, sims, n_queries: int, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-query results as (n_queries, width) arrays, short rows padded with id -1
+    and similarity -inf; accepts (q, k) arrays or lists of per-query arrays.
+    """
+    padded_ids = np.full((n_queries, width), -1, dtype=np.int64)
+    padded_sims = np.full((n_queries, width), -np.inf, dtype=np.float32)
+    for i, (row_ids, row_sims) in enumerate(zip(ids, sims)):
+        row_ids, row_sims = np.asarray(row_ids)[:width], np.asarray(row_sims)[:width]
+        padded_ids[i, :len(row_ids)] = row_ids
+        padded_sims[i, :len(row_sims)] = row_sims
+    return padded_ids, padded_sims
+
+
+class MergedIndex:
+    """
+    A base store's index and a segment snapshot searched as one corpus.
+
+    Rows 0..n_base-1 are the base store's rows, then the snapshot's rows, in
+    the order of `meta`. Tombstoned segment rows and base rows of documents the
+    segments replaced or deleted are never returned. The base store's BM25 and
+    sentence indexes don't know about the segments: lexical() builds BM25 over
+    the merged rows, and sentence vectors only cover the base rows (segment
+    rows fall back to query-time refinement) until the next full ingest.
+    """
+
+    def __init__(self, base_meta: pd.DataFrame, base_index, snapshot: Snapshot):
+        self.base_index = base_index
+        self.snapshot = snapshot
+        self.n_base = len(base_meta)
+        shadowed = snapshot.doc_ids | snapshot.deleted_docs
+        if "doc_id" in base_meta and shadowed:
+            self.hidden = np.flatnonzero(base_meta["doc_id"].isin(shadowed).to_numpy())
+        else:
+            self.hidden = np.empty(0, dtype=np.int64)
+        self.meta = pd.concat([base_meta, snapshot.meta], ignore_index=True)
+        base_live = np.ones(self.n_base, dtype=bool)
+        base_live[self.hidden] = False
+        self.live = np.concatenate([base_live, snapshot.live])
+        self._lexical = None
+
+    def __len__(self) -> int:
+        return int(self.live.sum())
+
+    def search_batch(self, queries, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (q, k) arrays of merged rows and similarities, best first. An approximate
+        base index can find fewer than k live rows; those slots hold id -1 and
+        similarity -inf.
+        """
+        queries = np.atleast_2d(np.asarray(queries))
+        ids, sims = [], []
+        base_k = min(self.n_base, k + len(self.hidden))  # enough to still have k after hiding rows
+        if base_k:
+            base_ids, base_sims = _pad(*self.base_index.search_batch(queries, base_k), len(queries), base_k)
+            base_sims = np.where(np.isin(base_ids, self.hidden), -np.inf, base_sims)
+            ids.append(base_ids)
+            sims.append(base_sims)
+        seg_ids, seg_sims = self.snapshot.search_batch(queries, k)
+        ids.append(seg_ids + self.n_base)
+        sims.append(seg_sims)
+        ids, sims = np.concatenate(ids, axis=-1), np.concatenate(sims, axis=-1)
+        best, top = top_k(sims, min(k, len(self)))
+        return np.where(np.isneginf(top), -1, np.take_along_axis(ids, best, axis=-1)), top
+
+    def search(self, query, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, similarities) of the k live rows most similar to one query."""
+        ids, sims = self.search_batch(np.asarray(query)[None, :], k)
+        found = sims[0] > -np.inf
+        return ids[0][found], sims[0][found]
+
+    def lexical(self) -> BM25Index:
+        """BM25 over the merged rows; hidden and tombstoned rows are indexed as empty text, so they never match."""
+        if self._lexical is None:
+            self._lexical = BM25Index.build(self.meta["text"].where(self.live, ""))
+        return self._lexical
+
+
+class SegmentedIndex:
+    """
+    Embedding index that supports add, upsert and delete by doc_id without a rebuild.
+
+    - add(records, vectors) appends a new segment (doc_ids must be new)
+    - upsert(records, vectors) tombstones every existing chunk of those doc_ids
+      and appends the new ones, in one atomic manifest update
+    - delete(doc_ids) only writes tombstones
+    - compact() merges segments and drops tombstoned rows; it copies data
+      without holding the writer lock, so writes can continue meanwhile
+
+    Records are chunk dicts as produced by chunker.py, with "text" and "doc_id".
+    One process writes; any number of threads can read through snapshot().
+    """
+
+    def __init__(self, path: str, dims: int | None = None, model: str | None = None):
+        self.path = path
+        self.dims = dims
+        self._lock = threading.Lock()  # serializes manifest updates
+        self._compact_lock = threading.Lock()  # one compaction at a time
+        self._stores = {}
+        self._indexes = {}
+        self._retired = []
+        self._compactor = None
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, SEGMENTS_FILE)):
+            self.manifest = _read_segments(path)
+        else:
+            self.manifest = {"generation": 0, "next_id": 0, "model": model, "segments": [], "deleted_docs": []}
+            _write_segments(path, self.manifest)
+        self._next_id = self.manifest["next_id"]
+        live = {seg["name"] for seg in self.manifest["segments"]}
+        for name in os.listdir(path):  # unpublished or retired segments from an earlier run
+            if name.startswith(SEGMENT_PREFIX) and name not in live:
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        self._locations = self._build_locations(self.manifest)
+
+    def _store(self, name: str):
+        if name not in self._stores:
+            self._stores[name] = load_store(os.path.join(self.path, name))
+        return self._stores[name]
+
+    def _index(self, name: str) -> VectorIndex:
+        if name not in self._indexes:
+            self._indexes[name] = VectorIndex.from_store(self._store(name), dims=self.dims)
+        return self._indexes[name]
+
+    def _build_locations(self, manifest: dict) -> dict:
+        """doc_id -> list of (segment name, row) for every live chunk."""
+        locations = {}
+        for seg in manifest["segments"]:
+            deleted = set(seg["deleted"])
+            for row, doc_id in enumerate(self._store(seg["name"]).meta["doc_id"]):
+                if row not in deleted:
+                    locations.setdefault(doc_id, []).append((seg["name"], row))
+        return locations
+
+    def _reserve_name(self) -> str:
+        with self._lock:
+            name = f"{SEGMENT_PREFIX}{self._next_id:05d}"
+            self._next_id += 1
+        return name
+
+    def _publish(self, segments: list[dict], deleted_docs=None) -> None:
+        """Commit a new segment list, and optionally a new set of deleted doc_ids (caller holds the lock)."""
+        manifest = {
+            "generation": self.manifest["generation"] + 1,
+            "next_id": self._next_id,
+            "model": self.manifest.get("model"),
+            "segments": segments,
+            "deleted_docs": sorted(deleted_docs) if deleted_docs is not None else self.manifest.get("deleted_docs", []),
+        }
+        _write_segments(self.path, manifest)
+        self.manifest = manifest  # replaced, never mutated, so snapshots stay valid
+
+    def _write_segment(self, records: list[dict], vectors) -> str:
+        name = self._reserve_name()
+        with EmbeddingStoreWriter(os.path.join(self.path, name), model=self.manifest.get("model")) as writer:
+            writer.write(records, vectors)
+        return name
+
+    def snapshot(self) -> Snapshot:
+        """A consistent view of the current generation, unaffected by later writes."""
+        return Snapshot(self, self.manifest)
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._locations.values())
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._locations
+
+    def _tombstone(self, segments: list[dict], doc_ids) -> tuple[list[dict], int]:
+        """Return `segments` with the rows of `doc_ids` deleted, and how many rows that was."""
+        deleted = {}
+        for doc_id in doc_ids:
+            for name, row in self._locations.get(doc_id, []):
+                deleted.setdefault(name, []).append(row)
+        updated = [
+            {**seg, "deleted": sorted(seg["deleted"] + deleted[seg["name"]])} if seg["name"] in deleted else seg
+            for seg in segments
+        ]
+        return updated, sum(len(rows) for rows in deleted.values())
+
+    def _append(self, records: list[dict], vectors, replace: bool) -> None:
+        if not records:
+            return
+        name = self._write_segment(records, vectors)  # written before taking the lock
+        doc_ids = list(dict.fromkeys(record["doc_id"] for record in records))
+        with self._lock:
+            existing = [doc_id for doc_id in doc_ids if doc_id in self._locations]
+            if existing and not replace:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+                raise ValueError(f"doc_ids already indexed (use upsert): {existing[:5]}")
+            segments, _ = self._tombstone(self.manifest["segments"], existing)
+            deleted_docs = set(self.manifest.get("deleted_docs", ())) - set(doc_ids)  # re-added documents
+            self._publish(segments + [{"name": name, "count": len(records), "deleted": []}], deleted_docs)
+            for doc_id in existing:
+                del self._locations[doc_id]
+            for row, record in enumerate(records):
+                self._locations.setdefault(record["doc_id"], []).append((name, row))
+
+    def add(self, records: list[dict], vectors) -> None:
+        """Append chunks of new documents as one segment; raises ValueError if a doc_id exists."""
+        self._append(records, vectors, replace=False)
+
+    def upsert(self, records: list[dict], vectors) -> None:
+        """
+        Replace every chunk of the records' doc_ids with `records`. All chunks of
+        a document must be in the same call, since each call replaces the document.
+        """
+        self._append(records, vectors, replace=True)
+
+    def delete(self, doc_ids) -> int:
+        """
+        Tombstone every chunk of `doc_ids` and record them as deleted, which also
+        hides their rows in the base store (see MergedIndex). Returns the number
+        of segment rows deleted.
+        """
+        doc_ids = list(doc_ids)
+        with self._lock:
+            segments, n_deleted = self._tombstone(self.manifest["segments"], doc_ids)
+            deleted_docs = set(self.manifest.get("deleted_docs", ())) | set(doc_ids)
+            if n_deleted or len(deleted_docs) != len(self.manifest.get("deleted_docs", ())):
+                self._publish(segments, deleted_docs)
+                for doc_id in doc_ids:
+                    self._locations.pop(doc_id, None)
+        return n_deleted
+
+    def doc_hashes(self, doc_id) -> list[str] | None:
+        """content_hash of each live chunk of `doc_id`, in order, or None if it is not indexed."""
+        locations = self._locations.get(doc_id)
+        if not locations:
+            return None
+        hashes = []
+        for name, row in locations:
+            meta = self._store(name).meta
+            hashes.append(meta["content_hash"].iloc[row] if "content_hash" in meta else None)
+        return hashes
+
+    def needs_compaction(self, max_segments: int = 8, max_deleted_ratio: float = 0.2) -> bool:
+        segments = self.manifest["segments"]
+        total = sum(seg["count"] for seg in segments)
+        deleted = sum(len(seg["deleted"]) for seg in segments)
+        return len(segments) > max_segments or (total > 0 and deleted / total > max_deleted_ratio)
+
+    def compact(self) -> bool:
+        """
+        Merge all current segments into one, dropping tombstoned rows. Returns
+        False if there was nothing to do.
+
+        Rows are copied from a snapshot without holding the lock; segments added
+        meanwhile are kept as they are, and rows deleted meanwhile are carried
+        over as tombstones on the merged segment. Merged-away segments are
+        removed at the next compaction, after readers have had time to move on.
+        """
+        with self._compact_lock:
+            return self._compact()
+
+    def _compact(self) -> bool:
+        snapshot = self.snapshot()
+        if len(snapshot.segments) <= 1 and not any(len(d) for d in snapshot.deleted):
+            return False
+        name = self._reserve_name()
+        new_rows = {}  # segment name -> new row of each old row (-1 if dropped)
+        with EmbeddingStoreWriter(os.path.join(self.path, name), model=self.manifest.get("model")) as writer:
+            for seg, store, deleted in zip(snapshot.segments, snapshot.stores, snapshot.deleted):
+                live = np.setdiff1d(np.arange(len(store)), deleted)
+                mapping = np.full(len(store), -1, dtype=np.int64)
+                mapping[live] = np.arange(writer.count, writer.count + len(live))
+                new_rows[seg["name"]] = mapping
+                for start in range(0, len(live), COPY_ROWS):
+                    rows = live[start:start + COPY_ROWS]
+                    writer.write(store.meta.iloc[rows].to_dict("records"), store.vectors[rows])
+            count = writer.count
+
+        with self._lock:
+            current = {seg["name"]: seg for seg in self.manifest["segments"]}
+            late_deletes = []
+            for seg in snapshot.segments:
+                since = set(current[seg["name"]]["deleted"]) - set(seg["deleted"])
+                late_deletes.extend(int(new_rows[seg["name"]][row]) for row in since)
+            merged = {"name": name, "count": count, "deleted": sorted(late_deletes)}
+            self._publish([merged] + [seg for seg in self.manifest["segments"] if seg["name"] not in new_rows])
+            for old in new_rows:
+                self._stores.pop(old, None)
+                self._indexes.pop(old, None)
+            self._locations = self._build_locations(self.manifest)
+            retired, self._retired = self._retired, list(new_rows)
+        for old in retired:
+            shutil.rmtree(os.path.join(self.path, old), ignore_errors=True)
+        return True
+
+    def start_compaction(self, interval: float = 60.0, **policy) -> None:
+        """Run compact() on a daemon thread every `interval` seconds when needs_compaction(**policy)."""
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                if self.needs_compaction(**policy):
+                    self.compact()
+
+        thread = threading.Thread(target=loop, name="segment-compactor", daemon=True)
+        thread.start()
+        self._compactor = (thread, stop)
+
+    def close(self) -> None:
+        """Stop background compaction, if running."""
+        if self._compactor:
+            thread, stop = self._compactor
+            stop.set()
+            thread.join()
+            self._compactor = None
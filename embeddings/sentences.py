@@ -0,0 +1,84 @@
+# tomos/embeddings/sentences.py
+# Precomputed sentence embeddings, so recursive search can refine chunks into
+# their best sentences without embedding anything at query time.
+#
+#   <name>.store/sentences/    a store (see store.py) with one row per sentence:
+#       chunk, start, end      parent chunk row and character offsets into its text
+#
+# Sentences are written in chunk order, so a chunk's sentences are one
+# contiguous block of rows.
+import os
+import re
+
+import numpy as np
+
+from .index import normalize_queries, normalize_rows, top_k
+from .store import load_store, store_exists
+
+SENTENCES_DIR = "sentences"
+SENTENCE_MODEL = "text-embedding-3-small"  # must match the model used for query embeddings
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?]) +")  # same split as embeddings.split_into_sentences
+
+
+def sentence_spans(text: str) -> list[tuple[int, int]]:
+    """(start, end) offsets of the non-blank pieces split_into_sentences would return."""
+    spans = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return [(a, b) for a, b in spans if text[a:b].strip()]
+
+
+def iter_sentences(texts):
+    """Yield a record (chunk, start, end, text) for every sentence of every chunk text, in order."""
+    for chunk, text in enumerate(texts):
+        for start, end in sentence_spans(text):
+            yield {"chunk": chunk, "start": start, "end": end, "text": text[start:end]}
+
+
+class SentenceIndex:
+    """
+    Sentence vectors of a store, grouped by parent chunk.
+
+    Sentence rows of chunk i are offsets[i]:offsets[i + 1]; vectors stay
+    memory-mapped and only the blocks of the searched chunks are read.
+    """
+
+    def __init__(self, store, n_chunks: int):
+        self.store = store
+        self.vectors = store.vectors
+        chunks = store.meta["chunk"].to_numpy()
+        self.starts = store.meta["start"].to_numpy()
+        self.ends = store.meta["end"].to_numpy()
+        self.offsets = np.searchsorted(chunks, np.arange(n_chunks + 1))
+
+    @classmethod
+    def exists(cls, store_path: str) -> bool:
+        return store_exists(os.path.join(store_path, SENTENCES_DIR))
+
+    @classmethod
+    def load(cls, store_path: str, n_chunks: int) -> "SentenceIndex":
+        return cls(load_store(os.path.join(store_path, SENTENCES_DIR)), n_chunks)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def covers(self, row: int) -> bool:
+        """Whether chunk `row` belongs to the store this index was built for."""
+        return 0 <= row < len(self.offsets) - 1
+
+    def search(self, row: int, text: str, query_embedding, top_k_sentences: int = 2) -> list[tuple[str, float]]:
+        """The top_k_sentences (substring, similarity) of chunk `row`, whose text is `text`."""
+        start, stop = self.offsets[row], self.offsets[row + 1]
+        if start == stop:
+            return []
+        block = normalize_rows(self.vectors[start:stop])
+        query = normalize_queries(query_embedding, block.shape[1])
+        best, sims = top_k(block @ query, top_k_sentences)
+        return [(text[self.starts[start + i]:self.ends[start + i]], float(sim)) for i, sim in zip(best, sims)]
+
+    def substring_search(self, rows, texts, query_embedding, top_k_sentences: int = 2) -> list[list[tuple[str, float]]]:
+        """Drop-in for embeddings.substring_search over chunks `rows` (with texts `texts`); no API calls."""
+        return [self.search(row, text, query_embedding, top_k_sentences) for row, text in zip(rows, texts)]
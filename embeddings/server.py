@@ -0,0 +1,208 @@
+# tomos/embeddings/server.py
+# Long-lived retrieval server: loads the store and index once and keeps them hot.
+#
+# Run from the directory above tomos/:
+#   uvicorn tomos.embeddings.server:app --port 8765
+# or python -m tomos.embeddings.server
+# With several workers (uvicorn --workers N), set TOMOS_INDEX_KIND=mmap so every
+# worker maps the same index file instead of holding a private copy.
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import numpy as np
+from fastapi import FastAPI
+from pydantic import BaseModel, Field
+
+from . import embeddings
+from .cache import get_default_cache
+from .lexical import is_keyword_query, reciprocal_rank_fusion
+
+STORE_PATH = os.environ.get("TOMOS_STORE_PATH", embeddings.STORE_PATH)
+INDEX_KIND = os.environ.get("TOMOS_INDEX_KIND", embeddings.INDEX_KIND)
+INDEX_PATH = os.environ.get("TOMOS_INDEX_PATH", embeddings.INDEX_PATH)
+SEGMENTS_PATH = os.environ.get("TOMOS_SEGMENTS_PATH", embeddings.SEGMENTS_PATH)  # read at startup; restart to pick up updates
+MAX_BATCH = 64  # queries folded into one embeddings request and one matrix multiply
+MAX_WAIT = 0.005  # seconds the batcher waits for more queries to arrive
+MAX_N = 100  # most results per request; n sets the k of the whole batch it joins
+
+
+class LatencyStats:
+    """Rolling window of request latencies for p50/p99 and QPS reporting."""
+
+    def __init__(self, window: int = 10_000):
+        self.samples = deque(maxlen=window)  # (finished_at, seconds)
+        self.started = time.time()
+        self.total = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append((time.time(), seconds))
+        self.total += 1
+
+    def summary(self) -> dict:
+        now = time.time()
+        latencies = np.array([s for _, s in self.samples]) if self.samples else np.zeros(1)
+        recent = sum(1 for t, _ in self.samples if now - t <= 60.0)
+        return {
+            "requests": self.total,
+            "uptime_s": round(now - self.started, 1),
+            "qps_1m": round(recent / min(60.0, max(now - self.started, 1e-9)), 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1e3, 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)) * 1e3, 2),
+        }
+
+
+class QueryBatcher:
+    """
+    Folds concurrent queries into batches: one embeddings request for all query
+    texts, then one index.search_batch call, run off the event loop.
+    """
+
+    def __init__(self, index, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+        self.index = index
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.batched_queries = 0
+
+    async def search(self, query: str, n: int):
+        """Return (rows, similarities, query embedding) for one query."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, n, future))
+        return await future
+
+    def _search_batch(self, queries: list[str], k: int):
+        vectors = np.asarray(embeddings.get_embeddings(queries, embeddings.get_client(), model=embeddings.QUERY_MODEL))
+        rows, sims = self.index.search_batch(vectors, k)
+        return vectors, rows, sims
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.batched_queries += len(batch)
+            try:
+                vectors, rows, sims = await loop.run_in_executor(
+                    None, self._search_batch, [q for q, _, _ in batch], max(n for _, n, _ in batch)
+                )
+            except Exception as exc:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for i, (_, n, future) in enumerate(batch):
+                if not future.done():
+                    found = sims[i][:n] > -np.inf  # approximate indexes pad short results with -inf
+                    future.set_result((rows[i][:n][found], sims[i][:n][found], vectors[i]))
+
+
+class SearchRequest(BaseModel):
+    query: str
+    n: int = Field(3, ge=1, le=MAX_N)
+    hybrid: bool = False  # fuse BM25 and vector rankings; keyword-shaped queries skip embedding
+
+
+class RecursiveSearchRequest(BaseModel):
+    query: str
+    n: int = Field(3, ge=1, le=MAX_N)
+    depth: int = 2
+    top_k: int = 2
+
+
+state = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    df, index = embeddings.load_corpus(STORE_PATH, kind=INDEX_KIND, index_path=INDEX_PATH, segments_path=SEGMENTS_PATH)
+    state["df"] = df.drop(columns=["content_hash"], errors="ignore")
+    state["lexical"] = embeddings.load_lexical(STORE_PATH, index=index)
+    state["sentences"] = embeddings.load_sentences(STORE_PATH)
+    state["batcher"] = QueryBatcher(index)
+    state["stats"] = {"search": LatencyStats(), "search_recursive": LatencyStats()}
+    task = asyncio.create_task(state["batcher"].run())
+    yield
+    task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def hybrid_search(query: str, n: int) -> list[dict]:
+    """Same ranking as embeddings.hybrid_search, with the vector half going through the batcher."""
+    lexical = state["lexical"]
+    if is_keyword_query(query):
+        rows, scores = lexical.search(query, n)
+        if len(rows):
+            return state["df"].iloc[rows].assign(bm25=scores).to_dict("records")
+    candidates = max(n, embeddings.HYBRID_CANDIDATES)
+    vector_rows, _, _ = await state["batcher"].search(query, candidates)
+    lexical_rows, _ = lexical.search(query, candidates)
+    rows, fused = reciprocal_rank_fusion([vector_rows, lexical_rows], n=n)
+    return state["df"].iloc[rows].assign(rrf=fused).to_dict("records")
+
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    start = time.perf_counter()
+    if request.hybrid:
+        results = await hybrid_search(request.query, request.n)
+    else:
+        rows, sims, _ = await state["batcher"].search(request.query, request.n)
+        results = state["df"].iloc[rows].assign(similarity=sims).to_dict("records")
+    state["stats"]["search"].record(time.perf_counter() - start)
+    return {"results": results}
+
+
+@app.post("/search_recursive")
+async def search_recursive(request: RecursiveSearchRequest):
+    start = time.perf_counter()
+    rows, _, query_embedding = await state["batcher"].search(request.query, request.n)
+    texts = list(state["df"].iloc[rows]["text"])
+    sentences = state["sentences"]
+    if sentences is not None and all(sentences.covers(row) for row in rows):
+        # precomputed: no embeddings request beyond the query's
+        per_text = sentences.substring_search(rows, texts, query_embedding, request.top_k)
+    else:
+        per_text = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: embeddings.refine_substrings(
+                rows, texts, query_embedding, sentences=sentences, depth=request.depth, top_k=request.top_k
+            )
+        )
+    substrings = sorted((s for subs in per_text for s in subs), key=lambda x: x[1], reverse=True)[:request.n]
+    state["stats"]["search_recursive"].record(time.perf_counter() - start)
+    return {"results": [{"text": text, "similarity": float(sim)} for text, sim in substrings]}
+
+
+@app.get("/health")
+async def health():
+    batcher = state["batcher"]
+    return {
+        "status": "ok",
+        "chunks": len(batcher.index),  # live rows (a merged index hides deleted and superseded ones)
+        "index": type(batcher.index).__name__,
+        "lexical_terms": len(state["lexical"].vocab),
+        "sentences": len(state["sentences"]) if state["sentences"] is not None else 0,
+        "endpoints": {name: stats.summary() for name, stats in state["stats"].items()},
+        "mean_batch_size": round(batcher.batched_queries / batcher.batches, 2) if batcher.batches else 0.0,
+        "embedding_cache": get_default_cache().stats(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=int(os.environ.get("TOMOS_SEARCH_PORT", "8765")))
@@ -0,0 +1,128 @@
+# tomos/embeddings/shared.py
+# Sharing one copy of the index matrix between processes.
+#
+# Two ways to share: a saved .npy file opened with np.memmap (VectorIndex.load),
+# which any number of independent workers (uvicorn/gunicorn) can map, or a
+# multiprocessing.shared_memory segment published by a parent process.
+# ShardedIndex splits a search across a process pool over either one.
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .index import INDEX_DTYPE, VectorIndex, normalize_queries, top_k
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without letting this process unlink it on exit."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, "shared_memory")  # the publisher owns the segment
+    return shm
+
+
+class SharedMemoryIndex:
+    """
+    A VectorIndex whose matrix lives in a named shared-memory segment.
+
+    publish() copies an index into a new segment (the caller owns it and must
+    unlink() it); attach() maps an existing segment by name and shape, copy-free.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: tuple[int, int], owner: bool):
+        self.shm = shm
+        self.shape = shape
+        self.owner = owner
+        self.index = VectorIndex.from_normalized(np.ndarray(shape, dtype=INDEX_DTYPE, buffer=shm.buf))
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def publish(cls, index: VectorIndex, name: str | None = None) -> "SharedMemoryIndex":
+        matrix = index.matrix
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(matrix.nbytes, 1))
+        shared = cls(shm, matrix.shape, owner=True)
+        shared.index.matrix[:] = matrix
+        return shared
+
+    @classmethod
+    def attach(cls, name: str, shape: tuple[int, int]) -> "SharedMemoryIndex":
+        return cls(_attach(name), tuple(shape), owner=False)
+
+    def close(self) -> None:
+        self.index = None  # drop the view before closing the buffer
+        self.shm.close()
+
+    def unlink(self) -> None:
+        if self.owner:
+            self.shm.unlink()
+
+
+# per-worker state for ShardedIndex, set by _init_worker
+_worker = {}
+
+
+def _init_worker(source: str, shape: tuple[int, int] | None) -> None:
+    """Map the shared matrix once per worker: a .npy path, or a segment name plus shape."""
+    if shape is None:
+        _worker["matrix"] = np.load(source, mmap_mode="r")
+    else:
+        _worker["shared"] = SharedMemoryIndex.attach(source, shape)
+        _worker["matrix"] = _worker["shared"].index.matrix
+
+
+def _search_shard(start: int, stop: int, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    ids, sims = top_k(queries @ _worker["matrix"][start:stop].T, k)
+    return ids + start, sims
+
+
+class ShardedIndex:
+    """
+    Exact search with the matrix split row-wise across a process pool.
+
+    Each worker maps the same physical matrix (from a saved .npy file, or from a
+    shared-memory segment when `shape` is given), scores its shard and returns
+    its own top-k; the shard results are merged with one more top-k.
+    """
+
+    def __init__(self, source: str, shape: tuple[int, int] | None = None,
+                 n_shards: int | None = None, processes: int | None = None):
+        self.source = source
+        self.shape = shape or np.load(source, mmap_mode="r").shape
+        self.dims = self.shape[1]
+        processes = processes or os.cpu_count() or 1
+        bounds = np.linspace(0, self.shape[0], (n_shards or processes) + 1).astype(int)
+        self.shards = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        self.executor = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                            initargs=(source, shape))
+
+    @classmethod
+    def from_index(cls, index: VectorIndex, path: str, **kwargs) -> "ShardedIndex":
+        """Save `index` to `path` (.npy) and shard searches over the memory-mapped file."""
+        index.save(path)
+        return cls(path, **kwargs)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def search_batch(self, queries, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """Search a (q, dim) batch on every shard in parallel; returns merged (q, k) arrays."""
+        queries = normalize_queries(queries, self.dims)
+        futures = [self.executor.submit(_search_shard, a, b, queries, k) for a, b in self.shards]
+        results = [f.result() for f in futures]
+        ids = np.concatenate([r[0] for r in results], axis=-1)
+        sims = np.concatenate([r[1] for r in results], axis=-1)
+        best, top = top_k(sims, k)
+        return np.take_along_axis(ids, best, axis=-1), top
+
+    def search(self, query, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        ids, sims = self.search_batch(np.asarray(query)[None, :], k)
+        return ids[0], sims[0]
+
+    def close(self) -> None:
+        self.executor.shutdown()
@@ -0,0 +1,77 @@
+# tomos/embeddings/sources.py
+# Page sources for embed.py. Each source yields (title, wikitext) pairs lazily, so
+# the rest of the pipeline doesn't care whether pages come from the live site, a
+# directory of .wiki files, or a MediaWiki XML dump.
+import bz2
+import gzip
+import os
+import xml.etree.ElementTree as ET
+
+WIKI_EXTENSION = ".wiki"
+
+
+def iter_site_pages(titles, site_name: str = "en.wikipedia.org"):
+    """Fetch each title from a live MediaWiki site, reusing one connection."""
+    import mwclient  # only needed when online
+
+    site = mwclient.Site(site_name)
+    for title in titles:
+        yield title, site.pages[title].text()
+
+
+def iter_wiki_dir(path: str):
+    """
+    Yield every .wiki file under `path` (recursively, in sorted order).
+    The title is the file name without extension, with underscores as spaces.
+    """
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(WIKI_EXTENSION):
+                with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                    yield name[: -len(WIKI_EXTENSION)].replace("_", " "), f.read()
+
+
+def _open_dump(path: str):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_xml_dump(path: str, namespaces: tuple[int, ...] = (0,), skip_redirects: bool = True):
+    """
+    Stream pages out of a MediaWiki XML export (optionally .bz2/.gz compressed).
+
+    Parsed with iterparse and each <page> is cleared once read, so memory stays
+    flat however large the dump is. Only pages in `namespaces` (0 = articles) are
+    yielded, with the text of their last revision.
+    """
+    with _open_dump(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end" or not (elem.tag == "page" or elem.tag.endswith("}page")):
+                continue
+            fields = {child.tag.rsplit("}", 1)[-1]: child for child in elem}
+            ns = int(fields["ns"].text) if "ns" in fields else 0
+            redirect = "redirect" in fields
+            texts = [r.find("{*}text") for r in elem.iter() if r.tag.rsplit("}", 1)[-1] == "revision"]
+            text = texts[-1].text if texts and texts[-1] is not None else None
+            if ns in namespaces and not (skip_redirects and redirect) and text:
+                yield fields["title"].text, text
+            elem.clear()
+            root.clear()  # drop references to already-processed pages
+
+
+def iter_pages(source: str | None, titles=None, site_name: str = "en.wikipedia.org"):
+    """
+    Pick a page source: a directory of .wiki files, an XML dump file, or (if
+    `source` is None) the live site for the given titles.
+    """
+    if source is None:
+        return iter_site_pages(titles or [], site_name=site_name)
+    if os.path.isdir(source):
+        return iter_wiki_dir(source)
+    return iter_xml_dump(source)
@@ -0,0 +1,227 @@
+# tomos/embeddings/store.py
+# A binary embedding store: one contiguous float32 matrix opened with np.memmap,
+# plus Parquet parts for the chunk text and metadata.
+#
+#   <name>.store/
+#       manifest.json         dim, count, model, metadata parts, store_id
+#       vectors.f32           count x dim float32, row-major
+#       meta-00000.parquet    text + metadata, one row per vector
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+STORE_DTYPE = np.float32
+
+
+def _read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(path: str, manifest: dict) -> None:
+    """Write the manifest atomically, so readers never see a half-written file."""
+    tmp_path = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+
+class EmbeddingStoreWriter:
+    """
+    Append chunk records and their embeddings to a store directory.
+
+    Vectors are written straight to vectors.f32; records are buffered and flushed
+    as a new Parquet part every `flush_rows` rows (and on close). The manifest is
+    only advanced on flush, so a crash leaves the store readable at the last flush.
+
+    Opening a writer replaces any store already at `path`, unless `resume` is set:
+    then writing continues after the last flushed row, and vectors written after
+    that flush are discarded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: int | None = None,
+        model: str | None = None,
+        flush_rows: int = 50_000,
+        resume: bool = False,
+    ):
+        self.path = path
+        self.flush_rows = flush_rows
+        os.makedirs(path, exist_ok=True)
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        if resume and os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            self.manifest = _read_manifest(path)
+            flushed_bytes = self.manifest["count"] * (self.manifest["dim"] or 0) * np.dtype(STORE_DTYPE).itemsize
+            with open(vectors_path, "ab") as f:
+                f.truncate(flushed_bytes)
+            self._vectors = open(vectors_path, "ab")
+        else:
+            for name in os.listdir(path):
+                if name == VECTORS_FILE or name == MANIFEST_FILE or name.startswith("meta-"):
+                    os.remove(os.path.join(path, name))
+            self.manifest = {"dim": dim, "count": 0, "dtype": "float32", "model": model, "parts": [],
+                             "store_id": uuid.uuid4().hex}  # new for every rewrite, kept on resume
+            self._vectors = open(vectors_path, "wb")
+        self._pending = []
+
+    @property
+    def count(self) -> int:
+        """Rows written so far, flushed or not."""
+        return self.manifest["count"] + len(self._pending)
+
+    def write(self, records: list[dict], vectors) -> None:
+        """Append `records` (dicts with at least a "text" key) and their vectors."""
+        vectors = np.asarray(vectors, dtype=STORE_DTYPE)
+        if vectors.ndim != 2 or len(vectors) != len(records):
+            raise ValueError(f"Expected {len(records)} vectors, got array of shape {vectors.shape}")
+        if self.manifest["dim"] is None:
+            self.manifest["dim"] = vectors.shape[1]
+        elif vectors.shape[1] != self.manifest["dim"]:
+            raise ValueError(f"Expected {self.manifest['dim']}-dim vectors, got {vectors.shape[1]}")
+        self._vectors.write(np.ascontiguousarray(vectors).tobytes())
+        self._pending.extend(records)
+        if len(self._pending) >= self.flush_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered records as a Parquet part and advance the manifest."""
+        self._vectors.flush()
+        if not self._pending:
+            return
+        part = f"meta-{len(self.manifest['parts']):05d}.parquet"
+        pq.write_table(pa.Table.from_pylist(self._pending), os.path.join(self.path, part))
+        self.manifest["parts"].append(part)
+        self.manifest["count"] += len(self._pending)
+        self._pending = []
+        _write_manifest(self.path, self.manifest)
+
+    def compact(self) -> None:
+        """Flush, then merge all Parquet parts into one, streaming one part at a time."""
+        self.flush()
+        old_parts = self.manifest["parts"]
+        if len(old_parts) <= 1:
+            return
+        schema = pa.unify_schemas([pq.read_schema(os.path.join(self.path, p)) for p in old_parts])
+        part = f"meta-{len(old_parts):05d}.parquet"
+        with pq.ParquetWriter(os.path.join(self.path, part), schema) as merged:
+            for old in old_parts:
+                table = pq.read_table(os.path.join(self.path, old))
+                for name in schema.names:
+                    if name not in table.column_names:
+                        table = table.append_column(name, pa.nulls(len(table), schema.field(name).type))
+                merged.write_table(table.select(schema.names).cast(schema))
+        self.manifest["parts"] = [part]
+        _write_manifest(self.path, self.manifest)
+        for old in old_parts:
+            os.remove(os.path.join(self.path, old))
+
+    def close(self) -> None:
+        self.flush()
+        self._vectors.close()
+        _write_manifest(self.path, self.manifest)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class EmbeddingStore:
+    """
+    Read-only view of a store directory.
+
+    `vectors` is a (count, dim) float32 np.memmap, so opening a store costs a
+    manifest read and a Parquet read, independent of the embedding dimension.
+    """
+
+    def __init__(self, path: str, mmap_mode: str = "r"):
+        self.path = path
+        self.manifest = _read_manifest(path)
+        self.dim = self.manifest["dim"]
+        self.count = self.manifest["count"]
+        self.model = self.manifest.get("model")
+        if self.count:
+            self.vectors = np.memmap(
+                os.path.join(path, VECTORS_FILE), dtype=STORE_DTYPE, mode=mmap_mode, shape=(self.count, self.dim)
+            )
+        else:
+            self.vectors = np.empty((0, self.dim or 0), dtype=STORE_DTYPE)
+        parts = [pq.read_table(os.path.join(path, part), memory_map=True) for part in self.manifest["parts"]]
+        self.meta = pa.concat_tables(parts, promote_options="default").to_pandas() if parts else pd.DataFrame({"text": []})
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def signature(self) -> dict:
+        """Identifies this version of the store, so indexes built from it can tell when they are stale."""
+        signature = {"store_id": self.manifest.get("store_id"), "count": self.count, "dim": self.dim}
+        if signature["store_id"] is None:  # written before stores had an id
+            vectors_path = os.path.join(self.path, VECTORS_FILE)
+            signature["vectors_mtime_ns"] = os.stat(vectors_path).st_mtime_ns if os.path.exists(vectors_path) else None
+        return signature
+
+    @property
+    def texts(self) -> pd.Series:
+        return self.meta["text"]
+
+
+def store_exists(path: str) -> bool:
+    return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+def replace_store(src: str, dst: str) -> None:
+    """Move the store at `src` to `dst`, replacing (and deleting) any store already there."""
+    old = None
+    if os.path.exists(dst):
+        old = dst + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(dst, old)
+    os.rename(src, dst)
+    if old:
+        shutil.rmtree(old)
+
+
+def write_store(path: str, records: list[dict], vectors, model: str | None = None) -> None:
+    """Write a whole store in one call."""
+    with EmbeddingStoreWriter(path, model=model) as writer:
+        writer.write(records, vectors)
+
+
+def load_store(path: str) -> EmbeddingStore:
+    """Open a store with its vectors memory-mapped read-only."""
+    return EmbeddingStore(path)
+
+
+def convert_csv(csv_path: str, store_path: str, model: str | None = None, chunksize: int = 10_000) -> EmbeddingStore:
+    """
+    One-shot conversion of a legacy CSV (text + stringified "embedding" list) to a store.
+
+    The CSV is read in chunks and each embedding is parsed with json.loads
+    rather than eval.
+    """
+    with EmbeddingStoreWriter(store_path, model=model) as writer:
+        for frame in pd.read_csv(csv_path, chunksize=chunksize):
+            vectors = np.array([json.loads(e) for e in frame.pop("embedding")], dtype=STORE_DTYPE)
+            writer.write(frame.to_dict("records"), vectors)
+    return load_store(store_path)
+
+
+# One-shot conversion from the command line (run from the directory above tomos/):
+#   python -m tomos.embeddings.store Spaceflight2025.csv Spaceflight2025.store
+if __name__ == "__main__":
+    import sys
+
+    store = convert_csv(sys.argv[1], sys.argv[2])
+    print(f"Converted {len(store)} rows of {store.dim}-dim embeddings into {sys.argv[2]}.")
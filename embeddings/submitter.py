@@ -0,0 +1,153 @@
+# tomos/embeddings/submitter.py
+# Concurrent, rate-limited submission of embedding batches.
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import count_tokens, embed_texts
+
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Token bucket refilled continuously at `per_minute / 60` units per second.
+
+    acquire(n) blocks until n units are available. A request larger than the
+    whole bucket is let through once the bucket is full, so it can't deadlock.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float = 1) -> None:
+        n = min(n, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= n:
+                    self.available -= n
+                    return
+                wait = (n - self.available) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True for rate limits, server errors, timeouts and dropped connections."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUS_CODES
+    return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in (
+        "APIConnectionError", "APITimeoutError"
+    )
+
+
+def retry_after(exc: Exception) -> str | None:
+    """The Retry-After header of the response behind an API error, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    return headers.get("retry-after") if headers is not None else None
+
+
+def with_retries(fn, max_retries: int = 6, base_delay: float = 0.5, max_delay: float = 30.0):
+    """
+    Call fn(), retrying retryable errors after the server's Retry-After, else
+    with full-jitter exponential backoff (the same delays as utils/transport.py).
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as exc:
+            if attempt == max_retries or not is_retryable(exc):
+                raise
+            from ..utils.transport import backoff_delay  # imports httpx, so only once a retry is needed
+
+            time.sleep(backoff_delay(attempt, retry_after(exc), base_delay, max_delay))
+
+
+class _ThrottledEmbeddings:
+    """Stands in for client.embeddings: every create() is rate-limited and retried."""
+
+    def __init__(self, submitter: "BatchSubmitter"):
+        self.submitter = submitter
+
+    def create(self, input, model, **kwargs):
+        submitter = self.submitter
+        tokens = sum(submitter.token_counter(model, text) for text in input)
+
+        def call():
+            submitter.requests.acquire(1)
+            submitter.tokens.acquire(tokens)
+            return submitter.client.embeddings.create(input=input, model=model, **kwargs)
+
+        response = with_retries(call, max_retries=submitter.max_retries, base_delay=submitter.base_delay)
+        if len(response.data) != len(input):
+            raise ValueError(f"Expected {len(input)} embeddings, got {len(response.data)}")
+        return response
+
+
+class _ThrottledClient:
+    def __init__(self, submitter: "BatchSubmitter"):
+        self.embeddings = _ThrottledEmbeddings(submitter)
+
+
+class BatchSubmitter:
+    """
+    Embed batches of strings on a thread pool, throttled by requests and tokens per minute.
+
+    map() yields each batch with its embeddings in the order the batches were
+    given, keeping at most 2 x concurrency batches in flight. Batches go through the
+    embedding cache, so only cache misses are sent (and count against the limits).
+    Tokens are counted with `token_counter(model, text)`, cache.count_tokens by default.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        concurrency: int = 4,
+        requests_per_minute: float = 3_000,
+        tokens_per_minute: float = 1_000_000,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        cache=None,
+        token_counter=None,
+    ):
+        self.client = client
+        self.model = model
+        self.concurrency = concurrency
+        self.requests = RateLimiter(requests_per_minute)
+        self.tokens = RateLimiter(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.cache = cache
+        self.token_counter = token_counter or count_tokens
+        self._throttled = _ThrottledClient(self)
+
+    def embed(self, batch: list[str]):
+        """Embed one batch (blocking), returning float32 vectors in input order."""
+        return embed_texts(batch, self._throttled, model=self.model, cache=self.cache)
+
+    def map(self, batches, key=None):
+        """
+        Yield (batch, embeddings) for each batch, in order, while later batches are in flight.
+        Batches may come from a generator; it is consumed lazily. If `key` is given, batch
+        items are records and key(item) is the string to embed.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = collections.deque()
+            for batch in batches:
+                texts = batch if key is None else [key(item) for item in batch]
+                pending.append((batch, executor.submit(self.embed, texts)))
+                if len(pending) >= 2 * self.concurrency:
+                    batch, future = pending.popleft()
+                    yield batch, future.result()
+            while pending:
+                batch, future = pending.popleft()
+                yield batch, future.result()
@@ -1,14 +1,45 @@
 # tomos/kernel.py
-from openai import OpenAI
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 # Now you can import modules from the parent directory
-from tomos.utils import prompt_file_parser, response #, streaming
+from tomos.utils import context, prompt_file_parser, response, response_cache #, streaming
+from tomos.utils.clients import get_async_client, get_client
+from tomos.utils.telemetry import Telemetry, call_event, make_telemetry
+
+if TYPE_CHECKING:  # only for annotations; openai is imported when a client is first needed
+    from openai import AsyncOpenAI, OpenAI
+    from tomos.utils.context import ContextRetriever
+    from tomos.utils.semantic_cache import SemanticCache
+
+# System prompts for each mode:
+SYSTEM_PROMPTS = {
+    # Career, an aerospace systems engineering and astrodynamics assistant:
+    "career": (
+        "You are a career co-pilot for an aerospace systems engineer and astrodynamicist. "
+        "Be precise, structured, and helpful with SysML, RFPs, and astrodynamics context."
+    ),
+    # Growth, a multilingual tutor and research scribe:
+    "growth": (
+        "You are a multilingual tutor and research scribe. "
+        "Explain clearly, give examples, and propose short exercises."
+    ),
+    # Play, a creative engine for sci-fi, poetry, and music theory toys:
+    "play": (
+        "You are a creative engine for sci‑fi, poetry, and music theory toys. "
+        "Be imaginative but crisp."
+    ),
+}
 
 # The main TomOS class, which manages modes, templates, and API calls:
 class TomOS:
     
     # Constructor with parameters for prompt, client, model, mode, template usage, local files, streaming, and dry run:
-    def __init__(self, prompt: str = "This is a test.", client: OpenAI=OpenAI(), model: str = "gpt-4o-mini", mode: str = "", template: bool = False, local: bool = True, stream: bool = False, dry: bool = True, schema: str = "free"):
-        self.client = client # OpenAI client object
+    def __init__(self, prompt: str = "This is a test.", client: OpenAI | None = None, model: str = "gpt-4o-mini", mode: str = "", template: bool = False, local: bool = True, stream: bool = False, dry: bool = True, schema: str = "free", async_client: AsyncOpenAI | None = None, cache: response_cache.ResponseCache | str | None = None, bypass_cache: bool = False, semantic_cache: SemanticCache | None = None, retriever: ContextRetriever | None = None, telemetry: Telemetry | str | None = None, quiet: bool = False):
+        self._client = client # OpenAI client object; None = shared client, created on first use
+        self._async_client = async_client # AsyncOpenAI client for arun_batch; None = shared per event loop
         self.model = model # gpt-4o, gpt-4o-mini
         self.mode = mode # career, growth, play
         self.local = local # Use local files for context variables
@@ -24,6 +55,29 @@ class TomOS:
         self.schema_filepath = None # Placeholder for schema file path
         self.output_text = None # Placeholder for API output text
         self.usage = None # Placeholder for API usage stats
+        # Response cache: a ResponseCache, "memory", or an SQLite path; default from TOMOS_RESPONSE_CACHE (unset = off)
+        self.cache = response_cache.make_cache(cache if cache is not None else os.environ.get("TOMOS_RESPONSE_CACHE"))
+        self.bypass_cache = bypass_cache # If True, always call the API (the fresh answer still refreshes the cache)
+        self.semantic_cache = semantic_cache # Optional near-duplicate cache, checked after the exact-match cache
+        self.retriever = retriever # Optional retrieval stage packing local corpus chunks into the prompt
+        self.context = None # Context packed for the last call: text, rows, tokens, latency
+        self.stream_metrics = None # TTFT, inter-token latency and tokens/sec of the last streamed call
+        self.timings = {} # Latency of the last call, split into context assembly and model time (seconds)
+        self.cache_hit = None # "exact" or "semantic" if the last call was served from a cache
+        # Telemetry: a Telemetry, "memory", "prometheus", or a JSONL path; default from TOMOS_TELEMETRY (unset = off)
+        self.telemetry = make_telemetry(telemetry if telemetry is not None else os.environ.get("TOMOS_TELEMETRY"))
+        self.quiet = quiet # If True, skip banners and echoes of prompts, outputs and response objects
+
+    # OpenAI client, created lazily so constructing TomOS (e.g. for a dry run) costs nothing:
+    @property
+    def client(self) -> OpenAI:
+        if self._client is None:
+            self._client = get_client()
+        return self._client
+
+    @client.setter
+    def client(self, client: OpenAI) -> None:
+        self._client = client
 
     # Internal method to manage template files and variables:
     def template_manager(self):
@@ -36,50 +90,189 @@ class TomOS:
         for i in self.vars:
             self.vars[i] = input(f'Please input a value for {i}: ')
             print(f'Setting variable {i} to value {self.vars[i]}.\n')
-        # Get prompt text from template file:
-        self.userPrompt = prompt_file_parser.read_prompt(self)
-
-        # Format user prompt with template variables:
+        # Format the template's prompt with the variables (the template is compiled once per file version):
         print(f'Formatting prompt with variables: {self.vars}\n')       
-        formattedPrompt = self.userPrompt.format(**self.vars)
-        self.userPrompt = formattedPrompt
+        self.userPrompt = prompt_file_parser.render_prompt(self, self.vars)
         return
 
-    # Internal method to call the OpenAI API:
+    # Serve a cached answer (exact or semantic), restoring its original usage flagged as not billed again:
+    def _serve_cached(self, entry: dict, kind: str, label: str, stats: dict) -> str:
+        self.output_text = entry["output_text"]
+        self.usage = {**(entry["usage"] or {}), "cached": True}
+        self.cache_hit = kind
+        if not self.quiet:
+            print(f'{label} (saved {entry["latency"]:.2f} seconds). Cache stats: {stats}\n')
+            print(f'Output text:\n{self.output_text}\n\n')
+        return self.output_text
+
+    # Retrieval stage: system prompt with packed context from the local corpus (unchanged without a retriever):
+    def _system_with_context(self) -> str:
+        if self.retriever is None:
+            self.context = None
+            return self.system
+        self.context = self.retriever.build(self.userPrompt)
+        self.timings["context_s"] = self.context["latency"]
+        if not self.quiet:
+            print(f'Context assembly took {self.context["latency"] * 1e3:.1f} ms: '
+                  f'{len(self.context["rows"])} chunks, {self.context["tokens"]} tokens.\n')
+        return context.with_context(self.system, self.context["text"])
+
+    # Model latency, reported apart from context assembly when a retriever is set:
+    def _report_model_time(self, latency: float) -> None:
+        self.timings["model_s"] = latency
+        if self.retriever is not None and not self.quiet:
+            print(f'Model call took {latency * 1e3:.1f} ms (context assembly: {self.timings["context_s"] * 1e3:.1f} ms).\n')
+
+    # Internal method to call the OpenAI API, recording one telemetry event per call:
     def _call(self) -> str:       
-        print(f'\n\nCalling OpenAI API with prompt:\n    {self.userPrompt}\n\n')
+        if not self.quiet:
+            print(f'\n\nCalling OpenAI API with prompt:\n    {self.userPrompt}\n\n')
         if self.dry:
             print('Dry run enabled. No API call was made. Your prompt was:\n\n')
             return self.userPrompt
-        else:
-            return response.responses_call(self)
+        self.timings, self.cache_hit, self.stream_metrics, self.usage = {}, None, None, None
+        start_time = time.perf_counter()
+        error = None
+        try:
+            return self._respond()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.record(call_event(
+                    self.model, self.mode, wall_s=time.perf_counter() - start_time,
+                    ttft_s=(self.stream_metrics or {}).get("ttft_s"), usage=self.usage, cache=self.cache_hit,
+                    error=error, context_s=self.timings.get("context_s"),
+                ))
+
+    # Context, caches, then the model:
+    def _respond(self) -> str:
+        system = self._system_with_context()
+        if self.cache is None and self.semantic_cache is None:
+            start_time = time.perf_counter()
+            result = response.responses_call(self, system=system)
+            self._report_model_time(time.perf_counter() - start_time)
+            return result
+
+        # Exact-match response cache, keyed by (model, system + context, userPrompt, schema):
+        text_param = response.schema_param(self)
+        key = response_cache.cache_key(self.model, system, self.userPrompt, text_param)
+        if self.cache is not None:
+            if self.bypass_cache:
+                self.cache.bypassed += 1
+            else:
+                entry = self.cache.get(key)
+                if entry is not None:
+                    return self._serve_cached(entry, "exact", "Response cache hit", self.cache.stats())
+
+        # Semantic cache: a near-duplicate prompt answered before in the same namespace (mode + packed
+        # context), so an answer is only reused when the prompt was grounded in the same chunks:
+        match = None
+        if self.semantic_cache is not None and not self.bypass_cache:
+            namespace = self.semantic_cache.namespace(self.model, system, text_param)
+            match = self.semantic_cache.lookup(namespace, self.userPrompt)
+            if match["entry"] is not None and not match["audit"]:
+                label = f'Semantic cache hit at similarity {match["similarity"]:.3f} with "{match["entry"]["prompt"]}"'
+                return self._serve_cached(match["entry"], "semantic", label, self.semantic_cache.stats())
+
+        self.output_text = None # so a failed call can't cache a stale answer
+        start_time = time.perf_counter()
+        result = response.responses_call(self, text_param=text_param, system=system)
+        latency = time.perf_counter() - start_time
+        self._report_model_time(latency)
+        output_text = result if result is not None else self.output_text
+        if output_text is not None:
+            if self.cache is not None:
+                self.cache.put(key, output_text, self.usage, latency)
+            if match is not None and match["audit"]:
+                self.semantic_cache.record_audit(match, output_text)
+            elif match is not None:
+                self.semantic_cache.put(match, output_text, self.usage, latency)
+        return result
+
+    # Shared setup for run_batch/arun_batch: system prompt and schema are resolved once per batch,
+    # both for `mode` (default: the instance's mode, then its current system prompt).
+    def _batch_request(self, mode: str | None) -> tuple[str, dict | None]:
+        mode = mode or self.mode
+        if mode and mode not in SYSTEM_PROMPTS:
+            raise ValueError(f"Unknown mode {mode!r}; expected one of {sorted(SYSTEM_PROMPTS)}")
+        system = SYSTEM_PROMPTS.get(mode, self.system)
+        return system, response.schema_param(self, mode)
+
+    # Package one batch item's result in input order:
+    @staticmethod
+    def _batch_result(index: int, prompt: str, result: dict) -> dict:
+        return {"index": index, "prompt": prompt, **result}
+
+    # Telemetry event for one batch item, with the time it waited for a worker:
+    def _record_batch_item(self, result: dict, mode: str | None) -> dict:
+        if self.telemetry is not None:
+            self.telemetry.record(call_event(
+                self.model, mode or self.mode, wall_s=result["latency"], queue_s=result["queue_s"],
+                usage=result["usage"], error=result["error"],
+            ))
+        return result
+
+    # Run many prompts concurrently with the shared client. Each result is a dict with
+    # index, prompt, output_text, usage, error, latency and queue_s, in input order. Instance
+    # state (userPrompt, output_text, usage) is not touched, and a failed item only
+    # sets its own "error". `mode` picks a system prompt; default is the current one.
+    def run_batch(self, prompts: list[str], concurrency: int = 8, mode: str | None = None) -> list[dict]:
+        if self.dry:
+            return [self._batch_result(i, p, {"output_text": p, "usage": None, "error": None, "latency": 0.0, "queue_s": 0.0})
+                    for i, p in enumerate(prompts)]
+        system, text_param = self._batch_request(mode)
+        client = self.client
+        submitted = time.perf_counter()
+
+        def one(prompt: str) -> dict:
+            queue_s = time.perf_counter() - submitted
+            result = response.request_once(client, self.model, system, prompt, text_param)
+            return self._record_batch_item({**result, "queue_s": queue_s}, mode)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            results = executor.map(one, prompts)
+            return [self._batch_result(i, p, r) for i, (p, r) in enumerate(zip(prompts, results))]
+
+    # Async version of run_batch over an AsyncOpenAI client, with at most
+    # `concurrency` requests in flight (bounded semaphore):
+    async def arun_batch(self, prompts: list[str], concurrency: int = 8, mode: str | None = None) -> list[dict]:
+        import asyncio  # only needed here; keeps `import tomos.kernel` fast
+
+        if self.dry:
+            return self.run_batch(prompts, concurrency, mode)
+        system, text_param = self._batch_request(mode)
+        client = self._async_client or get_async_client()
+        semaphore = asyncio.BoundedSemaphore(max(1, concurrency))
+        submitted = time.perf_counter()
+
+        async def one(prompt: str) -> dict:
+            async with semaphore:
+                queue_s = time.perf_counter() - submitted
+                result = await response.arequest_once(client, self.model, system, prompt, text_param)
+            return self._record_batch_item({**result, "queue_s": queue_s}, mode)
+
+        results = await asyncio.gather(*(one(p) for p in prompts))
+        return [self._batch_result(i, p, r) for i, (p, r) in enumerate(zip(prompts, results))]
 
     # Career, an aerospace systems engineering and astrodynamics assistant:
     def career(self) -> str:
-        self.system = (
-            "You are a career co-pilot for an aerospace systems engineer and astrodynamicist. "
-            "Be precise, structured, and helpful with SysML, RFPs, and astrodynamics context."
-        )
+        self.system = SYSTEM_PROMPTS["career"]
         if (self.template):
             self.template_manager()
         return self._call()
 
     # Growth, a multilingual tutor and research scribe:
     def growth(self) -> str:
-        self.system = (
-            "You are a multilingual tutor and research scribe. "
-            "Explain clearly, give examples, and propose short exercises."
-        )
+        self.system = SYSTEM_PROMPTS["growth"]
         if (self.template):
             self.template_manager()
         return self._call()
 
     # Play, a creative engine for sci-fi, poetry, and music theory toys:
     def play(self) -> str:
-        self.system = (
-            "You are a creative engine for sci‑fi, poetry, and music theory toys. "
-            "Be imaginative but crisp."
-        )
+        self.system = SYSTEM_PROMPTS["play"]
         if (self.template):
             self.template_manager()
         return self._call()
\ No newline at end of file
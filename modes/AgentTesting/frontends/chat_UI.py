@@ -1,16 +1,13 @@
-
-
 from fastapi import FastAPI
 from pydantic import BaseModel
-from openai import OpenAI
-import os
+
+from tomos.utils.clients import get_client  # created on first request, not at import
 
 app = FastAPI()
-openai = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
 
 @app.post("/api/chatkit/session")
 def create_chatkit_session():
-    session = openai.chatkit.sessions.create({
+    session = get_client().chatkit.sessions.create({
       # ...
     })
-    return { client_secret: session.client_secret }
+    return { "client_secret": session.client_secret }
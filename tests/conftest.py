@@ -0,0 +1,17 @@
+# tomos/tests/conftest.py
+# The repository root is the tomos package, but a checkout can have any
+# directory name. Register the root as "tomos" before the tests import tomos.*,
+# so `pytest` works from the checkout (or its parent) without installing it.
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "tomos" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "tomos", os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["tomos"] = module
+    spec.loader.exec_module(module)
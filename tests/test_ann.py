@@ -0,0 +1,33 @@
+# tomos/tests/test_ann.py
+# IVFIndex batch search: shape, padding and agreement with exact search.
+import numpy as np
+
+from tomos.embeddings.ann import IVFIndex
+from tomos.embeddings.index import VectorIndex
+
+
+def random_vectors(n: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_search_batch_pads_short_results():
+    vectors, queries = random_vectors(200), random_vectors(5, seed=1)
+    index = IVFIndex.build(vectors, n_lists=50, nprobe=1)  # ~4 rows per list, fewer than k
+    ids, sims = index.search_batch(queries, 10)
+    assert ids.shape == sims.shape == (5, 10)
+    padded = ids == -1
+    assert padded.any()
+    assert np.all(np.isneginf(sims[padded])) and np.all(np.isfinite(sims[~padded]))
+    for query, row_ids in zip(queries, ids):
+        single_ids, single_sims = index.search(query, 10)
+        assert np.array_equal(single_ids, row_ids[row_ids >= 0])
+        assert np.all(np.isfinite(single_sims))
+
+
+def test_probing_every_list_is_exact():
+    vectors, queries = random_vectors(300), random_vectors(8, seed=1)
+    index = IVFIndex.build(vectors, n_lists=10, nprobe=10)
+    ids, sims = index.search_batch(queries, 5)
+    exact_ids, exact_sims = VectorIndex(vectors).search_batch(queries, 5)
+    assert np.array_equal(ids, exact_ids)
+    assert np.allclose(sims, exact_sims, atol=1e-5)
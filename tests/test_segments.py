@@ -0,0 +1,122 @@
+# tomos/tests/test_segments.py
+# SegmentedIndex updates and MergedIndex search over a base store plus segments,
+# checked against brute-force search over the live rows.
+import numpy as np
+import pytest
+
+from tomos.embeddings import embeddings
+from tomos.embeddings.ann import IVFIndex
+from tomos.embeddings.index import VectorIndex, normalize_rows
+from tomos.embeddings.segments import MergedIndex, SegmentedIndex
+from tomos.embeddings.store import load_store, write_store
+
+DIM = 16
+N_BASE = 200
+
+
+def random_vectors(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def records(doc_ids, tag: str = "base") -> list[dict]:
+    return [{"text": f"{tag} {doc_id}", "doc_id": doc_id} for doc_id in doc_ids]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """A base store of N_BASE one-chunk documents and an empty segmented index beside it."""
+    store_path, segments_path = str(tmp_path / "store"), str(tmp_path / "store.segments")
+    write_store(store_path, records(f"doc{i}" for i in range(N_BASE)), random_vectors(N_BASE, seed=0))
+    segments = SegmentedIndex(segments_path, dims=DIM)
+    yield load_store(store_path), segments
+    segments.close()
+
+
+def update(segments: SegmentedIndex) -> dict:
+    """Upsert doc0-doc4, delete doc5-doc9 and add two new documents; returns doc_id -> new vector."""
+    upserted = random_vectors(5, seed=1)
+    segments.upsert(records([f"doc{i}" for i in range(5)], "new"), upserted)
+    segments.delete([f"doc{i}" for i in range(5, 10)])
+    added = random_vectors(2, seed=2)
+    segments.add(records(["extra0", "extra1"], "new"), added)
+    return {**{f"doc{i}": v for i, v in enumerate(upserted)}, "extra0": added[0], "extra1": added[1]}
+
+
+def brute_force(merged: MergedIndex, vectors: np.ndarray, queries, k: int) -> np.ndarray:
+    """Exact top-k merged rows over the live rows only."""
+    scores = normalize_rows(queries) @ normalize_rows(vectors).T
+    scores[:, ~merged.live] = -np.inf
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def merged_vectors(store, segments: SegmentedIndex) -> np.ndarray:
+    snapshot = segments.snapshot()
+    return np.concatenate([store.vectors] + [s.vectors for s in snapshot.stores])
+
+
+def test_merged_search_hides_replaced_and_deleted_rows(corpus):
+    store, segments = corpus
+    new_vectors = update(segments)
+    merged = MergedIndex(store.meta, VectorIndex.from_store(store), segments.snapshot())
+    assert len(merged) == N_BASE - 5 + 2
+    for doc_id, vector in new_vectors.items():
+        ids, _ = merged.search(vector, 3)
+        assert merged.meta["doc_id"].iloc[ids[0]] == doc_id
+        assert merged.meta["text"].iloc[ids[0]] == f"new {doc_id}"
+    queries = random_vectors(20, seed=3)
+    ids, _ = merged.search_batch(queries, 10)
+    assert np.array_equal(ids, brute_force(merged, merged_vectors(store, segments), queries, 10))
+    deleted = {f"doc{i}" for i in range(5, 10)}
+    assert not deleted & set(merged.meta["doc_id"].iloc[ids.ravel()])
+
+
+def test_merged_search_over_ivf_base(corpus):
+    store, segments = corpus
+    update(segments)
+    base = IVFIndex.from_store(store, n_lists=50, nprobe=1)  # lists shorter than k: the base results are padded
+    merged = MergedIndex(store.meta, base, segments.snapshot())
+    queries = random_vectors(20, seed=3)
+    ids, sims = merged.search_batch(queries, 10)
+    assert ids.shape == sims.shape == (20, 10)
+    found = sims > -np.inf
+    assert np.all(ids[~found] == -1)
+    assert merged.live[ids[found]].all()
+    for query, row_ids in zip(queries, ids):
+        single_ids, single_sims = merged.search(query, 10)
+        assert np.array_equal(single_ids, row_ids[row_ids >= 0])
+        assert np.all(np.isfinite(single_sims))
+
+    exact = MergedIndex(store.meta, IVFIndex.from_store(store, n_lists=50, nprobe=50), segments.snapshot())
+    exact_ids, _ = exact.search_batch(queries, 10)
+    assert np.array_equal(exact_ids, brute_force(exact, merged_vectors(store, segments), queries, 10))
+
+
+def test_compaction_keeps_merged_results(corpus):
+    store, segments = corpus
+    update(segments)
+    segments.upsert(records(["doc0"], "newer"), random_vectors(1, seed=4))
+    queries = random_vectors(20, seed=3)
+    base = IVFIndex.from_store(store, n_lists=10, nprobe=10)
+
+    def search() -> list:
+        merged = MergedIndex(store.meta, base, segments.snapshot())
+        ids, _ = merged.search_batch(queries, 10)
+        return [list(merged.meta["text"].iloc[row_ids]) for row_ids in ids]
+
+    before = search()
+    assert segments.compact()
+    assert len(segments.snapshot().segments) == 1
+    assert search() == before
+    assert len(segments) == 5 + 2
+
+
+def test_load_corpus_merges_segments_with_ivf(corpus):
+    store, segments = corpus
+    new_vectors = update(segments)
+    df, index = embeddings.load_corpus(store.path, kind="ivf", index_path=None, dims=DIM, segments_path=segments.path)
+    assert isinstance(index, MergedIndex)
+    assert isinstance(index.base_index, IVFIndex)
+    ids, sims = index.search_batch(random_vectors(8, seed=3), 10)
+    assert ids.shape == (8, 10)
+    ids, _ = index.search(new_vectors["extra1"], 3)
+    assert df["doc_id"].iloc[ids[0]] == "extra1"
@@ -0,0 +1,132 @@
+# tomos/tests/test_submitter.py
+# Rate limiting, retries and ordering of BatchSubmitter, against the fake
+# embeddings client (embeddings/fakes.py).
+import time
+
+import numpy as np
+import pytest
+
+from tomos.embeddings.cache import EmbeddingCache
+from tomos.embeddings.fakes import FakeAPIError, FakeClient, fake_embedding, fake_token_count
+from tomos.embeddings.submitter import BatchSubmitter, RateLimiter, with_retries
+
+MODEL = "text-embedding-3-small"
+
+
+def submitter_for(client, **kwargs) -> BatchSubmitter:
+    """A submitter with an in-memory cache; tokens are counted without tiktoken, so no encoding download."""
+    kwargs.setdefault("base_delay", 0.001)
+    cache = EmbeddingCache(":memory:", token_counter=fake_token_count)
+    return BatchSubmitter(client, MODEL, cache=cache, token_counter=fake_token_count, **kwargs)
+
+
+def test_rate_limiter_throttles_once_bucket_is_empty():
+    limiter = RateLimiter(per_minute=1200)  # 20 per second
+    start_time = time.perf_counter()
+    limiter.acquire(1200)  # a full bucket is available at once
+    assert time.perf_counter() - start_time < 0.1
+    limiter.acquire(5)
+    assert time.perf_counter() - start_time >= 0.2
+
+
+def test_rate_limiter_lets_oversized_request_through():
+    limiter = RateLimiter(per_minute=60)
+    start_time = time.perf_counter()
+    limiter.acquire(1000)  # more than the bucket holds: waits for a full bucket, not forever
+    assert time.perf_counter() - start_time < 0.1
+
+
+def test_with_retries_retries_retryable_errors():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise FakeAPIError(503)
+        return "ok"
+
+    assert with_retries(flaky, base_delay=0.001) == "ok"
+    assert len(calls) == 3
+
+
+def test_with_retries_raises_other_errors_at_once():
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise FakeAPIError(400, "Bad request")
+
+    with pytest.raises(FakeAPIError):
+        with_retries(bad_request, base_delay=0.001)
+    assert len(calls) == 1
+
+
+def test_with_retries_gives_up_after_max_retries():
+    calls = []
+
+    def always_limited():
+        calls.append(1)
+        raise FakeAPIError(429)
+
+    with pytest.raises(FakeAPIError):
+        with_retries(always_limited, max_retries=2, base_delay=0.001)
+    assert len(calls) == 3
+
+
+def test_with_retries_waits_for_retry_after():
+    calls = []
+
+    def limited_once():
+        calls.append(time.perf_counter())
+        if len(calls) == 1:
+            raise FakeAPIError(429, retry_after="0.3")
+        return "ok"
+
+    assert with_retries(limited_once, base_delay=0.0) == "ok"  # without Retry-After the retry would be immediate
+    assert calls[1] - calls[0] >= 0.3
+
+
+def test_map_keeps_batch_order():
+    client = FakeClient(dim=16, latency=0.0, jitter=0.05, seed=1)
+    batches = [[f"batch {i} text {j}" for j in range(3)] for i in range(12)]
+    results = list(submitter_for(client, concurrency=4).map(iter(batches)))
+    assert [batch for batch, _ in results] == batches
+    for batch, vectors in results:
+        for text, vector in zip(batch, vectors):
+            np.testing.assert_allclose(vector, fake_embedding(text, 16), rtol=1e-6)
+    assert client.embeddings.max_in_flight <= 4
+
+
+def test_map_with_key_yields_records():
+    client = FakeClient(dim=8)
+    records = [[{"text": f"chunk {i}", "row": i}] for i in range(5)]
+    results = list(submitter_for(client).map(records, key=lambda record: record["text"]))
+    assert [batch for batch, _ in results] == records
+
+
+def test_map_retries_rate_limit_errors():
+    client = FakeClient(dim=8, error_rate=0.3, seed=3)
+    batches = [[f"text {i}"] for i in range(20)]
+    results = list(submitter_for(client, concurrency=4, max_retries=20).map(batches))
+    assert len(results) == len(batches)
+    assert client.embeddings.errors > 0
+    for batch, vectors in results:
+        np.testing.assert_allclose(vectors[0], fake_embedding(batch[0], 8), rtol=1e-6)
+
+
+def test_map_respects_requests_per_minute():
+    client = FakeClient(dim=8)
+    submitter = submitter_for(client, concurrency=4, requests_per_minute=1200)  # 20 requests per second
+    submitter.requests.available = 0  # start from an empty bucket
+    start_time = time.perf_counter()
+    list(submitter.map([[f"text {i}"] for i in range(10)]))
+    assert time.perf_counter() - start_time >= 0.4
+    assert client.embeddings.requests == 10
+
+
+def test_cache_hits_are_not_sent():
+    client = FakeClient(dim=8)
+    submitter = submitter_for(client)
+    list(submitter.map([["a", "b"]]))
+    list(submitter.map([["a", "b", "c"]]))
+    assert client.embeddings.inputs == 3  # only "c" was new the second time
@@ -0,0 +1,160 @@
+# tomos/tests/test_transport.py
+# Retries, per-endpoint timeouts and hedging of the shared clients, against a
+# local MockServer. Run from the directory above tomos/: python -m pytest tomos/tests
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from tomos.utils.clients import ClientRegistry
+from tomos.utils.mock_server import MockServer
+from tomos.utils.transport import AsyncRetryTransport, HttpPolicy, backoff_delay
+
+EMBEDDINGS = {"model": "text-embedding-3-small", "input": ["hello"]}
+
+
+def registry_for(server: MockServer, **policy) -> ClientRegistry:
+    return ClientRegistry(base_url=server.url, api_key="test", policy=HttpPolicy(**policy))
+
+
+def warm_up(policy: HttpPolicy, endpoint: str, seconds: float) -> None:
+    """Fill the latency history so that hedging starts after `seconds`."""
+    for _ in range(policy.hedge_min_samples):
+        policy.record(endpoint, seconds)
+
+
+def test_backoff_delay_prefers_retry_after():
+    assert backoff_delay(0, "2") == 2.0
+    assert backoff_delay(0, "120", cap=20.0) == 20.0
+    assert 0.0 <= backoff_delay(3, "Wed, 21 Oct 2026 07:28:00 GMT", base=0.01) <= 0.08  # dates fall back to jitter
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_retryable_status(status):
+    with MockServer(script=[(status, 0.0), (status, 0.0)]) as server:
+        registry = registry_for(server, backoff_base=0.001)
+        response = registry.http().post(f"{server.url}/embeddings", json=EMBEDDINGS)
+        assert response.status_code == 200
+        assert len(server.requests) == 3
+        assert registry.stats()["/embeddings"]["retries"] == 2
+        registry.close()
+
+
+def test_gives_up_after_max_retries():
+    with MockServer(script=[(503, 0.0)] * 3) as server:
+        registry = registry_for(server, max_retries=2, backoff_base=0.001)
+        response = registry.http().post(f"{server.url}/embeddings", json=EMBEDDINGS)
+        assert response.status_code == 503
+        assert len(server.requests) == 3
+        registry.close()
+
+
+def test_does_not_retry_client_errors():
+    with MockServer(script=[(400, 0.0)]) as server:
+        registry = registry_for(server, backoff_base=0.001)
+        assert registry.http().post(f"{server.url}/embeddings", json=EMBEDDINGS).status_code == 400
+        assert len(server.requests) == 1
+        registry.close()
+
+
+def test_waits_for_retry_after():
+    with MockServer(script=[(429, 0.0)], retry_after="0.3") as server:
+        registry = registry_for(server, backoff_base=0.0)  # without Retry-After the retry would be immediate
+        start_time = time.perf_counter()
+        response = registry.http().post(f"{server.url}/embeddings", json=EMBEDDINGS)
+        assert response.status_code == 200
+        assert time.perf_counter() - start_time >= 0.3
+        registry.close()
+
+
+def test_per_endpoint_timeout():
+    timeouts = {"/embeddings": httpx.Timeout(0.2), "/responses": httpx.Timeout(5.0)}
+    with MockServer(script=[(200, 1.0), (200, 0.5)]) as server:
+        registry = registry_for(server, timeouts=timeouts, max_retries=0)
+        http = registry.http()
+        with pytest.raises(httpx.ReadTimeout):
+            http.post(f"{server.url}/embeddings", json=EMBEDDINGS)
+        response = http.post(f"{server.url}/responses", json={"model": "gpt-4o-mini", "input": "hi"})
+        assert response.status_code == 200  # slower than the embeddings timeout, within its own
+        registry.close()
+
+
+def test_hedge_wins_over_slow_request():
+    with MockServer(script=[(200, 1.0), (200, 0.0)]) as server:
+        registry = registry_for(server, hedge_endpoints=("/embeddings",))
+        warm_up(registry.policy, "/embeddings", 0.05)
+        start_time = time.perf_counter()
+        response = registry.http().post(f"{server.url}/embeddings", json=EMBEDDINGS)
+        assert response.status_code == 200
+        assert time.perf_counter() - start_time < 0.9
+        stats = registry.stats()["/embeddings"]
+        assert (stats["hedged"], stats["hedge_wins"]) == (1, 1)
+        registry.close()
+
+
+def test_hedge_loses_to_first_request():
+    with MockServer(script=[(200, 0.2), (200, 1.0)]) as server:
+        registry = registry_for(server, hedge_endpoints=("/embeddings",))
+        warm_up(registry.policy, "/embeddings", 0.05)
+        response = registry.http().post(f"{server.url}/embeddings", json=EMBEDDINGS)
+        assert response.status_code == 200
+        stats = registry.stats()["/embeddings"]
+        assert (stats["hedged"], stats["hedge_wins"]) == (1, 0)
+        assert len(server.requests) == 2
+        registry.close()
+
+
+def test_async_hedge_wins_over_slow_request():
+    async def run(server):
+        registry = registry_for(server, hedge_endpoints=("/embeddings",))
+        warm_up(registry.policy, "/embeddings", 0.05)
+        response = await registry.async_http().post(f"{server.url}/embeddings", json=EMBEDDINGS)
+        await registry.async_http().aclose()
+        return response, registry.stats()["/embeddings"]
+
+    with MockServer(script=[(200, 1.0), (200, 0.0)]) as server:
+        response, stats = asyncio.run(run(server))
+    assert response.status_code == 200
+    assert (stats["hedged"], stats["hedge_wins"]) == (1, 1)
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    def __init__(self):
+        self.closed = False
+
+    async def __aiter__(self):
+        yield b"{}"
+
+    async def aclose(self):
+        self.closed = True
+
+
+class _SimultaneousTransport(httpx.AsyncBaseTransport):
+    """Holds every request until `release` is set, so the original and its hedge finish together."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.streams = []
+
+    async def handle_async_request(self, request):
+        stream = _TrackedStream()
+        self.streams.append(stream)
+        await self.release.wait()
+        return httpx.Response(200, stream=stream, request=request)
+
+
+def test_async_hedge_closes_loser_that_already_arrived():
+    async def run():
+        inner = _SimultaneousTransport()
+        policy = HttpPolicy(hedge_endpoints=("/embeddings",))
+        warm_up(policy, "/embeddings", 0.05)
+        transport = AsyncRetryTransport(policy, transport=inner)
+        asyncio.get_running_loop().call_later(0.2, inner.release.set)
+        response = await transport.handle_async_request(httpx.Request("POST", "http://mock/v1/embeddings"))
+        return inner.streams, response
+
+    streams, response = asyncio.run(run())
+    assert len(streams) == 2
+    assert [s.closed for s in streams].count(True) == 1  # the loser, not the response returned
+    assert not response.stream.closed
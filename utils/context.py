@@ -0,0 +1,97 @@
+# tomos/utils/context.py
+# Retrieval-augmented context for TomOS: top-k chunks from the local embedding
+# store (built by embeddings/embed.py), packed under a token budget.
+#
+# The packed context goes after the system prompt, before the user prompt. It
+# lists the selected chunks in corpus order rather than rank order, with
+# duplicates removed, so the same chunks always produce the same text and the
+# system-plus-context prefix stays byte-identical for provider-side prompt caching.
+import time
+
+CONTEXT_HEADER = "Reference material from the local knowledge base (use it where relevant):"
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+
+class ContextRetriever:
+    """
+    Retrieves and packs context for a prompt.
+
+    The corpus and its indexes are loaded on first use and kept; token counts
+    of chunks are memoized per row, on top of the cached tokenizer.
+    - k: chunks retrieved per prompt (hybrid BM25 + vector search)
+    - token_budget: most tokens of chunk text packed into the prompt
+    """
+
+    def __init__(self, store_path: str | None = None, kind: str | None = None, index_path: str | None = None,
+                 k: int = 8, token_budget: int = 1500, model: str = "gpt-4o-mini", segments_path: str | None = None):
+        self.store_path = store_path
+        self.kind = kind
+        self.index_path = index_path
+        self.segments_path = segments_path
+        self.k = k
+        self.token_budget = token_budget
+        self.model = model
+        self._corpus = None
+        self._tokens = {}  # row -> token count
+
+    def _load(self):
+        if self._corpus is None:
+            from ..embeddings import embeddings
+
+            df, index = embeddings.load_corpus(
+                self.store_path or embeddings.STORE_PATH,
+                kind=self.kind or embeddings.INDEX_KIND,
+                index_path=self.index_path or embeddings.INDEX_PATH,
+                segments_path=self.segments_path or embeddings.SEGMENTS_PATH,
+            )
+            lexical = embeddings.load_lexical(self.store_path or embeddings.STORE_PATH, index=index)
+            self._corpus = (embeddings, df, index, lexical)
+        return self._corpus
+
+    def _num_tokens(self, row: int, text: str) -> int:
+        if row not in self._tokens:
+            from ..embeddings.chunker import get_encoding
+
+            self._tokens[row] = len(get_encoding(self.model).encode(text))
+        return self._tokens[row]
+
+    def retrieve(self, query: str) -> list[int]:
+        """Corpus rows (positions, for .iloc) of the top-k chunks for `query`, best first."""
+        embeddings, df, index, lexical = self._load()
+        found = embeddings.hybrid_search(df, query, n=self.k, index=index, lexical=lexical)
+        return [int(row) for row in df.index.get_indexer(found.index)]
+
+    def pack(self, rows: list[int]) -> tuple[str, list[int], int]:
+        """
+        Greedily keep the best-ranked chunks that fit the token budget, skipping
+        duplicate texts, then emit them in corpus order.
+        Returns (context text, rows used, tokens used).
+        """
+        _, df, _, _ = self._load()
+        texts = df["text"]
+        keys = df["content_hash"] if "content_hash" in df else texts
+        seen, chosen, used = set(), [], 0
+        for row in rows:
+            if keys.iloc[row] in seen:
+                continue
+            tokens = self._num_tokens(row, texts.iloc[row])
+            if used + tokens > self.token_budget:
+                continue  # a shorter, lower-ranked chunk may still fit
+            seen.add(keys.iloc[row])
+            chosen.append(row)
+            used += tokens
+        chosen.sort()
+        return CHUNK_SEPARATOR.join(texts.iloc[row] for row in chosen), chosen, used
+
+    def build(self, query: str) -> dict:
+        """Retrieve and pack context for `query`: {"text", "rows", "tokens", "latency"}."""
+        start_time = time.perf_counter()
+        text, rows, tokens = self.pack(self.retrieve(query))
+        return {"text": text, "rows": rows, "tokens": tokens, "latency": time.perf_counter() - start_time}
+
+
+def with_context(system: str, context_text: str) -> str:
+    """System prompt followed by the packed context (unchanged if there is none)."""
+    if not context_text:
+        return system
+    return f"{system}\n\n{CONTEXT_HEADER}\n\n{context_text}"
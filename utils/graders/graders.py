@@ -1,7 +1,15 @@
+# tomos/utils/graders/graders.py
+# Helpers for the fine-tuning graders API. Nothing runs at import time; the
+# example session is under __main__.
+from __future__ import annotations
+
 import os
-import requests
-from typing import Any
-from openai import OpenAI # ensure you have openai package installed
+from typing import TYPE_CHECKING, Any
+
+from tomos.utils.clients import get_client, get_http_client, get_registry  # shared pooled client with retries and timeouts
+
+if TYPE_CHECKING:
+    import httpx
 
 
 '''
@@ -39,9 +47,7 @@ def grade(sample: dict[str, Any], item: dict[str, Any]) -> float:
     return 1.0
 """
 
-# get the API key from environment
-api_key = os.environ["OPENAI_API_KEY"]
-headers = {"Authorization": f"Bearer {api_key}"}
+GRADERS_PATH = "/fine_tuning/alpha/graders"
 
 grading_function = """
 from rapidfuzz import fuzz, utils
@@ -58,35 +64,39 @@ grader = {
     "source": grading_function
 }
 
-# validate the grader
-payload = {"grader": grader}
-response = requests.post(
-    "https://api.openai.com/v1/fine_tuning/alpha/graders/validate",
-    json=payload,
-    headers=headers
-)
-print(f"The request returned the following HTTP code: {response.status_code}")
-print("validate request_id:", response.headers["x-request-id"])
-print("validate response:", response.text)
-
-# run the grader with a test reference and sample
-payload = {
-  "grader": grader,
-  "item": {
-     "reference_answer": "fuzzy wuzzy had no hair"
-  },
-  "model_sample": "fuzzy wuzzy was a bear"
-}
-response = requests.post(
-    "https://api.openai.com/v1/fine_tuning/alpha/graders/run",
-    json=payload,
-    headers=headers
-)
-print(f"The request returned the following HTTP code: {response.status_code}")
-print("run request_id:", response.headers["x-request-id"])
-print("run response:", response.text)
 
-client = OpenAI()
+# headers are built per call, so the API key is only read when a request is made
+def _headers() -> dict[str, str]:
+    return {"Authorization": f"Bearer {get_registry().api_key or os.environ['OPENAI_API_KEY']}"}
+
+
+# POST a payload to a graders endpoint over the shared connection pool and print the outcome:
+def _post(endpoint: str, payload: dict[str, Any]) -> httpx.Response:
+    url = f"{get_registry().base_url.rstrip('/')}{GRADERS_PATH}/{endpoint}"
+    response = get_http_client().post(url, json=payload, headers=_headers())
+    print(f"The request returned the following HTTP code: {response.status_code}")
+    print(f"{endpoint} request_id:", response.headers.get("x-request-id"))
+    print(f"{endpoint} response:", response.text)
+    return response
+
+
+# validate a grader definition
+def validate_grader(grader: dict[str, Any]) -> httpx.Response:
+    return _post("validate", {"grader": grader})
+
+
+# run a grader on one model sample against a reference item
+def run_grader(grader: dict[str, Any], item: dict[str, Any], model_sample: str) -> httpx.Response:
+    return _post("run", {"grader": grader, "item": item, "model_sample": model_sample})
+
+
+# returns the grader's reward, or None if the run failed
+def grade_sample(grader: dict[str, Any], item: dict[str, Any], model_sample: str) -> float | None:
+    response = run_grader(grader, item, model_sample)
+    if response.status_code != 200:
+        return None
+    return response.json().get("reward")
+
 
 instructions = """
 You are an expert in categorizing IT support tickets. Given the support
@@ -96,37 +106,32 @@ or "Other". Respond with only one of those words.
 
 ticket = "My monitor won't turn on - help!"
 
-response = client.responses.create(
-    model="gpt-4.1",
-    input=[
-        {"role": "developer", "content": instructions},
-        {"role": "user", "content": ticket},
-    ],
-)
-
-payload = {
-  "grader": grader,
-  "item": {
-     "reference_answer": "Hardware"
-  },
-  "model_sample": response.output_text
-}
 
-print(response.output_text)
-response = requests.post(
-    "https://api.openai.com/v1/fine_tuning/alpha/graders/run",
-    json=payload,
-    headers=headers
-)
-print(f"The request returned the following HTTP code: {response.status_code}")
-print("run request_id:", response.headers["x-request-id"]) 
-print("run response:", response.text)
-if response.status_code == 200:
-    current_grade = response.json().get("reward")
-    print("Grade:", current_grade)  
+# Example session: validate the grader, run it on a fixed sample, then grade a live model answer.
+def main():
+    validate_grader(grader)
+
+    # run the grader with a test reference and sample
+    run_grader(grader, {"reference_answer": "fuzzy wuzzy had no hair"}, "fuzzy wuzzy was a bear")
+
+    response = get_client().responses.create(
+        model="gpt-4.1",
+        input=[
+            {"role": "developer", "content": instructions},
+            {"role": "user", "content": ticket},
+        ],
+    )
+    print(response.output_text)
+
+    current_grade = grade_sample(grader, {"reference_answer": "Hardware"}, response.output_text)
+    print("Grade:", current_grade)
     if (current_grade is not None) and (current_grade < 0.5):
         print("The model's response was not satisfactory.")
     else:
         print("\n\nThe model's response was satisfactory.\n")
         if current_grade is not None and current_grade >= 0.95:
-            print("--No, actually, the model's response was fucking fantastic.\n")
\ No newline at end of file
+            print("--No, actually, the model's response was fucking fantastic.\n")
+
+
+if __name__ == "__main__":
+    main()
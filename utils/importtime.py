@@ -0,0 +1,70 @@
+# tomos/utils/importtime.py
+# Import-time budget check for fast CLI startup.
+#
+# Run from the directory above tomos/:
+#   python -m tomos.utils.importtime            # report, exit 1 if over budget
+#   python -m tomos.utils.importtime --repeat 5
+#
+# Each module is imported in a fresh interpreter under `python -X importtime`;
+# the cost is the cumulative time of the tomos entries at the top of the
+# import tree, so interpreter startup is not counted. Heavy dependencies must
+# not appear in the import tree at all: they are imported where first used.
+import argparse
+import os
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PACKAGE_DIR)  # "tomos"
+ROOT = os.path.dirname(PACKAGE_DIR)
+
+# module (relative to the package) -> budget in milliseconds (best of --repeat runs)
+BUDGETS_MS = {
+    "": 20,
+    "kernel": 50,
+    "embeddings.embeddings": 250,  # numpy is the one eager dependency
+}
+HEAVY_MODULES = ("openai", "httpx", "pandas", "pyarrow", "tiktoken", "mwclient", "mwparserfromhell", "requests", "fastapi")
+
+
+def measure(module: str) -> tuple[float, set[str]]:
+    """Import `module` in a fresh interpreter; return (milliseconds, top-level names of everything imported)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        imported.add(name.strip().split(".")[0])
+        if name.startswith(" ") and not name.startswith("  "):  # top of the import tree
+            if name.strip().split(".")[0] == PACKAGE:
+                total_us += int(cumulative)
+    return total_us / 1e3, imported
+
+
+def check(budgets: dict[str, float] = BUDGETS_MS, repeat: int = 3) -> bool:
+    """Print each module's import time against its budget; return True if all are within budget."""
+    ok = True
+    print(f"{'module':<32} {'ms':>8} {'budget':>8}  heavy imports")
+    for relative, budget in budgets.items():
+        module = f"{PACKAGE}.{relative}" if relative else PACKAGE
+        runs = [measure(module) for _ in range(repeat)]
+        elapsed = min(ms for ms, _ in runs)
+        heavy = sorted(set(HEAVY_MODULES) & runs[0][1])
+        passed = elapsed <= budget and not heavy
+        ok = ok and passed
+        print(f"{module:<32} {elapsed:>8.1f} {budget:>8.0f}  {', '.join(heavy) or '-'}{'' if passed else '  FAIL'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check tomos import times against their budgets.")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per module (best is kept)")
+    args = parser.parse_args()
+    sys.exit(0 if check(repeat=args.repeat) else 1)
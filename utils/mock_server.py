@@ -0,0 +1,102 @@
+# tomos/utils/mock_server.py
+# Local HTTP server for exercising the client registry (clients.py) without
+# the network: scripted status codes and delays for retries, timeouts and
+# hedging, and canned bodies for the endpoints tomos uses.
+#
+#   with MockServer(script=[(503, 0.0), (200, 0.0)]) as server:
+#       registry = ClientRegistry(base_url=server.url, api_key="test")
+#       registry.openai().responses.create(model="gpt-4o-mini", input="hi")
+#       server.requests  # [(method, path, body), ...]
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def canned_body(path: str, request: dict) -> dict:
+    """A minimal valid body for the endpoint at `path`."""
+    if path.endswith("/embeddings"):
+        inputs = request.get("input")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        return {"object": "list", "model": request.get("model"), "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                "data": [{"object": "embedding", "index": i, "embedding": [0.0, 1.0, 0.0]} for i in range(len(inputs))]}
+    if path.endswith("/responses"):
+        return {
+            "id": "resp_mock", "object": "response", "created_at": 0, "model": request.get("model"),
+            "status": "completed", "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+            "output": [{"type": "message", "id": "msg_mock", "status": "completed", "role": "assistant",
+                        "content": [{"type": "output_text", "text": "mock response", "annotations": []}]}],
+            "usage": {"input_tokens": 1, "output_tokens": 2, "total_tokens": 3,
+                      "input_tokens_details": {"cached_tokens": 0}, "output_tokens_details": {"reasoning_tokens": 0}},
+        }
+    if path.endswith("/graders/run"):
+        return {"reward": 1.0, "metadata": {}}
+    return {"ok": True}
+
+
+class MockServer:
+    """
+    Threaded HTTP server on 127.0.0.1 (a free port). Each request takes the
+    next (status, delay[, body]) step of `script`; once the script is used up,
+    every request gets (200, `delay`) with canned_body. Requests are recorded
+    in `requests`; connections are kept alive (HTTP/1.1). 429 responses carry
+    a `retry_after` header.
+    """
+
+    def __init__(self, script=(), delay: float = 0.0, retry_after: str = "0"):
+        self.script = list(script)
+        self.delay = delay
+        self.retry_after = retry_after
+        self.requests = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                request = json.loads(raw) if raw else {}
+                status, delay, body = server.next_step(self.command, self.path, request)
+                time.sleep(delay)
+                payload = json.dumps(body if body is not None else canned_body(self.path, request)).encode()
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                if status == 429:
+                    self.send_header("retry-after", server.retry_after)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v1"
+        self._thread = None
+
+    def next_step(self, method: str, path: str, request: dict) -> tuple[int, float, dict | None]:
+        with self._lock:
+            self.requests.append((method, path, request))
+            step = self.script.pop(0) if self.script else (200, self.delay)
+        status, delay, body = (*step, None)[:3]
+        return status, delay, body
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,28 @@
+# tomos/utils/pricing.py
+# Per-model API prices, for cost accounting of responses calls.
+
+# USD per 1M tokens as (input, output), by model name prefix (longest prefix wins):
+PRICES_PER_MILLION_TOKENS = {
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5": (1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+
+def model_prices(model: str) -> tuple[float, float] | None:
+    """(input, output) USD per 1M tokens for a model (or dated snapshot of it), or None if unknown."""
+    matches = [prefix for prefix in PRICES_PER_MILLION_TOKENS if model.startswith(prefix)]
+    return PRICES_PER_MILLION_TOKENS[max(matches, key=len)] if matches else None
+
+
+def usage_cost(usage: dict | None) -> float | None:
+    """USD cost of one call from its usage stats (input/output tokens and model), or None if unknown."""
+    if not usage or model_prices(usage.get("model") or "") is None:
+        return None
+    input_price, output_price = model_prices(usage["model"])
+    return ((usage.get("input_tokens") or 0) * input_price + (usage.get("output_tokens") or 0) * output_price) / 1e6
@@ -3,6 +3,9 @@ from __future__ import annotations
 from typing import Dict, Iterable
 import os
 import json
+import threading
+import time
+from string import Formatter
 
 # Dictionary mapping modes to their respective template folder paths:
 pathDict = {"career": 'G:\\My Drive\\Desktop\\Studies\\Engineering\\AI\\TomOS\\prompts\\career\\',
@@ -97,49 +100,31 @@ def set_template_file(thisOS, templateName):
     thisOS.templateFilepath = fullPath    
     return
 
-# Read key:value pairs from template file between start_tag and stop_tag (exclusive):
-def read_kv_block(
-    thisOS,
-    start_tag: str = "_start_reading_context_variables",
-    stop_tag: str = "_stop_reading_context_variables",
-    *,
-    comment_prefixes: Iterable[str] = ("#", "//", ";"),
-    strip_quotes: bool = True,
-    on_duplicate: str = "error",    # "error" | "first_wins" | "last_wins"
-    allow_empty_values: bool = True
-) -> Dict[str, str]:
-    """
-    Read key:value pairs from `path` between lines containing `start_tag` and `stop_tag` (exclusive).
-
-    Rules:
-      - Lines are 'key: value' (split on the FIRST colon).
-      - Leading/trailing whitespace is ignored.
-      - Blank lines are ignored.
-      - Lines starting with a comment prefix are ignored.
-      - If strip_quotes is True, surrounding single/double quotes on values are removed.
-      - Duplicate keys policy via `on_duplicate`: 'error' | 'first_wins' | 'last_wins'.
-      - If allow_empty_values is True, 'key:' (no value) yields empty string.
-
-    Raises:
-      - FileNotFoundError if `path` is missing.
-      - ValueError for missing markers, malformed lines, or duplicate keys (per policy).
-    """
-    if (thisOS.templateFilepath == -1):
-        thisOS.templateFilepath = pathDict["defaultPath"]
+# Compiled templates.
+# A template file is read once into a Template holding its lines; the kv block and the
+# prompt body are parsed from those lines on first use (per set of markers/options) and
+# memoized, and the prompt is pre-split into a format plan, so rendering is a join.
+# TemplateRegistry reloads a file only when its mtime or size changes.
 
-    with open(thisOS.templateFilepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+KV_TAGS = ("_start_reading_context_variables", "_stop_reading_context_variables")
+PROMPT_TAGS = ("_prompt_start", "_prompt_stop")
+COMMENT_PREFIXES = ("#", "//", ";")
+_CONVERSIONS = {"r": repr, "s": str, "a": ascii}
 
-    # locate markers
+# Locate the lines strictly between the first line containing start_tag and the next containing stop_tag:
+def _block_bounds(lines: list[str], start_tag: str, stop_tag: str, path: str) -> tuple[int, int]:
     start_idx = next((i for i, ln in enumerate(lines) if start_tag in ln), None)
     if start_idx is None:
-        raise ValueError(f"Start marker '{start_tag}' not found in {thisOS.templateFilepath}")
+        raise ValueError(f"Start marker '{start_tag}' not found in {path}")
     stop_idx = next((i for i, ln in enumerate(lines[start_idx + 1 :], start_idx + 1) if stop_tag in ln), None)
     if stop_idx is None:
-        raise ValueError(f"Stop marker '{stop_tag}' not found in {thisOS.templateFilepath}")
+        raise ValueError(f"Stop marker '{stop_tag}' not found in {path}")
     if stop_idx <= start_idx:
-        raise ValueError(f"Stop marker appears before start marker in {thisOS.templateFilepath}")
+        raise ValueError(f"Stop marker appears before start marker in {path}")
+    return start_idx, stop_idx
 
+# Parse 'key: value' lines of a block (rules in read_kv_block):
+def _parse_kv(lines, start_idx, stop_idx, path, comment_prefixes, strip_quotes, on_duplicate, allow_empty_values) -> Dict[str, str]:
     result: Dict[str, str] = {}
     block = lines[start_idx + 1 : stop_idx]
 
@@ -153,17 +138,17 @@ def read_kv_block(
         colon = line.find(":")
         if colon == -1:
             raise ValueError(
-                f"{thisOS.templateFilepath}:{lineno}: Expected 'key: value' (found no ':') -> {raw.rstrip()}"
+                f"{path}:{lineno}: Expected 'key: value' (found no ':') -> {raw.rstrip()}"
             )
 
         key = line[:colon].strip()
         val = line[colon + 1 :].strip()
 
         if not key:
-            raise ValueError(f"{thisOS.templateFilepath}:{lineno}: Empty key is not allowed.")
+            raise ValueError(f"{path}:{lineno}: Empty key is not allowed.")
 
         if not val and not allow_empty_values:
-            raise ValueError(f"{thisOS.templateFilepath}:{lineno}: Missing value for key '{key}'.")
+            raise ValueError(f"{path}:{lineno}: Missing value for key '{key}'.")
 
         # optional quote stripping
         if strip_quotes and len(val) >= 2:
@@ -172,7 +157,7 @@ def read_kv_block(
 
         if key in result:
             if on_duplicate == "error":
-                raise ValueError(f"{thisOS.templateFilepath}:{lineno}: Duplicate key '{key}'.")
+                raise ValueError(f"{path}:{lineno}: Duplicate key '{key}'.")
             elif on_duplicate == "first_wins":
                 continue  # keep the original
             elif on_duplicate == "last_wins":
@@ -184,13 +169,198 @@ def read_kv_block(
 
     return result
 
+# Prompt body of a block: every non-blank, non-comment line, stripped, each preceded by a newline:
+def _parse_prompt(lines, start_idx, stop_idx, comment_prefixes) -> str:
+    kept = []
+    for raw in lines[start_idx + 1 : stop_idx]:
+        line = raw.strip()
+        if line and not any(line.startswith(pfx) for pfx in comment_prefixes):
+            kept.append(line)
+    return "".join("\n" + line for line in kept)
+
+
+class FormatPlan:
+    """
+    A format string pre-split into literal text and replacement fields, so
+    render(values) gives the same result as text.format(**values) without
+    re-parsing. Fields other than plain names (attributes, indexes,
+    positional or nested specs) fall back to str.format.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.literals = []  # literal text before each field, plus the tail
+        self.fields = []  # (name, conversion, format_spec)
+        self.simple = True
+        pending = []
+        for literal, name, spec, conversion in Formatter().parse(text):
+            pending.append(literal)
+            if name is None:
+                continue
+            if not name.isidentifier() or (spec and "{" in spec):
+                self.simple = False
+            self.literals.append("".join(pending))
+            pending = []
+            self.fields.append((name, conversion, spec or ""))
+        self.literals.append("".join(pending))
+        self.variables = tuple(dict.fromkeys(name for name, _, _ in self.fields))
+        self._parts = [None] * (2 * len(self.fields) + 1)  # literals at even slots, field values at odd slots
+        self._parts[::2] = self.literals
+        self._plain = not any(conversion for _, conversion, _ in self.fields)
+
+    def render(self, values: dict) -> str:
+        if not self.simple:
+            return self.text.format(**values)
+        parts = self._parts.copy()
+        if self._plain:
+            parts[1::2] = [format(values[name], spec) for name, _, spec in self.fields]
+        else:
+            parts[1::2] = [format(_CONVERSIONS[conversion](values[name]) if conversion else values[name], spec)
+                           for name, conversion, spec in self.fields]
+        return "".join(parts)
+
+
+class Template:
+    """One template file as read from disk; blocks are parsed on first use and memoized."""
+
+    def __init__(self, path: str, lines: list[str], mtime_ns: int, size: int):
+        self.path = path
+        self.lines = lines
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self._kv = {}  # options -> parsed variables
+        self._prompts = {}  # options -> (prompt text, FormatPlan)
+
+    @classmethod
+    def load(cls, path: str) -> "Template":
+        with open(path, "r", encoding="utf-8") as f:
+            stat = os.fstat(f.fileno())
+            lines = f.readlines()
+        return cls(path, lines, stat.st_mtime_ns, stat.st_size)
+
+    def kv_block(self, start_tag: str = KV_TAGS[0], stop_tag: str = KV_TAGS[1], comment_prefixes: Iterable[str] = COMMENT_PREFIXES,
+                 strip_quotes: bool = True, on_duplicate: str = "error", allow_empty_values: bool = True) -> Dict[str, str]:
+        """Variables of the kv block, as a fresh dict the caller may fill in."""
+        key = (start_tag, stop_tag, tuple(comment_prefixes), strip_quotes, on_duplicate, allow_empty_values)
+        if key not in self._kv:
+            start_idx, stop_idx = _block_bounds(self.lines, start_tag, stop_tag, self.path)
+            self._kv[key] = _parse_kv(self.lines, start_idx, stop_idx, self.path, key[2], strip_quotes, on_duplicate, allow_empty_values)
+        return dict(self._kv[key])
+
+    def _prompt(self, start_tag: str, stop_tag: str, comment_prefixes: Iterable[str]) -> tuple[str, FormatPlan]:
+        key = (start_tag, stop_tag, tuple(comment_prefixes))
+        if key not in self._prompts:
+            start_idx, stop_idx = _block_bounds(self.lines, start_tag, stop_tag, self.path)
+            text = _parse_prompt(self.lines, start_idx, stop_idx, key[2])
+            self._prompts[key] = (text, FormatPlan(text))
+        return self._prompts[key]
+
+    def prompt(self, start_tag: str = PROMPT_TAGS[0], stop_tag: str = PROMPT_TAGS[1], comment_prefixes: Iterable[str] = COMMENT_PREFIXES) -> str:
+        return self._prompt(start_tag, stop_tag, comment_prefixes)[0]
+
+    def plan(self, start_tag: str = PROMPT_TAGS[0], stop_tag: str = PROMPT_TAGS[1], comment_prefixes: Iterable[str] = COMMENT_PREFIXES) -> FormatPlan:
+        return self._prompt(start_tag, stop_tag, comment_prefixes)[1]
+
+    def render(self, values: dict) -> str:
+        """The prompt body formatted with `values`; same result as prompt().format(**values)."""
+        return self.plan().render(values)
+
+
+class TemplateRegistry:
+    """
+    Compiled templates by path; an entry is reloaded when the file's mtime or
+    size changes. Files are stat'ed at most once per `check_interval` seconds,
+    so tight render loops don't pay a syscall per prompt (0 checks every time).
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self._templates = {}
+        self._checked = {}  # path -> time.monotonic() of the last stat
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def get(self, path: str) -> Template:
+        template = self._templates.get(path)
+        # .get: invalidate() may drop the entry between the two lookups
+        if template is not None and time.monotonic() - self._checked.get(path, 0.0) < self.check_interval:
+            self.hits += 1
+            return template
+        stat = os.stat(path)  # FileNotFoundError for a missing template, as open() would raise
+        if template is None or (template.mtime_ns, template.size) != (stat.st_mtime_ns, stat.st_size):
+            template = Template.load(path)
+            self.loads += 1
+        else:
+            self.hits += 1
+        with self._lock:
+            self._templates[path] = template
+            self._checked[path] = time.monotonic()
+        return template
+
+    def render(self, path: str, values: dict) -> str:
+        return self.get(path).render(values)
+
+    def invalidate(self, path: str | None = None) -> None:
+        """Drop one compiled template, or all of them."""
+        with self._lock:
+            if path is None:
+                self._templates.clear()
+                self._checked.clear()
+            else:
+                self._templates.pop(path, None)
+                self._checked.pop(path, None)
+
+
+# Process-wide registry used by read_kv_block, read_prompt and render_prompt:
+templates = TemplateRegistry()
+
+# The TomOS object's template path, defaulting to the default template:
+def _template_path(thisOS) -> str:
+    if (thisOS.templateFilepath == -1):
+        thisOS.templateFilepath = pathDict["defaultPath"]
+    return thisOS.templateFilepath
+
+# Read key:value pairs from template file between start_tag and stop_tag (exclusive):
+def read_kv_block(
+    thisOS,
+    start_tag: str = KV_TAGS[0],
+    stop_tag: str = KV_TAGS[1],
+    *,
+    comment_prefixes: Iterable[str] = COMMENT_PREFIXES,
+    strip_quotes: bool = True,
+    on_duplicate: str = "error",    # "error" | "first_wins" | "last_wins"
+    allow_empty_values: bool = True
+) -> Dict[str, str]:
+    """
+    Read key:value pairs from `path` between lines containing `start_tag` and `stop_tag` (exclusive).
+
+    Rules:
+      - Lines are 'key: value' (split on the FIRST colon).
+      - Leading/trailing whitespace is ignored.
+      - Blank lines are ignored.
+      - Lines starting with a comment prefix are ignored.
+      - If strip_quotes is True, surrounding single/double quotes on values are removed.
+      - Duplicate keys policy via `on_duplicate`: 'error' | 'first_wins' | 'last_wins'.
+      - If allow_empty_values is True, 'key:' (no value) yields empty string.
+
+    The file is parsed once and cached in `templates` until it changes on disk.
+
+    Raises:
+      - FileNotFoundError if `path` is missing.
+      - ValueError for missing markers, malformed lines, or duplicate keys (per policy).
+    """
+    return templates.get(_template_path(thisOS)).kv_block(
+        start_tag, stop_tag, comment_prefixes, strip_quotes, on_duplicate, allow_empty_values
+    )
+
 # Read prompt string from template file between start_tag and stop_tag (exclusive):
 def read_prompt(
     thisOS,
-    start_tag: str = "_prompt_start",
-    stop_tag: str = "_prompt_stop",
+    start_tag: str = PROMPT_TAGS[0],
+    stop_tag: str = PROMPT_TAGS[1],
     *,
-    comment_prefixes: Iterable[str] = ("#", "//", ";"),
+    comment_prefixes: Iterable[str] = COMMENT_PREFIXES,
     allow_empty_values: bool = True
 ) -> str:
     """
@@ -201,36 +371,15 @@ def read_prompt(
       - If strip_quotes is True, surrounding single/double quotes on values are removed.
       - If allow_empty_values is True, 'key:' (no value) yields empty string.
 
+    The file is parsed once and cached in `templates` until it changes on disk.
+
     Raises:
       - FileNotFoundError if `path` is missing.
       - ValueError for missing markers, malformed lines.
     """
+    return templates.get(_template_path(thisOS)).prompt(start_tag, stop_tag, comment_prefixes)
 
-    if (thisOS.templateFilepath == -1):
-        thisOS.templateFilepath = pathDict["defaultPath"]
-
-    with open(thisOS.templateFilepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    # locate markers
-    start_idx = next((i for i, ln in enumerate(lines) if start_tag in ln), None)
-    if start_idx is None:
-        raise ValueError(f"Start marker '{start_tag}' not found in {thisOS.templateFilepath}")
-    stop_idx = next((i for i, ln in enumerate(lines[start_idx + 1 :], start_idx + 1) if stop_tag in ln), None)
-    if stop_idx is None:
-        raise ValueError(f"Stop marker '{stop_tag}' not found in {thisOS.templateFilepath}")
-    if stop_idx <= start_idx:
-        raise ValueError(f"Stop marker appears before start marker in {thisOS.templateFilepath}")
-
-    result: str = ""
-    block = lines[start_idx + 1 : stop_idx]
-
-    for lineno, raw in enumerate(block, start=start_idx + 2):
-        line = raw.strip()
-        if not line:
-            continue
-        if any(line.startswith(pfx) for pfx in comment_prefixes):
-            continue
-        result = result + '\n' + line
-
-    return result
\ No newline at end of file
+# Render the template's prompt with variable values, from the compiled format plan
+# (same result as read_prompt(thisOS).format(**values)):
+def render_prompt(thisOS, values: dict) -> str:
+    return templates.get(_template_path(thisOS)).render(values)
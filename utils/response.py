@@ -1,57 +1,150 @@
 # tomos/utils/response.py
-from . import prompt_file_parser
+from . import prompt_file_parser, streaming
+from .pricing import model_prices
 import time
 
+# Build the schema (structured output) parameter for a TomOS object in `mode` (default: its own), or None for free text.
+# This may prompt for a schema file, so batch callers resolve it once up front:
+def schema_param(thisOS: object, mode: str | None = None) -> dict | None:
+    mode = mode or thisOS.mode  # batches may run under another mode than the instance's
+    if not (thisOS.schema and thisOS.schema != "free" and thisOS.model.startswith("gpt-5")):
+        return None
+    schema_dict = prompt_file_parser.select_and_load_json_schema(mode)
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": f"{mode}_response",
+            "schema": schema_dict,
+            "strict": True
+        }
+    }
+
+# Keyword arguments for client.responses.create:
+def build_request(model: str, system: str, user_prompt: str, text_param: dict | None = None, stream: bool = False) -> dict:
+    return {
+        "model": model,
+        "input": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user_prompt}
+        ],
+        "stream": stream,
+        "text": text_param,
+    }
+
+# Token counts from a response's usage block, or None if it has none:
+def usage_stats(response, model: str) -> dict | None:
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return None
+    return {
+        "input_tokens": getattr(usage, "input_tokens", None),
+        "output_tokens": getattr(usage, "output_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+        "model": model,
+    }
+
+# One non-streaming call that touches no TomOS state, for batch runs.
+# Returns {"output_text", "usage", "error", "latency"}; errors are returned, not raised:
+def request_once(client, model: str, system: str, user_prompt: str, text_param: dict | None = None) -> dict:
+    start_time = time.perf_counter()
+    try:
+        response = client.responses.create(**build_request(model, system, user_prompt, text_param))
+        result = {"output_text": response.output_text, "usage": usage_stats(response, model), "error": None}
+    except Exception as e:
+        result = {"output_text": None, "usage": None, "error": f"{type(e).__name__}: {e}"}
+    result["latency"] = time.perf_counter() - start_time
+    return result
+
+# Async twin of request_once, for an AsyncOpenAI client:
+async def arequest_once(client, model: str, system: str, user_prompt: str, text_param: dict | None = None) -> dict:
+    start_time = time.perf_counter()
+    try:
+        response = await client.responses.create(**build_request(model, system, user_prompt, text_param))
+        result = {"output_text": response.output_text, "usage": usage_stats(response, model), "error": None}
+    except Exception as e:
+        result = {"output_text": None, "usage": None, "error": f"{type(e).__name__}: {e}"}
+    result["latency"] = time.perf_counter() - start_time
+    return result
+
+# Streaming twin of request_once: deltas go to `sinks` as they arrive (see streaming.py), and the
+# result also carries the stream's timing under "stream" (ttft_s, inter-token latency, tokens_per_s):
+def stream_once(client, model: str, system: str, user_prompt: str, text_param: dict | None = None, sinks=()) -> dict:
+    start_time = time.perf_counter()
+    stream = None
+    try:
+        events = client.responses.create(**build_request(model, system, user_prompt, text_param, stream=True))
+        stream = streaming.Stream(events, sinks, start_time=start_time)
+        stream.consume()
+        result = {"output_text": stream.text, "usage": usage_stats(stream.response, model), "error": stream.error}
+    except Exception as e:
+        result = {"output_text": None, "usage": None, "error": f"{type(e).__name__}: {e}"}
+    result["stream"] = stream.metrics() if stream is not None else None
+    result["latency"] = time.perf_counter() - start_time
+    return result
+
+# Async twin of stream_once, for an AsyncOpenAI client:
+async def astream_once(client, model: str, system: str, user_prompt: str, text_param: dict | None = None, sinks=()) -> dict:
+    start_time = time.perf_counter()
+    stream = None
+    try:
+        events = await client.responses.create(**build_request(model, system, user_prompt, text_param, stream=True))
+        stream = streaming.AsyncStream(events, sinks, start_time=start_time)
+        await stream.consume()
+        result = {"output_text": stream.text, "usage": usage_stats(stream.response, model), "error": stream.error}
+    except Exception as e:
+        result = {"output_text": None, "usage": None, "error": f"{type(e).__name__}: {e}"}
+    result["stream"] = stream.metrics() if stream is not None else None
+    result["latency"] = time.perf_counter() - start_time
+    return result
+
 # A module to handle API response calls, including streaming support.
-def responses_call(thisOS: object) -> str:
+# Pass `text_param` when the schema was already resolved (see schema_param), so the user isn't asked twice,
+# and `system` to send a different system prompt than thisOS.system (e.g. with retrieved context appended).
+def responses_call(thisOS: object, text_param: dict | None = None, system: str | None = None) -> str:
 
     stats = {}
     error = None
+    quiet = getattr(thisOS, "quiet", False) # no banners, echoes or response dumps on hot paths
 
     import json
 
     # Load and prepare schema if needed
-    text_param = None
-    if thisOS.schema and thisOS.schema != "free" and thisOS.model.startswith("gpt-5"):
-        schema_dict = prompt_file_parser.select_and_load_json_schema(thisOS.mode)
-        text_param = {
-            "format": {
-                "type": "json_schema",
-                "name": f"{thisOS.mode}_response",
-                "schema": schema_dict,
-                "strict": True
-            }
-        }
-        print(f'Using JSON schema for structured output:\n{json.dumps(schema_dict, indent=2)}\n\n')
-
-    # Prepare input as a list of messages
-    input_messages = [
-        {"role": "system", "content": thisOS.system},
-        {"role": "user", "content": thisOS.userPrompt}
-    ]
+    if text_param is None:
+        text_param = schema_param(thisOS)
+    if text_param and not quiet:
+        print(f'Using JSON schema for structured output:\n{json.dumps(text_param["format"]["schema"], indent=2)}\n\n')
 
-    print(f'\n\nCalling OpenAI API with prompt:\n    {thisOS.userPrompt}\n\n')
-    start_time = time.time()
+    if not quiet:
+        print(f'\n\nCalling OpenAI API with prompt:\n    {thisOS.userPrompt}\n\n')
+    start_time = time.perf_counter()
     response = thisOS.client.responses.create(
-        model=thisOS.model,
-        input=input_messages,
-        stream=thisOS.stream,
-        text=text_param
+        **build_request(thisOS.model, thisOS.system if system is None else system, thisOS.userPrompt, text_param,
+                        stream=thisOS.stream)
     )
-    if not thisOS.stream:
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        print(f"API non-streaming call completed in {elapsed_time:.2f} seconds.\n")
+
+    # If streaming, print deltas as they arrive; the final response (with usage) comes from response.completed:
+    if thisOS.stream:
+        stream = streaming.Stream(response, sinks=[] if quiet else [streaming.print_sink], start_time=start_time)
+        thisOS.output_text = stream.consume()
+        thisOS.stream_metrics = stream.metrics()
+        if stream.error:
+            print(f"Stream error: {stream.error}\n\n")
+        response = stream.response
+        metrics = thisOS.stream_metrics
+        if not quiet:
+            print("\n\n")  # ensure we end with a newline
+            print(f"API streaming call completed in {metrics['total_s']:.2f} seconds "
+                  f"(time to first token: {metrics['ttft_s'] or 0:.2f} s, {metrics['tokens_per_s'] or 0:.1f} tokens/s).\n")
+    elif not quiet:
+        print(f"API non-streaming call completed in {time.perf_counter() - start_time:.2f} seconds.\n")
 
     try:
-        thisOS.output_text = response.output_text
+        if not thisOS.stream:
+            thisOS.output_text = response.output_text
         # Usage stats (if available)
-        usage = getattr(response, "usage", None)
+        usage = usage_stats(response, thisOS.model)
         if usage:
-            stats["input_tokens"] = getattr(usage, "input_tokens", None)
-            stats["output_tokens"] = getattr(usage, "output_tokens", None)
-            stats["total_tokens"] = getattr(usage, "total_tokens", None)
-            stats["model"] = thisOS.model
+            stats.update(usage)
             thisOS.usage = stats
         else:
             print("No usage stats available in response.\n\n")
@@ -61,41 +154,26 @@ def responses_call(thisOS: object) -> str:
         error = str(e)
         print(f"Error extracting output text: {error}\n\n")
 
-    # If streaming, handle the stream:
-    if thisOS.stream:
-        collected_text_chunks = []
-        for chunk in response:
-            # Check if the chunk has data containing the text delta
-            if hasattr(chunk, 'type') and chunk.type == 'response.output_text.delta':
-                text_chunk = chunk.delta
-                collected_text_chunks.append(text_chunk)
-                print(text_chunk, end="", flush=True)  # Print the text incrementally
-
-        print("\n\n")  # ensure we end with a newline
-        return ''.join(collected_text_chunks)
-    if thisOS.stream:
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        print(f"API streaming call completed in {elapsed_time:.2f} seconds.\n")
-
-    mean_tokens = 1e6
-    mean_input_cost_gpt5 = 2.5 # $2.50 per 1M tokens input
-    mean_output_cost_gpt5 = 10.0 # $10.00 per 1M tokens
-    normalized_input = stats.get("input_tokens", 1)/mean_tokens
-    input_cost = normalized_input * mean_input_cost_gpt5
-    stats["input_cost"] = f"${input_cost:,.2f}"
-    normalized_output = stats.get("output_tokens", 1)/mean_tokens
-    output_cost = normalized_output * mean_output_cost_gpt5
-    stats["output_cost"] = f"${output_cost:,.2f}"
-    stats["total_cost"] = f"${(input_cost + output_cost):,.2f}"
+    # Cost from the per-model price table (utils/pricing.py); None for models without a listed price:
+    prices = model_prices(thisOS.model)
+    if prices is not None:
+        input_cost = (stats.get("input_tokens") or 0) * prices[0] / 1e6
+        output_cost = (stats.get("output_tokens") or 0) * prices[1] / 1e6
+        stats["input_cost"] = f"${input_cost:,.6f}"
+        stats["output_cost"] = f"${output_cost:,.6f}"
+        stats["total_cost"] = f"${(input_cost + output_cost):,.6f}"
     thisOS.usage = stats
 
+    if quiet:
+        return thisOS.output_text
+
     # Print final output and stats:
     print('============================================================================\n')
     print('============================================================================\n')
-    print(f'Output text:\n{thisOS.output_text}\n\n')
-    print('============================================================================\n')
-    print('============================================================================\n')
+    if not thisOS.stream:  # a stream was already printed as it arrived
+        print(f'Output text:\n{thisOS.output_text}\n\n')
+        print('============================================================================\n')
+        print('============================================================================\n')
     print(f'API call complete. Usage stats: {thisOS.usage}\n')
     print('============================================================================\n')
     print('============================================================================\n')
@@ -103,4 +181,4 @@ def responses_call(thisOS: object) -> str:
     print('============================================================================\n')
     print('============================================================================\n')
 
-    return
\ No newline at end of file
+    return thisOS.output_text
@@ -0,0 +1,147 @@
+# tomos/utils/response_cache.py
+# Exact-match cache of responses calls, checked by TomOS._call before the API.
+#
+# Keys are sha256 over (model, system, userPrompt, schema). An entry keeps the
+# output text together with the usage stats and latency of the call that
+# produced it, so hits can report what they saved and cost accounting stays
+# correct. Two backends: MemoryBackend (LRU, per process) and DiskBackend
+# (an SQLiteLRU table, shared between runs and processes).
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .pricing import usage_cost
+from .sqlite_lru import SQLiteLRU
+
+DEFAULT_DISK_PATH = os.path.join(os.path.expanduser("~"), ".cache", "tomos", "responses.sqlite")
+DEFAULT_MAX_ENTRIES = 1024  # MemoryBackend bound
+DEFAULT_MAX_BYTES = 256 * 2**20  # DiskBackend bound
+
+
+def cache_key(model: str, system: str, user_prompt: str, schema=None) -> str:
+    """Content address of one request; `schema` is the resolved structured-output parameter (or None)."""
+    payload = json.dumps([model, system, user_prompt, schema], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU of at most `max_entries` entries."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskBackend:
+    """SQLite-backed LRU (WAL mode, so several processes can share it), bounded to `max_bytes` of entries."""
+
+    def __init__(self, path: str = DEFAULT_DISK_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lru = SQLiteLRU(path, "responses", {"entry": "TEXT NOT NULL"}, payload="entry", max_bytes=max_bytes)
+
+    def get(self, key: str) -> dict | None:
+        found = self._lru.get_many([key], ("entry",))
+        return json.loads(found[key][0]) if key in found else None
+
+    def put(self, key: str, entry: dict) -> None:
+        self._lru.put_many([{"key": key, "entry": json.dumps(entry, ensure_ascii=False)}])
+
+    def delete(self, key: str) -> None:
+        self._lru.delete(key)
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def close(self) -> None:
+        self._lru.close()
+
+
+class ResponseCache:
+    """
+    Response cache over a backend, with an optional TTL (seconds) and hit/miss accounting.
+
+    get() returns the cached entry ({"output_text", "usage", "latency", "created"})
+    or None; put() stores the result of a fresh call. stats() reports the hit
+    rate and the latency, tokens and dollars that hits saved.
+    """
+
+    def __init__(self, backend=None, ttl: float | None = None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_latency = 0.0
+        self.saved_tokens = 0
+        self.saved_cost = 0.0
+
+    def get(self, key: str) -> dict | None:
+        entry = self.backend.get(key)
+        if entry is not None and self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            self.backend.delete(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_latency += entry.get("latency") or 0.0
+        usage = entry.get("usage") or {}
+        self.saved_tokens += usage.get("total_tokens") or 0
+        self.saved_cost += usage_cost(usage) or 0.0
+        return entry
+
+    def put(self, key: str, output_text: str, usage: dict | None, latency: float) -> None:
+        self.backend.put(key, {"output_text": output_text, "usage": usage, "latency": latency, "created": time.time()})
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_latency_s": round(self.saved_latency, 3),
+            "saved_tokens": self.saved_tokens,
+            "saved_cost": round(self.saved_cost, 6),
+            "entries": len(self.backend),
+        }
+
+
+def make_cache(spec, ttl: float | None = None) -> ResponseCache | None:
+    """
+    Build a cache from a short spec: None/"" (no cache), "memory", or a path to
+    an SQLite file. A ResponseCache instance is returned as-is.
+    """
+    if spec is None or isinstance(spec, ResponseCache):
+        return spec
+    if spec == "":
+        return None
+    if spec == "memory":
+        return ResponseCache(MemoryBackend(), ttl=ttl)
+    return ResponseCache(DiskBackend(spec), ttl=ttl)
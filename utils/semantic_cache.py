@@ -0,0 +1,170 @@
+# tomos/utils/semantic_cache.py
+# Embedding-similarity response cache for near-duplicate prompts
+# ("explain Hohmann transfers" / "explain a Hohmann transfer").
+#
+# Prompts are embedded through embeddings.get_embedding (so repeats hit the
+# embedding memo and on-disk cache) and compared with previously answered
+# prompts in the same namespace: one per (model, system prompt, schema), i.e.
+# per mode. A match at or above `threshold` cosine similarity is served from
+# the cache. Every hit is logged, and a sampled fraction of would-be hits is
+# audited: the API is called anyway and both answers are recorded, so false
+# hits can be reviewed and the threshold tuned.
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .pricing import usage_cost
+
+DEFAULT_THRESHOLD = 0.93  # tune with audits; paraphrases of one question usually land above ~0.9
+DEFAULT_MAX_ENTRIES = 256  # per namespace
+NEAR_MISS_MARGIN = 0.05  # misses this close below the threshold are counted as near misses
+
+
+def _default_embed(text: str):
+    from ..embeddings import embeddings  # numpy + the embedding cache, only once the semantic cache is used
+
+    return embeddings.get_embedding(text, embeddings.get_client(), model=embeddings.QUERY_MODEL)
+
+
+class _Namespace:
+    """Fixed-capacity vector index of answered prompts; the least recently used row is replaced when full."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.vectors = None  # (capacity, dim) float32, unit rows; allocated on first put
+        self.entries = []
+        self.last_used = np.zeros(capacity)
+
+    def best(self, vector: np.ndarray) -> tuple[int, float]:
+        if not self.entries:
+            return -1, -1.0
+        sims = self.vectors[:len(self.entries)] @ vector
+        row = int(np.argmax(sims))
+        return row, float(sims[row])
+
+    def put(self, vector: np.ndarray, entry: dict) -> None:
+        if self.vectors is None:
+            self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+        if len(self.entries) < self.capacity:
+            row = len(self.entries)
+            self.entries.append(entry)
+        else:
+            row = int(np.argmin(self.last_used))  # evict
+            self.entries[row] = entry
+        self.vectors[row] = vector
+        self.last_used[row] = time.time()
+
+
+class SemanticCache:
+    """
+    Near-duplicate response cache with per-namespace vector indexes.
+
+    lookup() embeds a prompt and returns a match dict: "entry" (the cached
+    answer, or None on a miss), "similarity", "embedding" (reused by put), and
+    "audit" (True when this hit was sampled for auditing, in which case the
+    caller should call the API and pass the fresh answer to record_audit()).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 embed=None, audit_rate: float = 0.0, audit_path: str | None = None, log_size: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embed = embed or _default_embed
+        self.audit_rate = audit_rate
+        self.audit_path = audit_path
+        self.namespaces = {}
+        self.hit_log = deque(maxlen=log_size)  # every served hit: prompt, matched prompt, similarity
+        self.audits = deque(maxlen=log_size)  # sampled hits with the cached and the fresh answer
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.audited = 0  # matches sent to the API for auditing: neither a hit nor a miss
+        self.near_misses = 0
+        self.saved_latency = 0.0
+        self.saved_cost = 0.0
+
+    @staticmethod
+    def namespace(model: str, system: str, schema=None) -> str:
+        """Namespace of a request: answers are only shared between prompts with the same model, system prompt and schema."""
+        payload = json.dumps([model, system, schema], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, namespace: str, prompt: str) -> dict:
+        vector = self._vector(prompt)
+        with self._lock:
+            space = self.namespaces.get(namespace)
+            row, similarity = space.best(vector) if space else (-1, -1.0)
+            match = {"namespace": namespace, "prompt": prompt, "embedding": vector, "similarity": similarity,
+                     "entry": None, "audit": False}
+            if row < 0 or similarity < self.threshold:
+                self.misses += 1
+                self.near_misses += similarity >= self.threshold - NEAR_MISS_MARGIN
+                return match
+            space.last_used[row] = time.time()
+            match["entry"] = space.entries[row]
+            match["audit"] = random.random() < self.audit_rate
+            if match["audit"]:
+                self.audited += 1
+            else:
+                self.hits += 1
+                self.saved_latency += match["entry"].get("latency") or 0.0
+                self.saved_cost += usage_cost(match["entry"].get("usage")) or 0.0
+                self.hit_log.append({"time": time.time(), "namespace": namespace, "prompt": prompt,
+                                     "matched_prompt": match["entry"]["prompt"], "similarity": similarity})
+        return match
+
+    def put(self, match: dict, output_text: str, usage: dict | None, latency: float) -> None:
+        """Store a fresh answer for the prompt of a lookup() match."""
+        entry = {"prompt": match["prompt"], "output_text": output_text, "usage": usage,
+                 "latency": latency, "created": time.time()}
+        with self._lock:
+            space = self.namespaces.setdefault(match["namespace"], _Namespace(self.max_entries))
+            space.put(match["embedding"], entry)
+
+    def record_audit(self, match: dict, fresh_text: str) -> dict:
+        """Record an audited hit: the cached answer next to the fresh one, for false-hit review."""
+        record = {
+            "time": time.time(),
+            "namespace": match["namespace"],
+            "prompt": match["prompt"],
+            "matched_prompt": match["entry"]["prompt"],
+            "similarity": match["similarity"],
+            "cached_text": match["entry"]["output_text"],
+            "fresh_text": fresh_text,
+            "identical": match["entry"]["output_text"].strip() == (fresh_text or "").strip(),
+        }
+        with self._lock:
+            self.audits.append(record)
+            if self.audit_path:
+                with open(self.audit_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.audited
+        sims = [hit["similarity"] for hit in self.hit_log]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "audited": self.audited,
+            "near_misses": self.near_misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "threshold": self.threshold,
+            "hit_similarity_min": round(min(sims), 4) if sims else None,
+            "hit_similarity_median": round(float(np.median(sims)), 4) if sims else None,
+            "audits": len(self.audits),
+            "audits_identical": sum(a["identical"] for a in self.audits),
+            "saved_latency_s": round(self.saved_latency, 3),
+            "saved_cost": round(self.saved_cost, 6),
+            "entries": {ns: len(space.entries) for ns, space in self.namespaces.items()},
+        }
@@ -0,0 +1,146 @@
+# tomos/utils/sqlite_lru.py
+# Size-bounded LRU table in an SQLite file, shared by the embedding cache
+# (embeddings/cache.py) and the response cache's DiskBackend (response_cache.py).
+#
+# Each row records its payload size, and triggers keep the table's byte total
+# in lru_totals up to date on every insert, replace and delete, so a put never
+# has to scan the table to know whether to evict. The database runs in WAL
+# mode, and the totals live in the database rather than in the process, so
+# several processes can share one cache.
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+TOTALS_TABLE = "lru_totals"
+EVICT_TO = 0.9  # eviction goes down to this fraction of max_bytes
+MAX_PARAMS = 500  # keys per SELECT, under SQLite's host-parameter limit
+
+
+def _size(value) -> int:
+    return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+
+@contextmanager
+def _immediate(conn: sqlite3.Connection):
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on any error."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class SQLiteLRU:
+    """
+    Table of key -> `columns` rows, least-recently-used rows evicted once the
+    `payload` column's sizes add up to more than `max_bytes`.
+    - columns: column name -> SQL type of everything stored besides the key
+    - payload: the column whose size counts towards max_bytes
+
+    Tables written before the size column existed are migrated on open.
+    """
+
+    def __init__(self, path: str, table: str, columns: dict, payload: str, max_bytes: int):
+        self.path = path
+        self.table = table
+        self.columns = list(columns)
+        self.payload = payload
+        self.max_bytes = max_bytes
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA recursive_triggers=ON")  # INSERT OR REPLACE fires the delete trigger
+        self._lock = threading.Lock()
+        with _immediate(self._conn):
+            self._create(columns)
+
+    def _create(self, columns: dict) -> None:
+        t = self.table
+        definitions = ", ".join(f"{name} {kind}" for name, kind in columns.items())
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {t} (key TEXT PRIMARY KEY, {definitions}, "
+                           "size INTEGER NOT NULL DEFAULT 0, last_used REAL NOT NULL)")
+        existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({t})")}
+        if "size" not in existing:
+            self._conn.execute(f"ALTER TABLE {t} ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute(f"UPDATE {t} SET size = LENGTH(CAST({self.payload} AS BLOB))")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {t}_last_used ON {t} (last_used)")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {TOTALS_TABLE} (name TEXT PRIMARY KEY, bytes INTEGER NOT NULL)")
+        self._conn.execute(f"INSERT OR IGNORE INTO {TOTALS_TABLE} SELECT ?, COALESCE(SUM(size), 0) FROM {t}", (t,))
+        totals = f"UPDATE {TOTALS_TABLE} SET bytes = bytes"
+        self._conn.execute(f"CREATE TRIGGER IF NOT EXISTS {t}_size_insert AFTER INSERT ON {t} "
+                           f"BEGIN {totals} + NEW.size WHERE name = '{t}'; END")
+        self._conn.execute(f"CREATE TRIGGER IF NOT EXISTS {t}_size_delete AFTER DELETE ON {t} "
+                           f"BEGIN {totals} - OLD.size WHERE name = '{t}'; END")
+        self._conn.execute(f"CREATE TRIGGER IF NOT EXISTS {t}_size_update AFTER UPDATE OF size ON {t} "
+                           f"BEGIN {totals} - OLD.size + NEW.size WHERE name = '{t}'; END")
+
+    def get_many(self, keys: list[str], fields: tuple[str, ...]) -> dict:
+        """key -> tuple of `fields` for the keys that are present; marks them as used."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), MAX_PARAMS):
+                part = keys[start:start + MAX_PARAMS]
+                rows = self._conn.execute(
+                    f"SELECT key, {', '.join(fields)} FROM {self.table} WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update((row[0], row[1:]) for row in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+        return found
+
+    def put_many(self, rows: list[dict]) -> None:
+        """Insert or replace rows (dicts with "key" and every column), then evict if over max_bytes."""
+        now = time.time()
+        names = ["key", *self.columns, "size", "last_used"]
+        values = [(row["key"], *(row[c] for c in self.columns), _size(row[self.payload]), now) for row in rows]
+        with self._lock, _immediate(self._conn):
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                values,
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least-recently-used rows until the table is back under EVICT_TO of max_bytes."""
+        total = self._total()
+        if total <= self.max_bytes:
+            return
+        excess = total - int(EVICT_TO * self.max_bytes)
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", doomed)
+
+    def _total(self) -> int:
+        row = self._conn.execute(f"SELECT bytes FROM {TOTALS_TABLE} WHERE name = ?", (self.table,)).fetchone()
+        return row[0] if row else 0
+
+    def total_bytes(self) -> int:
+        """Payload bytes currently stored, without scanning the table."""
+        with self._lock:
+            return self._total()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
@@ -1,49 +1,173 @@
-'''
-# Lists:
-from typing import List
-# Entity discovery, shows how model "understands" structured data:
-from pydantic import BaseModel
-# OpenAI client:
-from openai import OpenAI
-'''
-
-'''
-class EntitiesModel(BaseModel):
-    attributes: List[str]
-    colors: List[str]
-    animals: List[str]
-'''
-
-def stream(thisOS: object) -> str:
-
-    '''
-    Streaming mode implementation using OpenAI's streaming capabilities.
-    This function demonstrates how to handle streaming responses from the API.
-    '''
-
-    # Example of streaming with structured output:
-    '''
-    with thisOS.client.responses.stream(
-        model=thisOS.model,
-        input=[
-            {"role": "system", "content": "Extract entities from the input text"},
-            {
-                "role": "user",
-                "content": "The quick brown fox jumps over the lazy dog with piercing blue eyes",
-            }
-        ],
-        text_format=EntitiesModel,
-    ) as stream:
-        for event in stream:
-            if event.type == "response.refusal.delta":
-                print(event.delta, end="")
-            elif event.type == "response.output_text.delta":
-                print(event.delta, end="")
-            elif event.type == "response.error":
-                print(event.error, end="")
-            elif event.type == "response.completed":
-                print("Completed")
-                # print(event.response.output)
-    final_response = stream.get_final_response()
-    return final_response
-    '''
\ No newline at end of file
+# tomos/utils/streaming.py
+# Event-streaming engine for responses.create(stream=True).
+#
+# Stream (sync) and AsyncStream (async) wrap the event iterator of a streaming
+# call and yield the text deltas as they arrive, fanning each one out to
+# pluggable sinks. Along the way they record time-to-first-token, inter-token
+# latency and tokens/sec, and keep the final response from the
+# `response.completed` event so usage and cost can be accounted as for a
+# non-streaming call. Deltas are kept as a list of pieces and joined once.
+#
+# A sink is anything with a write(text) method (sys.stdout, an open file,
+# io.StringIO, ...) or a plain callable taking the delta; flush() is called at
+# the end of the stream if the sink has one. Sinks of an AsyncStream may also
+# be coroutine functions or have async write/flush methods.
+import inspect
+import time
+
+DELTA_EVENT = "response.output_text.delta"
+REFUSAL_EVENT = "response.refusal.delta"
+FINAL_EVENTS = ("response.completed", "response.incomplete", "response.failed")
+ERROR_EVENTS = ("error", "response.error")
+
+
+def print_sink(delta: str) -> None:
+    """Sink printing each delta to the terminal as soon as it arrives."""
+    print(delta, end="", flush=True)
+
+
+class _Writer:
+    """Adapts a sink (file-like or callable) to write()/flush()."""
+
+    def __init__(self, sink):
+        self.write = sink.write if hasattr(sink, "write") else sink
+        self.flush = getattr(sink, "flush", None)
+
+
+class _StreamState:
+    """Text pieces, final response and timing of one streaming call; shared by Stream and AsyncStream."""
+
+    def __init__(self, sinks, start_time: float | None):
+        self.sinks = [_Writer(sink) for sink in sinks or ()]
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.first_token_time = None
+        self.last_token_time = None
+        self.end_time = None
+        self.gaps = []  # seconds between consecutive deltas
+        self.pieces = []
+        self.refusal = []
+        self.response = None  # final response object, from the response.completed event
+        self.error = None
+        self._text = None
+
+    def handle(self, event) -> str | None:
+        """Record one event; returns its text delta, or None for events that carry no output text."""
+        kind = getattr(event, "type", None)
+        if kind == DELTA_EVENT:
+            now = time.perf_counter()
+            if self.first_token_time is None:
+                self.first_token_time = now
+            else:
+                self.gaps.append(now - self.last_token_time)
+            self.last_token_time = now
+            self.pieces.append(event.delta)
+            return event.delta
+        if kind == REFUSAL_EVENT:
+            self.refusal.append(event.delta)
+        elif kind in FINAL_EVENTS:
+            self.response = event.response
+            if kind == "response.failed":
+                self.error = str(getattr(event.response, "error", None) or "response failed")
+        elif kind in ERROR_EVENTS:
+            self.error = str(getattr(event, "message", None) or getattr(event, "error", None) or event)
+        return None
+
+    def finish(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.perf_counter()
+
+    @property
+    def text(self) -> str:
+        if self._text is None or self.end_time is None:
+            self._text = "".join(self.pieces)
+        return self._text
+
+    def metrics(self) -> dict:
+        """
+        Timing of the stream (seconds): ttft (request start to first delta), total,
+        mean and p95 inter-token latency, and tokens/sec over the generation phase.
+        Output tokens come from the final usage when the stream delivered it, else the delta count.
+        """
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        usage = getattr(self.response, "usage", None)
+        output_tokens = getattr(usage, "output_tokens", None) or len(self.pieces)
+        gaps = sorted(self.gaps)
+        generation = (self.last_token_time - self.first_token_time) if self.first_token_time is not None else 0.0
+        return {
+            "ttft_s": None if self.first_token_time is None else self.first_token_time - self.start_time,
+            "total_s": end - self.start_time,
+            "deltas": len(self.pieces),
+            "output_tokens": output_tokens,
+            "inter_token_mean_s": sum(gaps) / len(gaps) if gaps else None,
+            "inter_token_p95_s": gaps[min(len(gaps) - 1, int(0.95 * len(gaps)))] if gaps else None,
+            "tokens_per_s": (output_tokens - 1) / generation if generation > 0 else None,
+        }
+
+
+class Stream(_StreamState):
+    """
+    Iterator over the text deltas of a streaming responses call.
+
+        stream = Stream(client.responses.create(..., stream=True), sinks=[sys.stdout])
+        for delta in stream: ...
+        stream.text, stream.response, stream.metrics()
+
+    Pass `start_time` (time.perf_counter() taken before the request was sent)
+    so TTFT includes the time to open the stream.
+    """
+
+    def __init__(self, events, sinks=(), start_time: float | None = None):
+        super().__init__(sinks, start_time)
+        self.events = events
+
+    def __iter__(self):
+        try:
+            for event in self.events:
+                delta = self.handle(event)
+                if delta is not None:
+                    for sink in self.sinks:
+                        sink.write(delta)
+                    yield delta
+        finally:
+            self.finish()
+            for sink in self.sinks:
+                if sink.flush is not None:
+                    sink.flush()
+
+    def consume(self) -> str:
+        """Drain the stream (feeding the sinks) and return the full text."""
+        for _ in self:
+            pass
+        return self.text
+
+
+async def _maybe_await(result):
+    if inspect.isawaitable(result):
+        await result
+
+
+class AsyncStream(_StreamState):
+    """Async twin of Stream, for the event stream of an AsyncOpenAI client: `async for delta in stream`."""
+
+    def __init__(self, events, sinks=(), start_time: float | None = None):
+        super().__init__(sinks, start_time)
+        self.events = events
+
+    async def __aiter__(self):
+        try:
+            async for event in self.events:
+                delta = self.handle(event)
+                if delta is not None:
+                    for sink in self.sinks:
+                        await _maybe_await(sink.write(delta))
+                    yield delta
+        finally:
+            self.finish()
+            for sink in self.sinks:
+                if sink.flush is not None:
+                    await _maybe_await(sink.flush())
+
+    async def consume(self) -> str:
+        async for _ in self:
+            pass
+        return self.text
@@ -0,0 +1,209 @@
+# tomos/utils/telemetry.py
+# Structured per-call telemetry for TomOS.
+#
+# Every API call (or cache hit) becomes one flat event dict, built by
+# call_event: model, mode, wall time, queue time, TTFT, token counts, cache
+# hit and cost from the per-model price table in pricing.py. Telemetry sends
+# events to pluggable exporters:
+#   JSONLExporter        one JSON line per event, appended to a file
+#   RingBufferExporter   the last N events in memory, with a summary
+#   PrometheusExporter   counters and histograms in the Prometheus text format
+# An exporter is any object with an export(event) method.
+import json
+import threading
+import time
+from collections import deque
+
+from .pricing import usage_cost
+
+# Histogram buckets (seconds) for call and time-to-first-token latency:
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def call_event(model: str, mode: str = "", wall_s: float = 0.0, queue_s: float = 0.0, ttft_s: float | None = None,
+               usage: dict | None = None, cache: str | None = None, error: str | None = None, **extra) -> dict:
+    """
+    One telemetry event. `cache` names the cache that served the call ("exact",
+    "semantic") or is None for a model call; hits cost nothing, and what they
+    saved is left to the cache stats. Extra keyword fields (e.g. context_s) are kept as-is.
+    """
+    usage = usage or {}
+    return {
+        "time": time.time(),
+        "model": model,
+        "mode": mode or "",
+        "status": "error" if error else "ok",
+        "error": error,
+        "wall_s": wall_s,
+        "queue_s": queue_s,
+        "ttft_s": ttft_s,
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+        "cache": cache,
+        "cost_usd": 0.0 if cache else usage_cost({**usage, "model": usage.get("model") or model}),
+        **extra,
+    }
+
+
+class JSONLExporter:
+    """Appends each event as one JSON line to `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class RingBufferExporter:
+    """Keeps the last `size` events in memory."""
+
+    def __init__(self, size: int = 1000):
+        self.buffer = deque(maxlen=size)
+
+    def export(self, event: dict) -> None:
+        self.buffer.append(event)  # deque.append is thread-safe
+
+    def events(self) -> list[dict]:
+        return list(self.buffer)
+
+    def summary(self) -> dict:
+        """Calls, errors, cache hits, tokens, cost and median/p95 wall time over the buffered events."""
+        events = self.events()
+        walls = sorted(e["wall_s"] for e in events)
+        return {
+            "calls": len(events),
+            "errors": sum(e["status"] == "error" for e in events),
+            "cache_hits": sum(e["cache"] is not None for e in events),
+            "total_tokens": sum(e["total_tokens"] or 0 for e in events),
+            "cost_usd": round(sum(e["cost_usd"] or 0.0 for e in events), 6),
+            "wall_p50_s": walls[len(walls) // 2] if walls else None,
+            "wall_p95_s": walls[min(len(walls) - 1, int(0.95 * len(walls)))] if walls else None,
+        }
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: dict) -> list[str]:
+        lines = [f"{name}_bucket{_labels(**labels, le=bound)} {n}" for bound, n in zip(self.buckets, self.counts)]
+        lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {self.count}")
+        lines.append(f"{name}_sum{_labels(**labels)} {self.sum}")
+        lines.append(f"{name}_count{_labels(**labels)} {self.count}")
+        return lines
+
+
+class PrometheusExporter:
+    """
+    Aggregates events into counters and latency histograms; render() returns
+    them in the Prometheus text exposition format (for an HTTP endpoint), and
+    write(path) saves them for the node_exporter textfile collector.
+    """
+
+    def __init__(self, prefix: str = "tomos"):
+        self.prefix = prefix
+        self.calls = {}  # (model, mode, cache, status) -> count
+        self.tokens = {}  # (model, direction) -> count
+        self.cost = {}  # model -> USD
+        self.wall = {}  # model -> _Histogram
+        self.ttft = {}  # model -> _Histogram
+        self.queue = {}  # model -> seconds
+        self._lock = threading.Lock()
+
+    def export(self, event: dict) -> None:
+        model = event["model"]
+        with self._lock:
+            key = (model, event["mode"], event["cache"] or "none", event["status"])
+            self.calls[key] = self.calls.get(key, 0) + 1
+            for direction in ("input", "output"):
+                tokens = 0 if event["cache"] else event.get(f"{direction}_tokens") or 0  # hits are not billed
+                self.tokens[(model, direction)] = self.tokens.get((model, direction), 0) + tokens
+            self.cost[model] = self.cost.get(model, 0.0) + (event["cost_usd"] or 0.0)
+            self.queue[model] = self.queue.get(model, 0.0) + (event["queue_s"] or 0.0)
+            self.wall.setdefault(model, _Histogram()).observe(event["wall_s"])
+            if event["ttft_s"] is not None:
+                self.ttft.setdefault(model, _Histogram()).observe(event["ttft_s"])
+
+    def render(self) -> str:
+        p = self.prefix
+        with self._lock:
+            lines = [f"# HELP {p}_calls_total API calls and cache hits.", f"# TYPE {p}_calls_total counter"]
+            lines += [f"{p}_calls_total{_labels(model=m, mode=mode, cache=c, status=s)} {n}"
+                      for (m, mode, c, s), n in sorted(self.calls.items())]
+            lines += [f"# HELP {p}_tokens_total Tokens billed, by direction.", f"# TYPE {p}_tokens_total counter"]
+            lines += [f"{p}_tokens_total{_labels(model=m, direction=d)} {n}" for (m, d), n in sorted(self.tokens.items())]
+            lines += [f"# HELP {p}_cost_usd_total Cost of API calls in USD.", f"# TYPE {p}_cost_usd_total counter"]
+            lines += [f"{p}_cost_usd_total{_labels(model=m)} {v}" for m, v in sorted(self.cost.items())]
+            lines += [f"# HELP {p}_queue_seconds_total Time calls waited for a worker.",
+                      f"# TYPE {p}_queue_seconds_total counter"]
+            lines += [f"{p}_queue_seconds_total{_labels(model=m)} {v}" for m, v in sorted(self.queue.items())]
+            for name, histograms, help_text in ((f"{p}_call_seconds", self.wall, "Wall time per call."),
+                                                (f"{p}_ttft_seconds", self.ttft, "Time to first token of streamed calls.")):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for m, histogram in sorted(histograms.items()):
+                    lines += histogram.lines(name, {"model": m})
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+
+
+class Telemetry:
+    """Fans each recorded event out to the exporters; an exporter that fails never breaks the call."""
+
+    def __init__(self, exporters=()):
+        self.exporters = list(exporters)
+
+    def record(self, event: dict) -> dict:
+        for exporter in self.exporters:
+            try:
+                exporter.export(event)
+            except Exception as e:
+                print(f"Telemetry exporter {type(exporter).__name__} failed: {e}")
+        return event
+
+    def exporter(self, kind: type):
+        """The first exporter of class `kind`, or None."""
+        return next((e for e in self.exporters if isinstance(e, kind)), None)
+
+
+def make_telemetry(spec) -> Telemetry | None:
+    """
+    Build telemetry from a short spec: None/"" (off), "memory" (ring buffer),
+    "prometheus" (ring buffer + Prometheus), or a path to a JSONL file
+    (ring buffer + JSONL). A Telemetry instance is returned as-is.
+    """
+    if spec is None or isinstance(spec, Telemetry):
+        return spec
+    if spec == "":
+        return None
+    exporters = [RingBufferExporter()]
+    if spec == "prometheus":
+        exporters.append(PrometheusExporter())
+    elif spec != "memory":
+        exporters.append(JSONLExporter(spec))
+    return Telemetry(exporters)
@@ -0,0 +1,250 @@
+# tomos/utils/transport.py
+# HTTP transports behind the shared clients in clients.py.
+#
+# RetryTransport (sync) and AsyncRetryTransport wrap httpx's pooled
+# transports and add, for every request that goes through them:
+#   - per-endpoint timeouts, matched on the URL path (ENDPOINT_TIMEOUTS);
+#   - exponential backoff with full jitter on 429/5xx and connection errors,
+#     honouring Retry-After;
+#   - optional hedging: on endpoints listed in HttpPolicy.hedge_endpoints, a
+#     duplicate request is sent once the first has been outstanding longer
+#     than the endpoint's recent p95 latency, and the first response wins.
+# Hedging duplicates work on the server, so only enable it for idempotent
+# endpoints (embeddings) or where the extra cost is worth the tail latency.
+#
+# httpx is imported here, not in clients.py, so `import tomos` stays cheap.
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+
+RETRY_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})  # same set as embeddings/submitter.py
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5  # seconds; attempt n sleeps up to BACKOFF_BASE * 2**n
+BACKOFF_MAX = 20.0
+
+# Connection pool shared by every request of one client; keep-alive avoids a TLS handshake per call:
+POOL_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0)
+
+# URL path fragment -> timeout; the longest matching fragment wins, DEFAULT_TIMEOUT otherwise:
+ENDPOINT_TIMEOUTS = {
+    "/responses": httpx.Timeout(180.0, connect=5.0),  # long generations; streams only wait per chunk
+    "/embeddings": httpx.Timeout(30.0, connect=5.0),
+    "/fine_tuning/alpha/graders": httpx.Timeout(60.0, connect=5.0),
+    "/chatkit": httpx.Timeout(30.0, connect=5.0),
+}
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+LATENCY_WINDOW = 200  # recent latencies kept per endpoint
+HEDGE_MIN_SAMPLES = 20  # no hedging until an endpoint has this many latencies recorded
+HEDGE_QUANTILE = 0.95
+
+
+def endpoint_of(path: str, endpoints) -> str:
+    """The longest of `endpoints` contained in `path`, or the path itself."""
+    matches = [e for e in endpoints if e in path]
+    return max(matches, key=len) if matches else path
+
+
+def backoff_delay(attempt: int, retry_after: str | None = None, base: float = BACKOFF_BASE,
+                  cap: float = BACKOFF_MAX) -> float:
+    """Seconds to wait before retry `attempt` (0-based): Retry-After if the server sent one, else full jitter."""
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass  # an HTTP date; fall back to backoff
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class HttpPolicy:
+    """
+    Timeouts, retries and hedging for one client registry, plus the latency
+    history (time to response headers) and counters they are based on.
+    """
+
+    def __init__(self, timeouts: dict | None = None, default_timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX,
+                 retry_status_codes=RETRY_STATUS_CODES, hedge_endpoints=(), hedge_quantile: float = HEDGE_QUANTILE,
+                 hedge_min_samples: int = HEDGE_MIN_SAMPLES, limits: httpx.Limits = POOL_LIMITS):
+        self.timeouts = ENDPOINT_TIMEOUTS if timeouts is None else timeouts
+        self.default_timeout = default_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_status_codes = frozenset(retry_status_codes)
+        self.hedge_endpoints = tuple(hedge_endpoints)
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.limits = limits
+        self._latencies = {}  # endpoint -> deque of seconds
+        self._counters = {}  # endpoint -> {"requests", "retries", "hedged", "hedge_wins"}
+        self._lock = threading.Lock()
+
+    def endpoint(self, request: httpx.Request) -> str:
+        return endpoint_of(request.url.path, tuple(self.timeouts) + self.hedge_endpoints)
+
+    def timeout(self, endpoint: str) -> dict:
+        return self.timeouts.get(endpoint, self.default_timeout).as_dict()
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        return backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max)
+
+    def count(self, endpoint: str, counter: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, dict.fromkeys(("requests", "retries", "hedged", "hedge_wins"), 0))
+            counters[counter] += 1
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def hedge_after(self, endpoint: str) -> float | None:
+        """Seconds after which to send a hedged duplicate on `endpoint`, or None to not hedge."""
+        if endpoint not in self.hedge_endpoints:
+            return None
+        with self._lock:
+            latencies = sorted(self._latencies.get(endpoint, ()))
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(self.hedge_quantile * len(latencies)))]
+
+    def stats(self) -> dict:
+        """Per endpoint: request, retry and hedge counters, and the current hedge threshold."""
+        with self._lock:
+            endpoints = dict(self._counters)
+        return {endpoint: {**counters, "hedge_after_s": self.hedge_after(endpoint)}
+                for endpoint, counters in endpoints.items()}
+
+
+class RetryTransport(httpx.BaseTransport):
+    """Pooled sync transport with per-endpoint timeouts, backoff retries and optional hedging (see HttpPolicy)."""
+
+    def __init__(self, policy: HttpPolicy, transport: httpx.BaseTransport | None = None):
+        self.policy = policy
+        self.transport = transport or httpx.HTTPTransport(limits=policy.limits)
+        self._executor = None  # threads for hedged requests, created on first hedge
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        endpoint = policy.endpoint(request)
+        request.extensions["timeout"] = policy.timeout(endpoint)
+        for attempt in range(policy.max_retries + 1):
+            policy.count(endpoint, "requests" if attempt == 0 else "retries")
+            try:
+                response = self._send(request, endpoint)
+            except httpx.TransportError:
+                if attempt == policy.max_retries:
+                    raise
+                delay = policy.delay(attempt)
+            else:
+                if response.status_code not in policy.retry_status_codes or attempt == policy.max_retries:
+                    return response
+                delay = policy.delay(attempt, response.headers.get("retry-after"))
+                response.close()
+            time.sleep(delay)
+
+    def _timed(self, request: httpx.Request, endpoint: str) -> httpx.Response:
+        start_time = time.perf_counter()
+        response = self.transport.handle_request(request)
+        self.policy.record(endpoint, time.perf_counter() - start_time)
+        return response
+
+    def _send(self, request: httpx.Request, endpoint: str) -> httpx.Response:
+        hedge_after = self.policy.hedge_after(endpoint)
+        if hedge_after is None:
+            return self._timed(request, endpoint)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tomos-hedge")
+        first = self._executor.submit(self._timed, request, endpoint)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+        self.policy.count(endpoint, "hedged")
+        second = self._executor.submit(self._timed, request, endpoint)
+        pending = {first, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next(iter(done))
+            if winner.exception() is None or not pending:
+                break
+        for loser in (done | pending) - {winner}:  # close the other response, now or once it arrives
+            loser.add_done_callback(lambda f: f.exception() is None and f.result().close())
+        if winner is second:
+            self.policy.count(endpoint, "hedge_wins")
+        return winner.result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """Async twin of RetryTransport; hedged duplicates are tasks on the running loop."""
+
+    def __init__(self, policy: HttpPolicy, transport: httpx.AsyncBaseTransport | None = None):
+        self.policy = policy
+        self.transport = transport or httpx.AsyncHTTPTransport(limits=policy.limits)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        endpoint = policy.endpoint(request)
+        request.extensions["timeout"] = policy.timeout(endpoint)
+        for attempt in range(policy.max_retries + 1):
+            policy.count(endpoint, "requests" if attempt == 0 else "retries")
+            try:
+                response = await self._send(request, endpoint)
+            except httpx.TransportError:
+                if attempt == policy.max_retries:
+                    raise
+                delay = policy.delay(attempt)
+            else:
+                if response.status_code not in policy.retry_status_codes or attempt == policy.max_retries:
+                    return response
+                delay = policy.delay(attempt, response.headers.get("retry-after"))
+                await response.aclose()
+            await asyncio.sleep(delay)
+
+    async def _timed(self, request: httpx.Request, endpoint: str) -> httpx.Response:
+        start_time = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        self.policy.record(endpoint, time.perf_counter() - start_time)
+        return response
+
+    async def _send(self, request: httpx.Request, endpoint: str) -> httpx.Response:
+        hedge_after = self.policy.hedge_after(endpoint)
+        if hedge_after is None:
+            return await self._timed(request, endpoint)
+        first = asyncio.ensure_future(self._timed(request, endpoint))
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done:
+            return first.result()
+        self.policy.count(endpoint, "hedged")
+        second = asyncio.ensure_future(self._timed(request, endpoint))
+        pending = {first, second}
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next(iter(done))
+            if winner.exception() is None or not pending:
+                break
+        await self._discard((done | pending) - {winner})
+        if winner is second:
+            self.policy.count(endpoint, "hedge_wins")
+        return winner.result()
+
+    @staticmethod
+    async def _discard(losers) -> None:
+        """Cancel losing hedges still in flight and close the responses of any that already arrived."""
+        for loser in losers:
+            loser.cancel()  # no-op for finished tasks
+        for result in await asyncio.gather(*losers, return_exceptions=True):
+            if isinstance(result, httpx.Response):
+                await result.aclose()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()